@@ -0,0 +1,120 @@
+"""Account lookups and credential checks on top of a storage backend.
+
+Accounts are held in an in-memory username index, filled from storage on
+first use; a miss falls back to storage so accounts registered by another
+worker are still found. Passwords are stored as Werkzeug hashes (scrypt by
+default). Entries still holding a plaintext password or an outdated hash are
+rehashed on their next successful login. ``last_login`` stamps are buffered
+and written in one batch every ``flush_interval`` seconds rather than once per
+login.
+"""
+import atexit
+import hmac
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_PREFIXES = ("scrypt:", "pbkdf2:")
+
+
+def hash_password(password, method="scrypt"):
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(stored, password):
+    if stored.startswith(HASH_PREFIXES):
+        return check_password_hash(stored, password)
+    # Accounts created before hashing keep their plaintext until the next login
+    return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+
+
+class AccountStore:
+    def __init__(self, storage, method="scrypt", flush_interval=30.0):
+        self.storage = storage
+        self.method = method
+        self.flush_interval = flush_interval
+        self._hash_prefix = None
+        self._lock = threading.Lock()
+        self._index = None  # username -> account
+        self._pending = {}  # username -> last_login not yet written
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _accounts(self):
+        if self._index is None:
+            self._index = {a["username"]: a for a in self.storage.iter_accounts()}
+        return self._index
+
+    def get(self, username):
+        with self._lock:
+            account = self._accounts().get(username)
+        if account is None:
+            account = self.storage.get_account(username)
+            if account is None:
+                return None
+            with self._lock:
+                self._accounts()[username] = account
+        account = dict(account)
+        with self._lock:
+            if username in self._pending:
+                account["last_login"] = self._pending[username]
+        return account
+
+    def add(self, account):
+        """Store ``account`` with its password hashed; False if the username is taken."""
+        account = dict(account, password=hash_password(account["password"], self.method))
+        if not self.storage.add_account(account):
+            return False
+        with self._lock:
+            self._accounts()[account["username"]] = account
+        return True
+
+    def needs_rehash(self, stored):
+        if self._hash_prefix is None:
+            # Full method string as written into hashes, e.g. "scrypt:32768:8:1"
+            self._hash_prefix = hash_password("", self.method).split("$", 1)[0]
+        return stored.split("$", 1)[0] != self._hash_prefix
+
+    def authenticate(self, username, password):
+        """Return the account if ``password`` matches, rehashing outdated entries."""
+        account = self.get(username)
+        if account is None or not verify_password(account.get("password", ""), password):
+            return None
+        if self.needs_rehash(account["password"]):
+            account["password"] = hash_password(password, self.method)
+            self.storage.update_account(username, {"password": account["password"]})
+            with self._lock:
+                cached = self._accounts().get(username)
+                if cached is not None:
+                    cached["password"] = account["password"]
+        return account
+
+    def record_login(self, username, timestamp):
+        """Buffer a ``last_login`` stamp; it is written on the next periodic flush."""
+        with self._lock:
+            self._pending[username] = timestamp
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer = None
+            for username, timestamp in pending.items():
+                account = self._accounts().get(username)
+                if account is not None:
+                    account["last_login"] = timestamp
+        if not pending:
+            return 0
+        try:
+            return self.storage.update_accounts(
+                {username: {"last_login": ts} for username, ts in pending.items()}
+            )
+        except Exception as e:
+            print(f"[Accounts] last_login flush failed: {e}")
+            with self._lock:
+                for username, timestamp in pending.items():
+                    self._pending.setdefault(username, timestamp)
+            return 0
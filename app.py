@@ -1,19 +1,32 @@
+from startup import StartupTimer
+STARTUP = StartupTimer()
 import os
 import json
 import uuid
 import datetime
-import threading
+import hashlib
+import math
+import time
 import base64
-from io import BytesIO
-import shutil
+import contextlib
+import queue
+import re
+import secrets
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
 load_dotenv()
 
+from urllib.parse import urlencode
+
 from flask import (
     Flask,
+    Response,
+    stream_with_context,
     request,
     session,
     redirect,
@@ -21,164 +34,238 @@ from flask import (
     render_template,
     jsonify,
     abort,
+    g,
+    make_response,
+    send_file,
     send_from_directory,
 )
+from werkzeug.http import is_resource_modified
 
-# The `requests` library is still used by your original _gemini_generate function
-import requests
-import qrcode
+import click
 
-# --- NEW: Import the official Google Generative AI SDK ---
-import google.generativeai as genai
+from lazy_imports import LazyModule, resolve
 
 from config import (
     GEMINI_API_KEY,
     BASE_DIR,
     GEMINI_RECOMMEND_MODEL,
     GEMINI_FAQ_MODEL,
+    GEMINI_CHAT_MODEL,
+    GEMINI_BASE_URL,
+    GEMINI_TRANSPORT,
+    GEMINI_TIMEOUTS,
+    GEMINI_CONNECT_TIMEOUT,
+    GEMINI_RETRIES,
+    GEMINI_RETRY_BACKOFF,
+    GEMINI_POOL_SIZE,
+    GEMINI_BREAKER_THRESHOLD,
+    GEMINI_BREAKER_RESET,
     UPI_ID,
+    INVENTORY_CHECK_INTERVAL,
+    CATALOG_PAGE_SIZE,
+    HTTP_CACHE_MAX_AGE,
+    LLM_CACHE_SIZE,
+    LLM_CACHE_SHARED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTLS,
+    LLM_MAX_CONCURRENCY,
+    LLM_QUEUE_TIMEOUT,
+    STORAGE_BACKEND,
+    SQLITE_PATH,
+    DATA_PATH,
+    UPLOAD_PATH,
+    CHAT_SESSION_BACKEND,
+    CHAT_SESSION_PATH,
+    CHAT_SESSION_MAX,
+    CHAT_SESSION_TTL,
+    CHAT_HISTORY_MAX_MESSAGES,
+    CHAT_CONTEXT_TOKEN_BUDGET,
+    CHAT_CONTEXT_RECENT_TURNS,
+    CHAT_SUMMARY_CHARS,
+    PASSWORD_HASH_METHOD,
+    LAST_LOGIN_FLUSH_INTERVAL,
+    RATING_FLUSH_INTERVAL,
+    RATING_FLUSH_EVERY,
+    FAQ_LOG_SEGMENT_BYTES,
+    FAQ_LOG_MAX_SEGMENTS,
+    QR_CACHE_SIZE,
+    BULK_BATCH_SIZE,
+    BULK_MAX_ERRORS,
+    THUMBNAILS_ENABLED,
+    THUMBNAIL_WIDTHS,
+    THUMBNAIL_QUALITY,
+    THUMBNAIL_PROCESSES,
+    THUMBNAIL_MAX_BYTES,
+    THUMBNAIL_ALLOW_PRIVATE,
+    STOCK_RESERVATION_TTL,
+    STOCK_SWEEP_INTERVAL,
+    CART_BACKEND,
+    CART_PATH,
+    CART_TTL,
+    CART_MAX_LINES,
+    STARTUP_MODE,
+    STARTUP_REPORT,
+    METRICS_ENABLED,
+    METRICS_TOKEN,
+    PROFILE_SLOW_MS,
+    PROFILE_INTERVAL_MS,
+    PROFILE_DIR,
 )
+from inventory import InventoryIndex, ItemTree, WriteConflict
+from search import SearchIndex
+from llm_cache import ResponseCache, SqliteTier
+from storage import JsonStorage, SqliteStorage, open_storage
+from chat_sessions import open_session_store
+from carts import cookie_cart_lines, open_cart_store
+from chat_context import ContextAssembler
+from accounts import AccountStore
+from rating_counter import RatingCounter
+from qr_cache import QrCache
+from stock import OutOfStock, StockEngine
+from thumbnails import FORMATS as THUMBNAIL_FORMATS, ThumbnailStore
+from file_locks import copy_up
+from gemini_rest import RestChatModel
+from catalog_io import RowError, clean_row, export_lines, format_for, iter_rows, normalize_image_url
+from gemini_client import CircuitBreaker, CircuitOpenError, GeminiHttp
+from metrics import METRICS
+from profiler import SlowRequestProfiler
+
+STARTUP.mode = STARTUP_MODE
+STARTUP.mark("imports")
+
+# The `requests` library backs GEMINI_HTTP, used by _gemini_generate and the REST chat transport
+requests = LazyModule("requests")
+
+
+def _configure_genai(module):
+    if GEMINI_API_KEY:
+        module.configure(api_key=GEMINI_API_KEY)
+
+
+# --- NEW: The official Google Generative AI SDK, imported on first use ---
+genai = LazyModule("google.generativeai", on_import=_configure_genai)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-default-secret-key-change-in-production')  # Use environment variable
 
 # Create a writable directory for Vercel
 if os.environ.get('VERCEL'):
-    # In Vercel, only /tmp is writable
+    # In Vercel, only /tmp is writable. The deployed data/ and retailer_uploads/
+    # stay read-only seeds: files are read from them until first written, and
+    # writes land in /tmp (copy-on-write), so nothing is copied up front.
     DATA_DIR = Path("/tmp/data")
     UPLOAD_DIR = Path("/tmp/retailer_uploads")
-    
-    # Copy existing data from deployed folder to writable temp folder
     SOURCE_DATA_DIR = Path(BASE_DIR) / "data"
     SOURCE_UPLOAD_DIR = Path(BASE_DIR) / "retailer_uploads"
-    
-    # Copy data files if they exist
-    if SOURCE_DATA_DIR.exists() and not DATA_DIR.exists():
-        shutil.copytree(SOURCE_DATA_DIR, DATA_DIR)
-        print(f"Copied data from {SOURCE_DATA_DIR} to {DATA_DIR}")
-    
-    # Copy retailer uploads if they exist
-    if SOURCE_UPLOAD_DIR.exists() and not UPLOAD_DIR.exists():
-        shutil.copytree(SOURCE_UPLOAD_DIR, UPLOAD_DIR)
-        print(f"Copied retailer uploads from {SOURCE_UPLOAD_DIR} to {UPLOAD_DIR}")
 else:
     # Local development
-    DATA_DIR = Path(BASE_DIR) / "data"
-    UPLOAD_DIR = Path(BASE_DIR) / "retailer_uploads"
+    DATA_DIR = Path(DATA_PATH or Path(BASE_DIR) / "data")
+    UPLOAD_DIR = Path(UPLOAD_PATH or Path(BASE_DIR) / "retailer_uploads")
+    SOURCE_DATA_DIR = SOURCE_UPLOAD_DIR = None
 
 DATA_DIR.mkdir(exist_ok=True)
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# File paths
-UPLOAD_DIR.mkdir(exist_ok=True)
-
-AUTH_FILE = DATA_DIR / "Auth.json"
-COUNT_FILE = DATA_DIR / "count.json"
-FAQ_FILE = DATA_DIR / "FAQ.json"
-PURCHASE_FILE = (
-    DATA_DIR / "purchase.json"
-)  # Will now store legacy 'requests' and new 'orders'
-
-FILE_LOCK = threading.Lock()
 
-CHAT_SESSIONS = {}
-
-# --- NEW: Configure the Gemini API client ---
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
-    print("[Gemini] Warning: API key is not set. AI features will be disabled.")
+def seeded(path):
+    """Copy a bundled data file into DATA_DIR on first use (Vercel only)."""
+    if SOURCE_DATA_DIR is not None:
+        copy_up(path, SOURCE_DATA_DIR / Path(path).name)
+    return path
+
+
+if STORAGE_BACKEND == "sqlite":
+    seeded(SQLITE_PATH or DATA_DIR / "smartshop.db")
+STORAGE = open_storage(
+    STORAGE_BACKEND,
+    DATA_DIR,
+    UPLOAD_DIR,
+    SQLITE_PATH,
+    faq_segment_bytes=FAQ_LOG_SEGMENT_BYTES,
+    faq_max_segments=FAQ_LOG_MAX_SEGMENTS,
+    data_seed=SOURCE_DATA_DIR,
+    upload_seed=SOURCE_UPLOAD_DIR,
+)
+ACCOUNTS = AccountStore(
+    STORAGE, method=PASSWORD_HASH_METHOD, flush_interval=LAST_LOGIN_FLUSH_INTERVAL
+)
+RATINGS = RatingCounter(
+    STORAGE, flush_interval=RATING_FLUSH_INTERVAL, flush_every=RATING_FLUSH_EVERY
+)
 
+CHAT_CONTEXT = ContextAssembler(
+    token_budget=CHAT_CONTEXT_TOKEN_BUDGET,
+    recent_turns=CHAT_CONTEXT_RECENT_TURNS,
+    summary_chars=CHAT_SUMMARY_CHARS,
+)
 
-# --------------- Utility JSON I/O ---------------
-def load_json(path, default):
-    with FILE_LOCK:
-        if not path.exists():
-            path.write_text(json.dumps(default, indent=2))
-            return default
-        try:
-            return json.loads(path.read_text() or "null") or default
-        except json.JSONDecodeError:
-            return default
+CHAT_STORE = open_session_store(
+    CHAT_SESSION_BACKEND,
+    CHAT_SESSION_PATH or DATA_DIR / "chat_sessions.db",
+    max_sessions=CHAT_SESSION_MAX,
+    idle_ttl=CHAT_SESSION_TTL,
+    max_messages=CHAT_HISTORY_MAX_MESSAGES,
+    fold=CHAT_CONTEXT.fold,
+)
 
+CARTS = open_cart_store(
+    CART_BACKEND,
+    CART_PATH or DATA_DIR / "carts.db",
+    session=session,
+    idle_ttl=CART_TTL,
+    max_lines=CART_MAX_LINES,
+)
 
-def save_json(path, data):
-    with FILE_LOCK:
-        path.write_text(json.dumps(data, indent=2))
+if not GEMINI_API_KEY:
+    print("[Gemini] Warning: API key is not set. AI features will be disabled.")
+STARTUP.mark("stores")
 
 
 def now_iso():
     return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
 
+DEFAULT_STATIC_FAQ = [
+    {"q": "How do I register?", "a": "Use Register and choose a role."},
+    {
+        "q": "How do I upload a product?",
+        "a": "Retailers upload from the store panel.",
+    },
+    {
+        "q": "How does AI recommend items?",
+        "a": "It matches your stated preferences to item metadata.",
+    },
+    {
+        "q": "How do I request a purchase?",
+        "a": "Open a product and click Buy Now.",
+    },
+    {
+        "q": "Can I rate recommendations?",
+        "a": "Yes, via the popup after each recommendation response.",
+    },
+]
+
+
 def ensure_files():
-    auth_data = load_json(AUTH_FILE, {"accounts": {}})
-    
     # Add guest accounts if they don't exist
-    if "guest_user" not in auth_data["accounts"]:
-        auth_data["accounts"]["guest_user"] = {
-            "username": "guest_user",
-            "role": "user",
-            "password": "guest123",
-            "created_at": now_iso(),
-            "last_login": None,
-            "profile": {"is_guest": True},
-        }
-    
-    if "guest_retailer" not in auth_data["accounts"]:
-        auth_data["accounts"]["guest_retailer"] = {
-            "username": "guest_retailer",
-            "role": "retailer",
-            "password": "guest123",
-            "created_at": now_iso(),
-            "last_login": None,
-            "profile": {"is_guest": True},
-        }
-    
-    save_json(AUTH_FILE, auth_data)
-    
-    load_json(
-        COUNT_FILE,
-        {
-            "recommendation_ratings": {"excellent": 0, "good": 0, "bad": 0},
-            "last_updated": now_iso(),
-        },
-    )
-    load_json(
-        FAQ_FILE,
-        {
-            "static_faq": [
-                {"q": "How do I register?", "a": "Use Register and choose a role."},
-                {
-                    "q": "How do I upload a product?",
-                    "a": "Retailers upload from the store panel.",
-                },
-                {
-                    "q": "How does AI recommend items?",
-                    "a": "It matches your stated preferences to item metadata.",
-                },
-                {
-                    "q": "How do I request a purchase?",
-                    "a": "Open a product and click Buy Now.",
-                },
+    for role in ("user", "retailer"):
+        username = f"guest_{role}"
+        if not ACCOUNTS.get(username):
+            ACCOUNTS.add(
                 {
-                    "q": "Can I rate recommendations?",
-                    "a": "Yes, via the popup after each recommendation response.",
-                },
-            ],
-            "dynamic_log": [],
-        },
-    )
-    # purchase.json: keep backward compatibility with earlier "requests" and add "orders"
-    existing = load_json(PURCHASE_FILE, {})
-    if "requests" not in existing:
-        existing["requests"] = []
-    if "orders" not in existing:
-        existing["orders"] = []
-    save_json(PURCHASE_FILE, existing)
+                    "username": username,
+                    "role": role,
+                    "password": "guest123",
+                    "created_at": now_iso(),
+                    "last_login": None,
+                    "profile": {"is_guest": True},
+                }
+            )
+    STORAGE.init_defaults(DEFAULT_STATIC_FAQ)
 
 
 ensure_files()
+STARTUP.mark("ensure_files")
 
 
 @app.route("/health")
@@ -189,86 +276,159 @@ def health_check():
 @app.context_processor
 def inject_cart_count():
     if session.get("role") == "user":
-        return {"cart_count": len(session.get("cart", []))}
+        key = cart_key()
+        return {"cart_count": CARTS.count(key) if key else 0}
     return {"cart_count": 0}
 
 
 # --------------- Auth Utilities ---------------
 def get_account(username):
-    auth = load_json(AUTH_FILE, {"accounts": {}})
-    return auth["accounts"].get(username)
+    return ACCOUNTS.get(username)
 
 
 def add_account(username, password, role):
-    auth = load_json(AUTH_FILE, {"accounts": {}})
-    if username in auth["accounts"]:
+    added = ACCOUNTS.add(
+        {
+            "username": username,
+            "role": role,
+            "password": password,
+            "created_at": now_iso(),
+            "last_login": None,
+            "profile": {},
+        }
+    )
+    if not added:
         return False, "Username already exists."
-    auth["accounts"][username] = {
-        "username": username,
-        "role": role,
-        "password": password,
-        "created_at": now_iso(),
-        "last_login": None,
-        "profile": {},
-    }
-    save_json(AUTH_FILE, auth)
     return True, "Registered."
 
 
 def update_last_login(username):
-    auth = load_json(AUTH_FILE, {"accounts": {}})
-    if username in auth["accounts"]:
-        auth["accounts"][username]["last_login"] = now_iso()
-        save_json(AUTH_FILE, auth)
+    # Buffered; written with other logins on the next periodic flush
+    ACCOUNTS.record_login(username, now_iso())
 
 
 # --------------- Inventory / Items ---------------
-def iter_all_items():
-    if not UPLOAD_DIR.exists():
+INVENTORY = InventoryIndex(STORAGE.items, check_interval=INVENTORY_CHECK_INTERVAL)
+# Uploaded images stay on disk for both backends
+UPLOADS = ItemTree(UPLOAD_DIR, seed=SOURCE_UPLOAD_DIR)
+SEARCH = SearchIndex()
+INVENTORY.subscribe(SEARCH.on_inventory_change)
+# Resized local copies of the remote product images, stored by content hash
+THUMBNAILS = (
+    ThumbnailStore(
+        UPLOAD_DIR / ".thumbnails",
+        requests,
+        widths=THUMBNAIL_WIDTHS,
+        quality=THUMBNAIL_QUALITY,
+        processes=THUMBNAIL_PROCESSES,
+        max_bytes=THUMBNAIL_MAX_BYTES,
+        allow_private=THUMBNAIL_ALLOW_PRIVATE,
+    )
+    if THUMBNAILS_ENABLED
+    else None
+)
+
+
+def queue_thumbnails(items):
+    """Fetch and resize the images of freshly saved items in the background."""
+    if THUMBNAILS is None:
         return
-    for retailer_dir in UPLOAD_DIR.iterdir():
-        if not retailer_dir.is_dir():
-            continue
-        for item_dir in retailer_dir.iterdir():
-            if not item_dir.is_dir():
-                continue
-            details_file = item_dir / "details.json"
-            if details_file.exists():
-                try:
-                    data = json.loads(details_file.read_text())
-                    yield data
-                except Exception:
-                    continue
+    for item in items:
+        THUMBNAILS.schedule(item.get("image_filename"))
+
+
+@app.template_global()
+def thumbnail(item):
+    """Return ``{"src", "srcset"}`` for an item's local thumbnails, or None until they exist."""
+    url = item.get("image_filename")
+    if THUMBNAILS is None or not url:
+        return None
+    digest = THUMBNAILS.digest_for(url, thumbnail_version())
+    if digest is None:
+        return None
+    urls = [
+        (width, url_for("serve_image", retailer=item["retailer"], item_id=item["item_id"],
+                        filename=f"{digest}-{width}w"))
+        for width in THUMBNAILS.widths
+    ]
+    return {"src": urls[-1][1], "srcset": ", ".join(f"{u} {w}w" for w, u in urls)}
+
+
+@METRICS.timed("smartshop_storage_seconds", op="iter_all_items")
+def iter_all_items():
+    return iter(INVENTORY.all())
 
 
+@METRICS.timed("smartshop_storage_seconds", op="get_item")
 def get_item(retailer, item_id):
-    details = UPLOAD_DIR / retailer / str(item_id) / "details.json"
-    if details.exists():
+    return INVENTORY.get(retailer, item_id)
+
+
+@METRICS.timed("smartshop_storage_seconds", op="get_items_bulk")
+def get_items_bulk(keys):
+    """Resolve ``(retailer, item_id)`` pairs in one pass, memoized for the current request."""
+    memo = g.setdefault("item_memo", {})
+    keys = [(retailer, str(item_id)) for retailer, item_id in keys]
+    missing = [key for key in dict.fromkeys(keys) if key not in memo]
+    if missing:
+        found = {
+            (item["retailer"], str(item["item_id"])): item
+            for item in INVENTORY.get_many(missing)
+        }
+        for key in missing:
+            memo[key] = found.get(key)
+    return [memo[key] for key in keys if memo[key] is not None]
+
+
+def cart_key(create=False):
+    """Return the cart id of this browser session, minting one if ``create`` is set.
+
+    The cookie carries only this id. A cart left in the cookie by an older
+    version moves into ``CARTS`` the first time it is seen.
+    """
+    if CART_BACKEND == "session":
+        return "session"  # the store reads the cookie itself
+    key = session.get("cart_id")
+    legacy = session.pop("cart", None)
+    if key is None and (create or legacy):
+        key = session["cart_id"] = secrets.token_urlsafe(12)
+    for retailer, item_id, quantity in cookie_cart_lines(legacy):
         try:
-            return json.loads(details.read_text())
-        except:
-            return None
-    return None
+            CARTS.set_quantity(key, retailer, item_id, quantity)
+        except ValueError:
+            break
+    return key
 
 
-def save_item(retailer, item_data, image_url=None):
-    item_id = str(uuid.uuid4())
-    item_folder = UPLOAD_DIR / retailer / item_id
-    item_folder.mkdir(parents=True, exist_ok=True)
-    
+def cart_items():
+    """Return ``(items, total)`` for the session cart from one inventory snapshot.
+
+    Each item is a copy carrying the line's ``quantity``.
+    """
+    key = cart_key()
+    lines = CARTS.items(key) if key else []
+    found = {
+        (i["retailer"], i["item_id"]): i
+        for i in get_items_bulk((line["retailer"], line["item_id"]) for line in lines)
+    }
+    items = [
+        dict(found[(line["retailer"], line["item_id"])], quantity=line["quantity"])
+        for line in lines
+        if (line["retailer"], line["item_id"]) in found
+    ]
+    return items, sum(float(i.get("price", 0)) * i["quantity"] for i in items)
+
+
+def build_item(retailer, item_data, image_url=None, item_id=None):
     # Instead of saving uploaded files, we save the image URL
     image_filename = None
     if image_url and image_url.strip():
-        # Validate that it's a proper URL
-        if image_url.startswith(('http://', 'https://')):
-            image_filename = image_url
-        else:
-            image_filename = f"https://{image_url}" if not image_url.startswith('//') else f"https:{image_url}"
-    
+        image_filename = normalize_image_url(image_url)
+
     full_desc = item_data.get("description", "").strip()
     short = (full_desc[:120] + "...") if len(full_desc) > 120 else full_desc
-    details = {
-        "item_id": item_id,
+    return {
+        "item_id": item_id or str(uuid.uuid4()),
         "retailer": retailer,
         "name": item_data.get("name", "").strip(),
         "category": item_data.get("category", "other"),
@@ -281,23 +441,99 @@ def save_item(retailer, item_data, image_url=None):
         "created_at": now_iso(),
         "updated_at": now_iso(),
     }
-    save_json(item_folder / "details.json", details)
-    return details
+
+
+def save_item(retailer, item_data, image_url=None):
+    item = INVENTORY.save(build_item(retailer, item_data, image_url))
+    queue_thumbnails([item])
+    return item
+
+
+# --------------- Catalog Paging ---------------
+CATALOG_SORTS = ("newest", "price_asc", "price_desc")
+
+
+def catalog_filters(args):
+    def price(name):
+        try:
+            value = float(args[name]) if args.get(name) else None
+        except ValueError:
+            return None
+        return value if value is None or math.isfinite(value) else None
+
+    sort = args.get("sort", "newest")
+    return {
+        "category": args.get("category") or None,
+        "retailer": args.get("retailer") or None,
+        "min_price": price("min_price"),
+        "max_price": price("max_price"),
+        "in_stock": args.get("in_stock", "").lower() in ("1", "true", "yes"),
+        "sort": sort if sort in CATALOG_SORTS else "newest",
+    }
+
+
+def catalog_query(filters):
+    """Query string that reproduces ``filters`` for follow-up page requests."""
+    params = {k: v for k, v in filters.items() if v not in (None, False)}
+    if filters["in_stock"]:
+        params["in_stock"] = 1
+    return urlencode(params)
+
+
+def encode_cursor(sort, key):
+    raw = json.dumps([sort, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, *key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or len(key) != 2:
+        raise ValueError("Cursor does not match sort order")
+    value, item_id = key
+    if (
+        not isinstance(value, (int, float))
+        or isinstance(value, bool)
+        or not math.isfinite(value)
+        or not isinstance(item_id, str)
+    ):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def catalog_page(filters, cursor=None, limit=CATALOG_PAGE_SIZE):
+    category, retailer = filters["category"], filters["retailer"]
+    min_price, max_price = filters["min_price"], filters["max_price"]
+
+    def matches(item):
+        if category and (item.get("category") or "").lower() != category.lower():
+            return False
+        if retailer and item.get("retailer") != retailer:
+            return False
+        price = float(item.get("price") or 0)
+        if min_price is not None and price < min_price:
+            return False
+        if max_price is not None and price > max_price:
+            return False
+        if filters["in_stock"] and int(item.get("stock") or 0) <= 0:
+            return False
+        return True
+
+    after = decode_cursor(cursor, filters["sort"]) if cursor else None
+    items, last = INVENTORY.page(filters["sort"], after, limit, matches)
+    next_cursor = encode_cursor(filters["sort"], last) if len(items) == limit else None
+    return items, next_cursor
 
 
 def retailer_item_path(retailer_username, item_id):
     return UPLOAD_DIR / retailer_username / str(item_id)
 
 
-def update_item(retailer_username, item_id, fields: dict):
-    folder = retailer_item_path(retailer_username, item_id)
-    details_file = folder / "details.json"
-    if not details_file.exists():
-        return None
-    try:
-        details = json.loads(details_file.read_text())
-    except:
-        return None
+def apply_item_fields(details, fields):
+    """Merge ``fields`` into ``details`` in place; returns True if anything changed."""
     changed = False
 
     def set_if(key, cast=None):
@@ -324,56 +560,196 @@ def update_item(retailer_username, item_id, fields: dict):
         )
     set_if("price", float)
     set_if("stock", int)
-    
+
     # Handle image URL updates
     if "image_url" in fields and fields["image_url"] is not None:
         image_url = fields["image_url"].strip()
         if image_url:
-            # Validate that it's a proper URL
-            if image_url.startswith(('http://', 'https://')):
-                new_image_filename = image_url
-            else:
-                new_image_filename = f"https://{image_url}" if not image_url.startswith('//') else f"https:{image_url}"
-            
+            new_image_filename = normalize_image_url(image_url)
             if details.get("image_filename") != new_image_filename:
                 details["image_filename"] = new_image_filename
                 changed = True
-    
+
     if "tags" in fields and fields["tags"] is not None:
         tags_list = [t.strip() for t in str(fields["tags"]).split(",") if t.strip()]
-        details["tags"] = tags_list
-        changed = True
+        if details.get("tags") != tags_list:
+            details["tags"] = tags_list
+            changed = True
     if changed:
         details["updated_at"] = now_iso()
-        save_json(details_file, details)
-    return details
+    return changed
+
+
+def update_item(retailer_username, item_id, fields: dict):
+    # A compare-and-swap, so an edit never overwrites a checkout's stock change
+    details = INVENTORY.update(
+        retailer_username,
+        item_id,
+        lambda item: item if apply_item_fields(item, fields) else None,
+    )
+    if not details:
+        return None
+    queue_thumbnails([details])
+    return dict(details)
 
 
 def delete_item(retailer_username, item_id):
-    folder = retailer_item_path(retailer_username, item_id)
-    if folder.exists():
-        shutil.rmtree(folder)
-        return True
-    return False
+    return INVENTORY.delete(retailer_username, item_id)
+
+
+# --------------- HTTP Caching ---------------
+# Validators are computed from stored data before anything is rendered, so a
+# revalidation that ends in 304 skips the template, and every worker derives
+# the same ETag for the same content.
+@lru_cache(maxsize=1)
+def template_version():
+    """Digest of the templates, so a deploy that changes markup changes page ETags."""
+    digest = hashlib.blake2b(digest_size=8)
+    root = Path(app.root_path) / app.template_folder
+    for path in sorted(root.rglob("*.html")):
+        digest.update(str(path.relative_to(root)).encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def etag_for(*parts):
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def item_modified(item):
+    """An item's ``updated_at`` (or ``created_at``) as a datetime for ``Last-Modified``."""
+    for key in ("updated_at", "created_at"):
+        try:
+            stamp = datetime.datetime.fromisoformat((item.get(key) or "").replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        if stamp.tzinfo is None:
+            stamp = stamp.replace(tzinfo=datetime.timezone.utc)
+        return stamp.replace(microsecond=0)
+    return None
+
+
+def thumbnail_version():
+    """``THUMBNAILS.version()``, read once per request so validators and cards agree."""
+    if "thumbnail_version" not in g:
+        g.thumbnail_version = THUMBNAILS.version() if THUMBNAILS is not None else 0
+    return g.thumbnail_version
+
+
+def render_state():
+    """What any rendered template depends on besides its own data."""
+    return [template_version(), thumbnail_version()]
+
+
+def page_state():
+    """``render_state`` plus the signed-in user and cart shown by ``base.html``."""
+    key = cart_key() if session.get("role") == "user" else None
+    return [
+        *render_state(),
+        session.get("username"),
+        session.get("role"),
+        CARTS.count(key) if key else 0,
+    ]
+
+
+def conditional(etag, render, last_modified=None, public=False):
+    """Answer 304 if the client already holds ``etag``, else return what ``render()`` builds.
+
+    ``public`` responses may be stored by shared caches (and reused for
+    ``HTTP_CACHE_MAX_AGE`` seconds); others only by the browser. Both are
+    revalidated before reuse unless a max age applies.
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        resp = make_response(render())
+    else:
+        resp = app.response_class(status=304)
+    resp.set_etag(etag)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    if public:
+        resp.cache_control.public = True
+    else:
+        resp.cache_control.private = True
+    if public and HTTP_CACHE_MAX_AGE > 0:
+        resp.cache_control.max_age = HTTP_CACHE_MAX_AGE
+    else:
+        resp.cache_control.no_cache = True
+    return resp
 
 
 # --------------- Gemini Helpers ---------------
-GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
 DEFAULT_TIMEOUT = 15
 
+GEMINI_BREAKER = CircuitBreaker(GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_RESET)
+# One keep-alive session per process for every REST call to Gemini
+GEMINI_HTTP = GeminiHttp(
+    requests,
+    breaker=GEMINI_BREAKER,
+    pool_size=GEMINI_POOL_SIZE,
+    retries=GEMINI_RETRIES,
+    backoff=GEMINI_RETRY_BACKOFF,
+    connect_timeout=GEMINI_CONNECT_TIMEOUT,
+)
+
+LLM_CACHE = ResponseCache(
+    LLM_CACHE_TTLS,
+    memory_size=LLM_CACHE_SIZE,
+    shared=(
+        SqliteTier(LLM_CACHE_PATH or DATA_DIR / "llm_cache.db")
+        if LLM_CACHE_SHARED == "sqlite"
+        else None
+    ),
+)
+
+
+def gemini_timeout(use_case):
+    return GEMINI_TIMEOUTS.get(use_case, DEFAULT_TIMEOUT)
+
+
+def chat_guard():
+    # REST chat goes through GEMINI_HTTP, which already applies the breaker per request
+    if GEMINI_TRANSPORT == "rest":
+        return contextlib.nullcontext()
+    return GEMINI_BREAKER.guard()
+
+
+def gemini_outcome(exc):
+    if isinstance(exc, CircuitOpenError):
+        return "short_circuit"
+    # requests' ReadTimeout/ConnectTimeout and the SDK's DeadlineExceeded, without importing either
+    name = type(exc).__name__.lower()
+    return "timeout" if "timeout" in name or "deadline" in name else "error"
+
+
+def record_gemini_call(use_case, started, outcome):
+    METRICS.inc("smartshop_gemini_requests_total", use_case=use_case, outcome=outcome)
+    if outcome == "short_circuit":
+        return  # nothing was sent, so there is no latency to record
+    METRICS.observe(
+        "smartshop_gemini_seconds", time.perf_counter() - started, use_case=use_case
+    )
+
 
 # --- Your original _gemini_generate function is kept for any legacy features ---
-def _gemini_generate(model_name: str, prompt_text: str):
+def _gemini_generate(model_name: str, prompt_text: str, use_case: str = "default"):
+    cached = LLM_CACHE.get(use_case, model_name, prompt_text)
+    if cached is not None:
+        return cached
     if not GEMINI_API_KEY:
         print("[Gemini] Missing API key.")
         return None
     url = f"{GEMINI_BASE_URL}/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
     payload = {"contents": [{"role": "user", "parts": [{"text": prompt_text}]}]}
+    started = time.perf_counter()
+    resp = None
     try:
-        resp = requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT)
+        resp = GEMINI_HTTP.post(url, json=payload, timeout=gemini_timeout(use_case))
         if resp.status_code != 200:
+            record_gemini_call(use_case, started, "error")
             print(f"[Gemini] Non-200 status {resp.status_code}: {resp.text[:300]}")
             return None
+        record_gemini_call(use_case, started, "ok")
         data = resp.json()
         candidates = data.get("candidates") or []
         if not candidates:
@@ -381,9 +757,14 @@ def _gemini_generate(model_name: str, prompt_text: str):
         parts = candidates[0].get("content", {}).get("parts", [])
         if not parts:
             return None
-        return parts[0].get("text")
+        text = parts[0].get("text")
+        LLM_CACHE.set(use_case, model_name, prompt_text, text)
+        return text
     except Exception as e:
-        print("[Gemini] Error:", e)
+        if resp is None:
+            record_gemini_call(use_case, started, gemini_outcome(e))
+        if not isinstance(e, CircuitOpenError):  # open breaker: straight to the fallback
+            print("[Gemini] Error:", e)
         return None
 
 
@@ -417,7 +798,7 @@ def call_gemini_recommendation(history_messages, inventory_summary):
         f"{instructions}\nINVENTORY:\n{json.dumps(compact, ensure_ascii=False)}\n"
         f"USER_PREFERENCE:\n{preference}\nRespond ONLY with JSON:"
     )
-    raw = _gemini_generate(GEMINI_RECOMMEND_MODEL, prompt)
+    raw = _gemini_generate(GEMINI_RECOMMEND_MODEL, prompt, use_case="recommend")
     if raw:
         raw_strip = raw.strip()
         candidate_json = None
@@ -461,31 +842,26 @@ def call_gemini_recommendation(history_messages, inventory_summary):
                 return parsed
             except json.JSONDecodeError:
                 print("[Gemini] JSON parse fail.")
-    # Fallback heuristic
-    user_pref = preference.lower()
-    keywords = [w for w in user_pref.split() if len(w) > 3]
-    scored = []
-    for item in inventory_summary:
-        text = " ".join(
-            [
-                item.get("name", ""),
-                item.get("category", ""),
-                " ".join(item.get("tags", [])),
-                item.get("description_short", ""),
-            ]
-        ).lower()
-        score = sum(text.count(k) for k in keywords) * 10
-        scored.append((score, item))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    recs = []
-    for score, itm in scored[:3]:
-        recs.append(
-            {
-                "item_id": itm["item_id"],
-                "reason": "Keyword relevance" if score > 0 else "General fit",
-                "match_score": min(score, 100),
-            }
-        )
+    # Fallback heuristic: rank the offered inventory with the search index
+    keys = {(itm.get("retailer"), str(itm["item_id"])) for itm in inventory_summary}
+    hits = SEARCH.search(preference, limit=3, keys=keys)
+    best = hits[0][0] if hits else 0
+    recs = [
+        {
+            "item_id": itm["item_id"],
+            "reason": "Keyword relevance",
+            "match_score": max(1, round(100 * score / best)),
+        }
+        for score, itm in hits
+    ]
+    chosen = {rec["item_id"] for rec in recs}
+    for itm in inventory_summary:
+        if len(recs) >= 3:
+            break
+        if itm["item_id"] not in chosen:
+            recs.append(
+                {"item_id": itm["item_id"], "reason": "General fit", "match_score": 0}
+            )
     return {
         "recommendations": recs,
         "follow_up_question": "Would you like something different or more details?",
@@ -501,7 +877,7 @@ def call_gemini_faq(question, static_faq):
     )
     ref = "\n".join([f"Q:{f['q']}\nA:{f['a']}" for f in static_faq])
     prompt = f"{scope}\nREFERENCE FAQ:\n{ref}\nUSER QUESTION:\n{question}\nAnswer:"
-    raw = _gemini_generate(GEMINI_FAQ_MODEL, prompt)
+    raw = _gemini_generate(GEMINI_FAQ_MODEL, prompt, use_case="faq")
     if raw:
         ans = raw.strip()
         return ans[:600]
@@ -512,22 +888,21 @@ def call_gemini_faq(question, static_faq):
     return "I can help only with platform usage, accounts, products, and purchase requests."
 
 
-# --- NEW: Stateful Conversational AI Helper using the official SDK ---
-def call_gemini_with_history(user_message, product_context, chat_history):
-    """
-    Calls Gemini Pro with the full conversation history for context-aware responses.
-    """
-    if not GEMINI_API_KEY or GEMINI_API_KEY == 'your-default-key-here':
-        return "AI features are currently disabled. Please configure GEMINI_API_KEY environment variable."
+# Upstream chat calls share a fixed number of slots so a burst of chatters
+# cannot tie up every worker thread waiting on Gemini.
+LLM_SLOTS = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+LLM_EXECUTOR = ThreadPoolExecutor(
+    max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="gemini-chat"
+)
 
-    try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
+AI_DISABLED_MESSAGE = "AI features are currently disabled. Please configure GEMINI_API_KEY environment variable."
+AI_ERROR_MESSAGE = "Sorry, I'm having a little trouble thinking right now. Please try again in a moment."
+AI_BUSY_MESSAGE = "The assistant is busy helping other shoppers right now. Please try again in a moment."
 
-        # The chat object is initialized with the previous conversation for memory
-        chat = model.start_chat(history=chat_history)
 
-        # We construct a message that includes the fresh product context
-        prompt = f"""
+def build_chat_prompt(user_message, product_context):
+    # We construct a message that includes the fresh product context
+    return f"""
         Based ONLY on the CONTEXT below and our conversation history, provide a conversational answer to my latest message.
         Do not mention products that are not in the context. If no products match, say so politely.
 
@@ -539,11 +914,141 @@ def call_gemini_with_history(user_message, product_context, chat_history):
         My latest message is: "{user_message}"
         """
 
-        response = chat.send_message(prompt)
+
+@lru_cache(maxsize=1)
+def chat_model():
+    # One client per process; it holds no per-conversation state
+    if GEMINI_TRANSPORT == "rest":
+        return RestChatModel(
+            GEMINI_CHAT_MODEL,
+            GEMINI_BASE_URL,
+            GEMINI_API_KEY,
+            GEMINI_HTTP,
+            timeout=gemini_timeout("chat"),
+        )
+    return genai.GenerativeModel(GEMINI_CHAT_MODEL)
+
+
+def prompt_token_count(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "prompt_token_count", None) or None
+
+
+def chat_cache_prompt(chat_history, prompt):
+    # The cache key covers the whole conversation so far, not just the latest message
+    return json.dumps(chat_history, ensure_ascii=False) + "\n" + prompt
+
+
+# --- NEW: Stateful Conversational AI Helper using the official SDK ---
+def call_gemini_with_history(user_message, product_context, chat_history):
+    """
+    Calls Gemini Pro with the full conversation history for context-aware responses.
+    """
+    if not GEMINI_API_KEY or GEMINI_API_KEY == 'your-default-key-here':
+        return AI_DISABLED_MESSAGE
+
+    prompt = build_chat_prompt(user_message, product_context)
+    cache_prompt = chat_cache_prompt(chat_history, prompt)
+    cached = LLM_CACHE.get("chat", GEMINI_CHAT_MODEL, cache_prompt)
+    if cached is not None:
+        return cached
+
+    if not LLM_SLOTS.acquire(timeout=LLM_QUEUE_TIMEOUT):
+        return AI_BUSY_MESSAGE
+    started = time.perf_counter()
+    response = None
+    try:
+        # The chat object is initialized with the previous conversation for memory
+        chat = chat_model().start_chat(history=chat_history)
+
+        with chat_guard():
+            response = chat.send_message(
+                prompt, request_options={"timeout": gemini_timeout("chat")}
+            )
+        record_gemini_call("chat", started, "ok")
+        CHAT_CONTEXT.record(chat_history, prompt, prompt_token_count(response))
+        LLM_CACHE.set("chat", GEMINI_CHAT_MODEL, cache_prompt, response.text)
         return response.text
     except Exception as e:
-        print(f"[Gemini Stateful Chat] Error: {e}")
-        return "Sorry, I'm having a little trouble thinking right now. Please try again in a moment."
+        if response is None:
+            record_gemini_call("chat", started, gemini_outcome(e))
+        if not isinstance(e, CircuitOpenError):
+            print(f"[Gemini Stateful Chat] Error: {e}")
+        return AI_ERROR_MESSAGE
+    finally:
+        LLM_SLOTS.release()
+
+
+def stream_gemini_with_history(user_message, product_context, chat_history, heartbeat=10):
+    """
+    Streaming variant of call_gemini_with_history. Yields text chunks as Gemini
+    produces them, or None every ``heartbeat`` seconds while still waiting.
+    """
+    if not GEMINI_API_KEY or GEMINI_API_KEY == 'your-default-key-here':
+        yield AI_DISABLED_MESSAGE
+        return
+
+    prompt = build_chat_prompt(user_message, product_context)
+    cache_prompt = chat_cache_prompt(chat_history, prompt)
+    cached = LLM_CACHE.get("chat", GEMINI_CHAT_MODEL, cache_prompt)
+    if cached is not None:
+        yield cached
+        return
+
+    if not LLM_SLOTS.acquire(timeout=LLM_QUEUE_TIMEOUT):
+        yield AI_BUSY_MESSAGE
+        return
+
+    # The upstream call runs on the executor and hands chunks over a queue, so
+    # this generator only ever blocks for one heartbeat at a time.
+    chunks = queue.Queue()
+    done = object()
+    history = list(chat_history)
+
+    def produce():
+        started = time.perf_counter()
+        try:
+            chat = chat_model().start_chat(history=history)
+            tokens = None
+            with chat_guard():
+                for chunk in chat.send_message(
+                    prompt, stream=True, request_options={"timeout": gemini_timeout("chat")}
+                ):
+                    tokens = prompt_token_count(chunk) or tokens
+                    if chunk.text:
+                        chunks.put(chunk.text)
+            record_gemini_call("chat_stream", started, "ok")
+            CHAT_CONTEXT.record(history, prompt, tokens)
+            chunks.put(done)
+        except Exception as e:
+            record_gemini_call("chat_stream", started, gemini_outcome(e))
+            if not isinstance(e, CircuitOpenError):
+                print(f"[Gemini Stateful Chat] Stream error: {e}")
+            chunks.put(e)
+        finally:
+            LLM_SLOTS.release()
+
+    try:
+        LLM_EXECUTOR.submit(produce)
+    except Exception:
+        LLM_SLOTS.release()
+        raise
+
+    parts = []
+    while True:
+        try:
+            chunk = chunks.get(timeout=heartbeat)
+        except queue.Empty:
+            yield None
+            continue
+        if chunk is done:
+            break
+        if isinstance(chunk, Exception):
+            yield ("\n\n" if parts else "") + AI_ERROR_MESSAGE
+            return
+        parts.append(chunk)
+        yield chunk
+    LLM_CACHE.set("chat", GEMINI_CHAT_MODEL, cache_prompt, "".join(parts))
 
 
 # --------------- Chat Session Helpers ---------------
@@ -590,7 +1095,7 @@ def create_chat_session():
             "content": "I have gathered all the details of items - can you describe what type of item you would like to purchase?",
         }
     ]
-    CHAT_SESSIONS[session_id] = {"history": history, "created_at": now_iso()}
+    CHAT_STORE.create(session_id, history, now_iso())
     session["current_chat_session_id"] = session_id
     return session_id, history[-1]["content"]
 
@@ -600,9 +1105,11 @@ def ensure_active_chat_session(provided_session_id: str | None):
     """
     Retrieves an existing chat session or creates a new one with a proper greeting.
     """
-    if provided_session_id and provided_session_id in CHAT_SESSIONS:
-        # Return existing session
-        return provided_session_id, CHAT_SESSIONS[provided_session_id]
+    if provided_session_id:
+        existing = CHAT_STORE.get(provided_session_id)
+        if existing is not None:
+            # Return existing session
+            return provided_session_id, existing
 
     # If no session or invalid session, create a new one
     session_id = str(uuid.uuid4())
@@ -621,27 +1128,45 @@ def ensure_active_chat_session(provided_session_id: str | None):
         },
     ]
 
-    CHAT_SESSIONS[session_id] = {"history": history, "created_at": now_iso()}
+    chat_session_data = CHAT_STORE.create(session_id, history, now_iso())
     session["current_chat_session_id"] = session_id  # Keep track in user session
-    return session_id, CHAT_SESSIONS[session_id]
+    return session_id, chat_session_data
 
 
 # --------------- Orders & Cart ---------------
-def load_orders_data():
-    data = load_json(PURCHASE_FILE, {"requests": [], "orders": []})
-    if "orders" not in data:
-        data["orders"] = []
-    return data
+QR_CACHE = QrCache(DATA_DIR / "qr_cache", memory_size=QR_CACHE_SIZE)
 
 
-def save_orders_data(data):
-    save_json(PURCHASE_FILE, data)
+def get_order(order_id):
+    return STORAGE.get_order(order_id)
+
+
+def settle_released_order(reservation, reason):
+    """Mark an unpaid order whose stock hold was released as expired or cancelled."""
+    order = get_order(reservation["order_id"])
+    if order and order.get("status") == "pending_payment":
+        order["status"] = reason
+        order["updated_at"] = now_iso()
+        STORAGE.add_order(order)
+
+
+# Stock held for unpaid orders; see stock.py
+STOCK = StockEngine(
+    INVENTORY,
+    STORAGE,
+    ttl=STOCK_RESERVATION_TTL,
+    sweep_interval=STOCK_SWEEP_INTERVAL,
+    on_release=settle_released_order,
+)
 
 
 def create_order(user, items, contact):
-    data = load_orders_data()
+    """Reserve stock for ``items`` and record the order; raises ``OutOfStock`` if short."""
     order_id = str(uuid.uuid4())
-    total_amount = sum(i.get("price", 0) for i in items)
+    reservation = STOCK.reserve(
+        order_id, [(i["retailer"], i["item_id"], i.get("quantity", 1)) for i in items]
+    )
+    total_amount = sum(i.get("price", 0) * i.get("quantity", 1) for i in items)
     order = {
         "order_id": order_id,
         "user": user,
@@ -650,6 +1175,7 @@ def create_order(user, items, contact):
                 "item_id": i["item_id"],
                 "retailer": i["retailer"],
                 "price": i.get("price", 0),
+                "quantity": i.get("quantity", 1),
             }
             for i in items
         ],
@@ -658,29 +1184,20 @@ def create_order(user, items, contact):
         "total_amount": total_amount,
         "created_at": now_iso(),
     }
-    data["orders"].append(order)
-    save_orders_data(data)
+    if reservation["expires_at"] is not None:
+        expires = datetime.datetime.utcfromtimestamp(reservation["expires_at"])
+        order["reserved_until"] = expires.replace(microsecond=0).isoformat() + "Z"
+    try:
+        STORAGE.add_order(order)
+    except Exception:
+        STOCK.release(order_id, "failed")
+        raise
+    QR_CACHE.warm(order_id, upi_payload(order))
     return order
 
 
-def generate_qr_base64(data_text: str):
-    try:
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=6,
-            border=2,
-        )
-        qr.add_data(data_text)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        buf = BytesIO()
-        img.save(buf, format="PNG")
-        return base64.b64encode(buf.getvalue()).decode()
-    except Exception as e:
-        print(f"QR generation error: {e}")
-        # Return a simple base64 encoded placeholder image
-        return "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+def upi_payload(order):
+    return f"upi://pay?pa={UPI_ID}&pn=SmartShop&tr={order['order_id']}&am={order['total_amount']}&cu=INR"
 
 
 # --------------- Routes: Auth / Pages ---------------
@@ -715,8 +1232,8 @@ def login():
     username = request.form.get("username", "").strip()
     password = request.form.get("password", "").strip()
     role = request.form.get("role")
-    acct = get_account(username)
-    if not acct or acct["password"] != password or acct["role"] != role:
+    acct = ACCOUNTS.authenticate(username, password)
+    if not acct or acct["role"] != role:
         return render_template(
             "login.html", error="Invalid credentials or role mismatch."
         )
@@ -752,27 +1269,35 @@ def logout():
 def user_app():
     if session.get("role") != "user":
         return redirect(url_for("home"))
-    items = list(iter_all_items())
-    counts = load_json(COUNT_FILE, {})
-    faqs = load_json(FAQ_FILE, {})
-    cart = session.get("cart", [])
-    return render_template(
-        "user_app.html",
-        items=items,
-        counts=counts.get("recommendation_ratings", {}),
-        faqs=faqs.get("static_faq", []),
-        cart_count=len(cart),
+    filters = catalog_filters(request.args)
+    counts = RATINGS.totals()
+    faqs = STORAGE.get_static_faq()
+    etag = etag_for(
+        "app", INVENTORY.catalog_version(), catalog_query(filters), counts, faqs, page_state()
     )
 
+    def render():
+        items, next_cursor = catalog_page(filters)
+        return render_template(
+            "user_app.html",
+            items=items,
+            next_cursor=next_cursor,
+            catalog_query=catalog_query(filters),
+            counts=counts,
+            faqs=faqs,
+        )
+
+    return conditional(etag, render)
+
 
 @app.route("/store")
 def retailer_store():
     if session.get("role") != "retailer":
         return redirect(url_for("home"))
     username = session["username"]
-    items = [i for i in iter_all_items() if i.get("retailer") == username]
-    faqs = load_json(FAQ_FILE, {}).get("static_faq", [])
-    counts = load_json(COUNT_FILE, {}).get("recommendation_ratings", {})
+    items = INVENTORY.for_retailer(username)
+    faqs = STORAGE.get_static_faq()
+    counts = RATINGS.totals()
     return render_template("retailer_store.html", items=items, counts=counts, faqs=faqs)
 
 
@@ -808,20 +1333,42 @@ def product_page(retailer, item_id):
     item = get_item(retailer, item_id)
     if not item:
         abort(404)
-    cart = session.get("cart", [])
-    in_cart = any(c["item_id"] == item_id and c["retailer"] == retailer for c in cart)
-    return render_template("product.html", item=item, in_cart=in_cart)
+    key = cart_key()
+    in_cart = key is not None and CARTS.contains(key, retailer, item_id)
+    signed_in = "username" in session
+    return conditional(
+        etag_for("product", item, in_cart, page_state()),
+        lambda: render_template("product.html", item=item, in_cart=in_cart),
+        # the item's date says nothing about the cart shown to a signed-in user
+        None if signed_in else item_modified(item),
+        public=not signed_in,
+    )
+
+
+THUMBNAIL_NAME_RE = re.compile(r"^([0-9a-f]{64})-(\d+)w$")
 
 
 @app.route("/uploads/<retailer>/<item_id>/<filename>")
 def serve_image(retailer, item_id, filename):
+    thumb = THUMBNAIL_NAME_RE.match(filename)
+    if thumb and THUMBNAILS is not None:
+        # Named by content hash, so a thumbnail URL never changes what it serves
+        ext = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpg"
+        path = THUMBNAILS.find(thumb.group(1), int(thumb.group(2)), ext)
+        if path is None:
+            abort(404)
+        resp = send_file(path, mimetype=THUMBNAIL_FORMATS[ext], max_age=365 * 86400)
+        resp.cache_control.immutable = True
+        resp.vary.add("Accept")
+        return resp
+
     # First check if it's a URL (for new image handling)
     if filename.startswith(('http://', 'https://')):
         return redirect(filename)
     
     # For backward compatibility with existing file uploads
-    folder = UPLOAD_DIR / retailer / item_id
-    if not folder.exists():
+    folder = UPLOADS.find_file(retailer, item_id, filename)
+    if folder is None:
         abort(404)
     return send_from_directory(str(folder), filename)
 
@@ -860,7 +1407,11 @@ def get_product_details_new(item_id):
     if item:
         # The frontend expects a 'description' field, so we provide the full one
         item["description"] = item.get("description_full", "")
-        return jsonify({"ok": True, "item": item})
+        return conditional(
+            etag_for("details", item),
+            lambda: jsonify({"ok": True, "item": item}),
+            item_modified(item),
+        )
     else:
         return jsonify({"ok": False, "error": "Product not found."}), 404
 
@@ -893,20 +1444,241 @@ def update_product_new(item_id):
         return jsonify({"ok": False, "error": "Update failed or item not found."}), 404
 
 
+@app.route("/api/items")
+def api_items():
+    filters = catalog_filters(request.args)
+    try:
+        limit = max(1, min(int(request.args.get("limit", CATALOG_PAGE_SIZE)), 100))
+    except ValueError:
+        limit = CATALOG_PAGE_SIZE
+    cursor = request.args.get("cursor")
+    try:
+        if cursor:
+            decode_cursor(cursor, filters["sort"])
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    html = bool(request.args.get("html"))
+    etag = etag_for(
+        "items", INVENTORY.catalog_version(), catalog_query(filters), cursor, limit,
+        render_state() if html else None,
+    )
+
+    def render():
+        items, next_cursor = catalog_page(filters, cursor, limit)
+        payload = {"ok": True, "items": items, "next_cursor": next_cursor}
+        if html:
+            payload["html"] = "".join(
+                render_template("partials/_product_card.html", item=item) for item in items
+            )
+        return jsonify(payload)
+
+    return conditional(etag, render, public=True)
+
+
+# --------------- Bulk Catalog ---------------
+def import_catalog(retailer, rows, mode="upsert", dry_run=False):
+    """Apply ``(line, row)`` pairs from ``catalog_io.iter_rows`` in batches.
+
+    One inventory snapshot per batch decides which rows update an existing
+    item and which create one. Updates merge only the fields a row carries
+    into the stored item at write time, through one ``INVENTORY.update_many``
+    compare-and-swap per batch, so a concurrent edit or checkout is never
+    overwritten with snapshot values. New items are written together with
+    ``INVENTORY.save_many``. Yields a
+    progress report after every batch; the last one carries ``"done": True``
+    and the row errors.
+    """
+    report = {"rows": 0, "created": 0, "updated": 0, "unchanged": 0, "failed": 0, "batches": 0}
+    errors = []
+
+    def fail(line, item_id, message):
+        report["failed"] += 1
+        if len(errors) < BULK_MAX_ERRORS:
+            errors.append({"row": line, "item_id": item_id, "error": message})
+
+    def apply(batch):
+        keys = [(retailer, item_id) for _, item_id, _ in batch if item_id]
+        existing = {str(item["item_id"]): item for item in INVENTORY.get_many(keys)}
+        edits = {}  # item_id -> [(line, fields)] for existing items, in row order
+        created = {}  # item_id -> details; later rows for the same id build on earlier ones
+        for line, item_id, fields in batch:
+            if item_id in existing:
+                edits.setdefault(item_id, []).append((line, fields))
+                continue
+            if item_id in created:
+                changed = apply_item_fields(created[item_id], fields)
+                report["updated" if changed else "unchanged"] += 1
+                continue
+            if mode == "update":
+                fail(line, item_id, "No such item" if item_id else "item_id is required")
+            elif item_id and INVENTORY.find(item_id):
+                fail(line, item_id, "item_id belongs to another retailer")
+            elif not fields.get("name"):
+                fail(line, item_id, "name is required for new items")
+            else:
+                details = build_item(
+                    retailer,
+                    {
+                        "name": fields["name"],
+                        "category": fields.get("category", "other"),
+                        "description": fields.get("description_full", ""),
+                        "price": fields.get("price", 0),
+                        "stock": fields.get("stock", 0),
+                        "tags": fields.get("tags", ""),
+                    },
+                    fields.get("image_url"),
+                    item_id,
+                )
+                created[details["item_id"]] = details
+                report["created"] += 1
+        row_changes = {}  # item_id -> whether each of its rows changed anything, from the last merge
+
+        def merger(item_id):
+            def merge(item):
+                flags = row_changes[item_id] = [
+                    apply_item_fields(item, fields) for _, fields in edits[item_id]
+                ]
+                return item if any(flags) else None
+
+            return merge
+
+        mutations = {item_id: merger(item_id) for item_id in edits}
+        if dry_run:
+            results = {
+                item_id: merge(dict(existing[item_id])) for item_id, merge in mutations.items()
+            }
+        elif mutations:
+            try:
+                results = INVENTORY.update_many(retailer, mutations)
+            except WriteConflict as e:
+                results = e.results
+                for item_id in e.item_ids:
+                    for line, _ in edits[item_id]:
+                        fail(line, item_id, "Item is busy, try again")
+        else:
+            results = {}
+        updated = []
+        for item_id, item in results.items():
+            if item is None and not dry_run:
+                for line, _ in edits[item_id]:
+                    fail(line, item_id, "No such item")
+                continue
+            flags = row_changes.get(item_id, [])
+            report["updated"] += sum(flags)
+            report["unchanged"] += len(flags) - sum(flags)
+            if any(flags):
+                updated.append(item)
+        if not dry_run:
+            if created:
+                INVENTORY.save_many(list(created.values()))
+            queue_thumbnails(updated + list(created.values()))
+        report["batches"] += 1
+
+    batch = []
+    for line, row in rows:
+        report["rows"] += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            item_id, fields = clean_row(row)
+        except RowError as e:
+            fail(line, row.get("item_id") if isinstance(row, dict) else None, str(e))
+            continue
+        batch.append((line, item_id, fields))
+        if len(batch) >= BULK_BATCH_SIZE:
+            apply(batch)
+            batch = []
+            yield dict(report, done=False)
+    if batch:
+        apply(batch)
+    errors.sort(key=lambda e: e["row"] or 0)
+    yield dict(report, done=True, dry_run=dry_run, errors=errors)
+
+
+@app.route("/store/import", methods=["POST"])
+def import_products():
+    """Create or update many products from a CSV or JSON Lines upload.
+
+    Send the file as multipart ``file`` or as the raw request body. The query
+    takes ``format=csv|jsonl`` (otherwise guessed from the file name or
+    content type), ``mode=upsert|update``, ``dry_run=1``, and ``progress=1``
+    to stream one NDJSON report line per batch.
+    """
+    if session.get("role") != "retailer":
+        return jsonify({"ok": False, "error": "Not authorized"}), 403
+    upload = request.files.get("file")
+    fmt = format_for(
+        upload.filename if upload else None,
+        upload.mimetype if upload else request.mimetype,
+        request.args.get("format"),
+    )
+    if fmt is None:
+        return jsonify({"ok": False, "error": "Unknown format; use format=csv or format=jsonl"}), 400
+    mode = request.args.get("mode", "upsert")
+    if mode not in ("upsert", "update"):
+        return jsonify({"ok": False, "error": "mode must be upsert or update"}), 400
+    reports = import_catalog(
+        session["username"],
+        iter_rows(upload.stream if upload else request.stream, fmt),
+        mode=mode,
+        dry_run=request.args.get("dry_run") in ("1", "true"),
+    )
+    if request.args.get("progress") in ("1", "true"):
+        return Response(
+            stream_with_context(json.dumps(r) + "\n" for r in reports),
+            mimetype="application/x-ndjson",
+        )
+    for report in reports:
+        pass
+    return jsonify({"ok": True, **report})
+
+
+@app.route("/store/export")
+def export_products():
+    if session.get("role") != "retailer":
+        return jsonify({"ok": False, "error": "Not authorized"}), 403
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "jsonl"):
+        return jsonify({"ok": False, "error": "format must be csv or jsonl"}), 400
+    items = sorted(
+        INVENTORY.for_retailer(session["username"]),
+        key=lambda item: (item.get("created_at") or "", str(item["item_id"])),
+    )
+    return Response(
+        stream_with_context(export_lines(items, fmt)),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="products.{fmt}"'},
+    )
+
+
+@app.route("/store/items/batch_update", methods=["POST"])
+def batch_update_products():
+    """Update price, stock or any other field of many existing products in one request.
+
+    Body: ``{"updates": [{"item_id": "...", "price": 9.99, "stock": 5}, ...]}``.
+    """
+    if session.get("role") != "retailer":
+        return jsonify({"ok": False, "error": "Not authorized"}), 403
+    data = request.get_json(silent=True)
+    updates = data.get("updates") if isinstance(data, dict) else data
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"ok": False, "error": "updates must be a non-empty list"}), 400
+    rows = (
+        (n, row if isinstance(row, dict) else RowError("Each update must be an object"))
+        for n, row in enumerate(updates, start=1)
+    )
+    for report in import_catalog(session["username"], rows, mode="update"):
+        pass
+    return jsonify({"ok": True, **report})
+
+
 # --------------- Cart ---------------
 @app.route("/cart")
 def cart_page():
     if session.get("role") != "user":
         return redirect(url_for("home"))
-    cart = session.get("cart", [])
     # Resolve item details
-    resolved = []
-    total = 0
-    for c in cart:
-        itm = get_item(c["retailer"], c["item_id"])
-        if itm:
-            resolved.append(itm)
-            total += float(itm.get("price", 0))
+    resolved, total = cart_items()
     return render_template("cart.html", items=resolved, total=total)
 
 
@@ -920,14 +1692,30 @@ def cart_add():
         retailer = data.get("retailer")
         if not item_id or not retailer:
             return jsonify({"ok": False, "error": "Missing data"}), 400
+        quantity = data.get("quantity")
+        if quantity is not None:
+            try:
+                quantity = int(quantity)
+            except (TypeError, ValueError):
+                return jsonify({"ok": False, "error": "Quantity must be a whole number"}), 400
+            if quantity < 0:
+                return jsonify({"ok": False, "error": "Quantity must be zero or more"}), 400
         item = get_item(retailer, item_id)
         if not item:
             return jsonify({"ok": False, "error": "Item not found"}), 404
-        cart = session.get("cart", [])
-        if not any(c["item_id"] == item_id and c["retailer"] == retailer for c in cart):
-            cart.append({"item_id": item_id, "retailer": retailer})
-        session["cart"] = cart
-        return jsonify({"ok": True, "count": len(cart)})
+        stock = int(item.get("stock") or 0)
+        if quantity is not None and quantity > stock:
+            return jsonify({"ok": False, "error": f"Only {stock} left"}), 409
+        key = cart_key(create=True)
+        if quantity is not None:
+            count = CARTS.set_quantity(key, retailer, item_id, quantity)
+        elif CARTS.contains(key, retailer, item_id):
+            count = CARTS.count(key)
+        else:
+            count = CARTS.set_quantity(key, retailer, item_id, 1)
+        return jsonify({"ok": True, "count": count})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     except Exception as e:
         print(f"Cart add error: {e}")
         return jsonify({"ok": False, "error": "Failed to add to cart"}), 500
@@ -941,12 +1729,11 @@ def cart_remove():
         data = request.get_json() or {}
         item_id = data.get("item_id")
         retailer = data.get("retailer")
-        cart = session.get("cart", [])
-        new_cart = [
-            c for c in cart if not (c["item_id"] == item_id and c["retailer"] == retailer)
-        ]
-        session["cart"] = new_cart
-        return jsonify({"ok": True, "count": len(new_cart)})
+        if not item_id or not retailer:
+            return jsonify({"ok": False, "error": "Missing data"}), 400
+        key = cart_key()
+        count = CARTS.set_quantity(key, retailer, item_id, 0) if key else 0
+        return jsonify({"ok": True, "count": count})
     except Exception as e:
         print(f"Cart remove error: {e}")
         return jsonify({"ok": False, "error": "Failed to remove from cart"}), 500
@@ -956,7 +1743,9 @@ def cart_remove():
 def cart_clear():
     if session.get("role") != "user":
         return jsonify({"ok": False, "error": "Not authorized"}), 403
-    session["cart"] = []
+    key = cart_key()
+    if key:
+        CARTS.clear(key)
     return jsonify({"ok": True})
 
 
@@ -998,15 +1787,21 @@ def order_create():
         items = [item]
     else:
         # cart mode
-        cart = session.get("cart", [])
-        for c in cart:
-            itm = get_item(c["retailer"], c["item_id"])
-            if itm:
-                items.append(itm)
+        items, _ = cart_items()
         if not items:
             return jsonify({"ok": False, "error": "Cart is empty"}), 400
 
-    order = create_order(session["username"], items, contact)
+    try:
+        order = create_order(session["username"], items, contact)
+    except OutOfStock as e:
+        item = get_item(e.retailer, e.item_id) or {}
+        name = item.get("name", "An item")
+        error = f"{name} is out of stock" if not e.available else f"Only {e.available} left of {name}"
+        return jsonify({"ok": False, "error": error}), 409
+    except LookupError:
+        return jsonify({"ok": False, "error": "Item not found"}), 404
+    except WriteConflict:
+        return jsonify({"ok": False, "error": "Checkout is busy, please try again"}), 503
     return jsonify(
         {"ok": True, "order_id": order["order_id"], "total": order["total_amount"]}
     )
@@ -1015,22 +1810,39 @@ def order_create():
 @app.route("/order/<order_id>/qr")
 def order_qr(order_id):
     try:
-        data = load_orders_data()
-        order = next((o for o in data["orders"] if o["order_id"] == order_id), None)
+        order = get_order(order_id)
         if not order:
             return jsonify({"ok": False, "error": "Order not found"}), 404
-        payload = f"upi://pay?pa={UPI_ID}&pn=SmartShop&tr={order_id}&am={order['total_amount']}&cu=INR"
-        img_b64 = generate_qr_base64(payload)
-        return jsonify({"ok": True, "image": img_b64, "upi_payload": payload})
+        payload = upi_payload(order)
+        # Render now so the image request that follows is a cache hit
+        _, etag = QR_CACHE.get(order_id, payload)
+        image_url = url_for("order_qr_png", order_id=order_id, v=etag)
+        return jsonify({"ok": True, "image_url": image_url, "upi_payload": payload})
     except Exception as e:
         print(f"QR generation error: {e}")
         return jsonify({"ok": False, "error": "Failed to generate QR code"}), 500
 
 
+@app.route("/order/<order_id>/qr.png")
+def order_qr_png(order_id):
+    order = get_order(order_id)
+    if not order:
+        abort(404)
+    try:
+        png, etag = QR_CACHE.get(order_id, upi_payload(order))
+    except Exception as e:
+        print(f"QR generation error: {e}")
+        abort(500)
+    resp = Response(png, mimetype="image/png")
+    resp.set_etag(etag)
+    resp.cache_control.private = True
+    resp.cache_control.max_age = 86400
+    return resp.make_conditional(request)
+
+
 @app.route("/order/<order_id>/verify", methods=["POST"])
 def order_verify(order_id):
-    data = load_orders_data()
-    order = next((o for o in data["orders"] if o["order_id"] == order_id), None)
+    order = get_order(order_id)
     if not order:
         return jsonify({"ok": False, "error": "Order not found"}), 404
     return jsonify(
@@ -1043,14 +1855,7 @@ def order_verify(order_id):
 def cart_checkout():
     if session.get("role") != "user":
         return redirect(url_for("home"))
-    cart = session.get("cart", [])
-    resolved = []
-    total = 0
-    for c in cart:
-        itm = get_item(c["retailer"], c["item_id"])
-        if itm:
-            resolved.append(itm)
-            total += float(itm.get("price", 0))
+    resolved, total = cart_items()
     if not resolved:
         return redirect(url_for("cart_page"))
     return render_template("place_order.html", mode="cart", items=resolved, total=total)
@@ -1083,22 +1888,72 @@ def assistant_chat():
     if not user_message:
         return jsonify({"ok": False, "error": "Message cannot be empty."}), 400
 
-    # Step 0: Get the current or a new chat session with history
-    session_id, chat_session_data = ensure_active_chat_session(session_id)
-    chat_history = chat_session_data.get("history", [])
+    session_id, chat_history, relevant_items, product_context = prepare_assistant_turn(
+        user_message, session_id
+    )
+
+    # Step 4: Generate - Get a conversational response from Gemini using the history
+    ai_response = call_gemini_with_history(user_message, product_context, chat_history)
+    ai_response += recommended_links(relevant_items)
+    record_assistant_turn(session_id, user_message, ai_response)
+
+    return jsonify({"ok": True, "response": ai_response, "session_id": session_id})
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/api/assistant_chat/stream", methods=["POST"])
+def assistant_chat_stream():
+    """Same turn as /api/assistant_chat, delivered token by token as Server-Sent Events."""
+    if "username" not in session:
+        return jsonify({"ok": False, "error": "Not authenticated"}), 401
+
+    data = request.json or {}
+    user_message = data.get("message", "").strip()
+    session_id = data.get("session_id")
+
+    if not user_message:
+        return jsonify({"ok": False, "error": "Message cannot be empty."}), 400
 
-    # Step 1: Retrieve all items from your file-based system
-    all_items = list(iter_all_items())
+    session_id, chat_history, relevant_items, product_context = prepare_assistant_turn(
+        user_message, session_id
+    )
 
-    # Step 2: Filter for relevant items based on the user's message
-    relevant_items = []
-    search_words = [word for word in user_message.lower().split() if len(word) > 2]
+    def events():
+        yield sse_event("session", {"session_id": session_id})
+        parts = []
+        for chunk in stream_gemini_with_history(user_message, product_context, chat_history):
+            if chunk is None:
+                yield ": keep-alive\n\n"
+                continue
+            parts.append(chunk)
+            yield sse_event("token", {"text": chunk})
+        links = recommended_links(relevant_items)
+        if links:
+            parts.append(links)
+            yield sse_event("token", {"text": links})
+        record_assistant_turn(session_id, user_message, "".join(parts))
+        yield sse_event("done", {"session_id": session_id})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def prepare_assistant_turn(user_message, session_id):
+    # Step 0: Get the current or a new chat session with history
+    session_id, chat_session_data = ensure_active_chat_session(session_id)
+    # Older turns arrive folded into a summary; only recent ones go verbatim
+    chat_history = CHAT_CONTEXT.assemble(
+        chat_session_data.get("history", []), chat_session_data.get("summary", "")
+    )
 
-    if search_words:
-        for item in all_items:
-            item_text = f"{item['name']} {item['category']} {item['description_full']} {' '.join(item.get('tags', []))}".lower()
-            if any(word in item_text for word in search_words):
-                relevant_items.append(item)
+    # Step 1-2: Retrieve the most relevant items from the search index
+    relevant_items = [item for _, item in SEARCH.search(user_message, limit=5)]
 
     # Step 3: Augment - Create a context string for the AI with product links
     product_context = "No specific products found for that query. You can ask the user for more details, like their budget or preferred features."
@@ -1109,23 +1964,30 @@ def assistant_chat():
             product_context += f"- **{item['name']}** (${item.get('price', 0):.2f})\n"
             product_context += f"  Description: {item['description_short']}\n"
             product_context += f"  Product Page: {product_url}\n\n"
+    return session_id, chat_history, relevant_items, product_context
 
-    # Step 4: Generate - Get a conversational response from Gemini using the history
-    ai_response = call_gemini_with_history(user_message, product_context, chat_history)
-    
+
+def recommended_links(relevant_items):
     # Step 5: Enhance AI response with clickable product links
-    if relevant_items:
-        ai_response += "\n\n**Here are the recommended products:**\n"
-        for item in relevant_items[:3]:  # Show top 3 recommendations
-            product_url = f"/product/{item['retailer']}/{item['item_id']}"
-            ai_response += f"\n🔗 [{item['name']}]({product_url}) - ${item.get('price', 0):.2f}\n"
-            ai_response += f"   *{item['description_short']}*\n"
+    if not relevant_items:
+        return ""
+    links = "\n\n**Here are the recommended products:**\n"
+    for item in relevant_items[:3]:  # Show top 3 recommendations
+        product_url = f"/product/{item['retailer']}/{item['item_id']}"
+        links += f"\n🔗 [{item['name']}]({product_url}) - ${item.get('price', 0):.2f}\n"
+        links += f"   *{item['description_short']}*\n"
+    return links
 
-    # Update the history with the new turn
-    chat_history.append({"role": "user", "parts": [{"text": user_message}]})
-    chat_history.append({"role": "model", "parts": [{"text": ai_response}]})
 
-    return jsonify({"ok": True, "response": ai_response, "session_id": session_id})
+def record_assistant_turn(session_id, user_message, ai_response):
+    # Update the history with the new turn
+    CHAT_STORE.append(
+        session_id,
+        [
+            {"role": "user", "parts": [{"text": user_message}]},
+            {"role": "model", "parts": [{"text": ai_response}]},
+        ],
+    )
 
 
 # --------------- Ratings / FAQ ---------------
@@ -1135,13 +1997,7 @@ def chat_rate():
     rating = data.get("rating", "").lower()
     if rating not in ("excellent", "good", "bad"):
         return jsonify({"ok": False, "error": "Invalid rating"}), 400
-    counts = load_json(COUNT_FILE, {})
-    rec = counts.setdefault(
-        "recommendation_ratings", {"excellent": 0, "good": 0, "bad": 0}
-    )
-    rec[rating] = rec.get(rating, 0) + 1
-    counts["last_updated"] = now_iso()
-    save_json(COUNT_FILE, counts)
+    rec = RATINGS.incr(rating)
     return jsonify({"ok": True, "counts": rec})
 
 
@@ -1151,9 +2007,8 @@ def faq_ask():
     question = data.get("question", "").strip()
     if not question:
         return jsonify({"ok": False, "error": "Empty question"}), 400
-    faq_data = load_json(FAQ_FILE, {"static_faq": [], "dynamic_log": []})
-    answer = call_gemini_faq(question, faq_data.get("static_faq", []))
-    faq_data.setdefault("dynamic_log", []).append(
+    answer = call_gemini_faq(question, STORAGE.get_static_faq())
+    STORAGE.append_faq_log(
         {
             "id": str(uuid.uuid4()),
             "user": session.get("username", "anonymous"),
@@ -1162,15 +2017,198 @@ def faq_ask():
             "ts": now_iso(),
         }
     )
-    save_json(FAQ_FILE, faq_data)
     return jsonify({"ok": True, "answer": answer})
 
 
 # --------------- Counts Utility ---------------
 @app.route("/counts")
 def get_counts():
-    counts = load_json(COUNT_FILE, {})
-    return jsonify(counts.get("recommendation_ratings", {}))
+    totals = RATINGS.totals()
+    return conditional(etag_for("counts", totals), lambda: jsonify(totals), public=True)
+
+
+# --------------- Metrics / Profiling ---------------
+METRICS.histogram("smartshop_http_request_seconds", "Request latency by route, method and status.")
+METRICS.histogram("smartshop_gemini_seconds", "Gemini call latency by use case.")
+METRICS.counter(
+    "smartshop_gemini_requests_total",
+    "Gemini calls by use case and outcome (ok, error, timeout, short_circuit).",
+)
+PROFILER = (
+    SlowRequestProfiler(
+        PROFILE_DIR or DATA_DIR / "profiles",
+        threshold=PROFILE_SLOW_MS / 1000,
+        interval=PROFILE_INTERVAL_MS / 1000,
+    )
+    if PROFILE_SLOW_MS > 0
+    else None
+)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILER is not None:
+        g.profile_token = PROFILER.start()
+
+
+@app.after_request
+def note_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def record_request(exc=None):
+    # Teardown runs after a streamed body finishes, so SSE chats are timed end to end
+    started = g.pop("request_started", None)
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    METRICS.observe(
+        "smartshop_http_request_seconds",
+        time.perf_counter() - started,
+        route=route,
+        method=request.method,
+        status=g.pop("response_status", 500),
+    )
+    token = g.pop("profile_token", None)
+    if token is not None:
+        try:
+            path = PROFILER.stop(token, f"{request.method} {route}")
+            if path:
+                print(f"[Profiler] Slow request {request.method} {request.path}: {path}")
+        except Exception as e:
+            print(f"[Profiler] Could not write profile: {e}")
+
+
+def collect_app_metrics():
+    cache = LLM_CACHE.stats()
+    sessions = CHAT_STORE.stats()
+    context = CHAT_CONTEXT.stats()
+    per_use_case = cache["use_cases"].items()
+    return [
+        ("smartshop_llm_cache_hits_total", "counter", "Gemini response cache hits.",
+         [({"use_case": u}, s["hits"]) for u, s in per_use_case]),
+        ("smartshop_llm_cache_misses_total", "counter", "Gemini response cache misses.",
+         [({"use_case": u}, s["misses"]) for u, s in per_use_case]),
+        ("smartshop_llm_cache_hit_ratio", "gauge", "Gemini response cache hit ratio.",
+         [({"use_case": u}, s["hit_ratio"]) for u, s in per_use_case]),
+        ("smartshop_llm_cache_entries", "gauge", "Entries in the in-process Gemini cache.",
+         [({}, cache["entries"])]),
+        ("smartshop_chat_sessions", "gauge", "Active assistant chat sessions.",
+         [({"backend": sessions["backend"]}, sessions["sessions"])]),
+        ("smartshop_chat_prompt_tokens_total", "counter", "Prompt tokens sent for chat turns.",
+         [({}, context["prompt_tokens_total"])]),
+        ("smartshop_chat_turns_total", "counter", "Chat turns sent to Gemini.",
+         [({}, context["turns"])]),
+        ("smartshop_gemini_breaker_open", "gauge", "1 while the Gemini circuit breaker refuses calls.",
+         [({}, int(GEMINI_BREAKER.state == "open"))]),
+        ("smartshop_gemini_breaker_trips_total", "counter", "Times the Gemini circuit breaker opened.",
+         [({}, GEMINI_BREAKER.opened)]),
+        ("smartshop_gemini_retries_total", "counter", "Gemini REST calls retried after a transient failure.",
+         [({}, GEMINI_HTTP.retried)]),
+        ("smartshop_qr_renders_total", "counter", "Payment QR codes rendered (cache misses).",
+         [({}, QR_CACHE.renders)]),
+        ("smartshop_stock_reservations_total", "counter", "Checkout stock reservations by outcome.",
+         [({"outcome": "reserved"}, STOCK.reserved), ({"outcome": "out_of_stock"}, STOCK.rejected),
+          ({"outcome": "committed"}, STOCK.committed)]
+         + [({"outcome": reason}, count) for reason, count in STOCK.released.items()]),
+        ("smartshop_thumbnails_generated_total", "counter", "Product images resized into thumbnails.",
+         [({}, THUMBNAILS.generated if THUMBNAILS is not None else 0)]),
+        ("smartshop_thumbnail_failures_total", "counter", "Product images that could not be thumbnailed.",
+         [({}, THUMBNAILS.failed if THUMBNAILS is not None else 0)]),
+        ("smartshop_profiles_written_total", "counter", "Slow-request profiles written.",
+         [({}, PROFILER.dumps if PROFILER is not None else 0)]),
+    ]
+
+
+METRICS.add_collector(collect_app_metrics)
+
+
+@app.route("/metrics")
+def metrics():
+    if not METRICS_ENABLED:
+        abort(404)
+    if METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode()
+    ):
+        abort(401)
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+
+# --------------- Startup ---------------
+if STARTUP_MODE == "eager":
+    # Long-running servers pay for everything up front instead of on the first requests
+    INVENTORY.load()
+    STARTUP.mark("inventory")
+    STOCK.start()
+    if GEMINI_API_KEY:
+        if GEMINI_TRANSPORT == "sdk":
+            resolve(genai)
+        resolve(requests)
+        STARTUP.mark("sdk_imports")
+else:
+    STARTUP.mark("routes")
+if STARTUP_REPORT:
+    print(STARTUP.summary())
+
+
+# --------------- CLI ---------------
+@app.cli.command("migrate-storage")
+@click.option(
+    "--db",
+    "db_path",
+    default=None,
+    help="SQLite file to create or update (defaults to SQLITE_PATH or data/smartshop.db).",
+)
+def migrate_storage(db_path):
+    """Import the JSON data/ and retailer_uploads/ trees into SQLite."""
+    target = SqliteStorage(db_path or SQLITE_PATH or DATA_DIR / "smartshop.db")
+    stats = target.import_from(JsonStorage(DATA_DIR, UPLOAD_DIR))
+    for table, count in stats.items():
+        click.echo(f"{table}: {count}")
+    click.echo(f"Migrated into {target.db.path}. Set STORAGE_BACKEND=sqlite to use it.")
+
+
+@app.cli.command("compact-orders")
+def compact_orders():
+    """Rewrite data/orders.jsonl without superseded order lines."""
+    if not hasattr(STORAGE, "compact_orders"):
+        click.echo(f"The {STORAGE.name} backend has no order log to compact.")
+        return
+    click.echo(f"Compacted order log: {STORAGE.compact_orders()} orders kept.")
+
+
+@app.cli.command("migrate-legacy")
+def migrate_legacy():
+    """Move orders and FAQ questions kept in purchase.json and FAQ.json into their logs."""
+    if not hasattr(STORAGE, "migrate_legacy"):
+        click.echo(f"The {STORAGE.name} backend keeps no legacy JSON records.")
+        return
+    moved = STORAGE.migrate_legacy()
+    click.echo(f"Moved {moved['orders']} orders and {moved['faq_log']} FAQ questions into their logs.")
+
+
+@app.cli.command("build-thumbnails")
+def build_thumbnails():
+    """Fetch and resize every product image that has no thumbnails yet."""
+    if THUMBNAILS is None:
+        click.echo("Thumbnails are disabled (THUMBNAILS_ENABLED=0).")
+        return
+    queue_thumbnails(INVENTORY.all())
+    THUMBNAILS.drain()
+    click.echo(f"Thumbnails: {THUMBNAILS.generated} images resized, {THUMBNAILS.failed} failed.")
+
+
+@app.cli.command("startup-report")
+def startup_report():
+    """Print how long importing the app took, phase by phase."""
+    report = STARTUP.report()
+    click.echo(f"mode: {report['mode']}")
+    for phase, ms in report["phases"].items():
+        click.echo(f"  {phase:<14}{ms:>9.1f} ms")
+    click.echo(f"total: {report['total_ms']} ms, peak RSS: {report['peak_rss_mib']} MiB")
 
 
 if __name__ == "__main__":
@@ -0,0 +1 @@
+"""Benchmarks for the SmartShop routes and storage layer; see ``benchmarks.run``."""
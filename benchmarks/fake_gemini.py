@@ -0,0 +1,249 @@
+"""Local stand-in for the Gemini REST API, for offline and load testing.
+
+    python -m benchmarks.fake_gemini --port 8090 --latency normal:400,100 --error-rate 0.02
+    GEMINI_BASE_URL=http://127.0.0.1:8090/v1beta GEMINI_TRANSPORT=rest gunicorn app:app
+
+Serves ``POST /v1beta/models/<model>:generateContent`` and
+``:streamGenerateContent?alt=sse`` with the same response shapes as Gemini.
+A recommendation prompt (``INVENTORY:`` JSON plus ``USER_PREFERENCE:``)
+gets valid recommendation JSON back, and every other prompt gets a fixed
+reply. The response delay comes from ``--latency``: a number of milliseconds
+or ``uniform:LO,HI``, ``normal:MEAN,STD`` or ``exp:MEAN``. ``--error-rate``
+answers with ``--error-status``, ``--timeout-rate`` holds the connection for
+``--hang`` seconds so client timeouts fire, and streamed replies arrive in
+``--chunks`` pieces ``--chunk-latency`` apart. ``GET /stats`` returns request
+and outcome counts. Draws come from one seeded generator, so a run with the
+same arguments and request order behaves the same way.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PATH_RE = re.compile(r"^/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)$")
+DEFAULT_REPLY = (
+    "Here are a few options from the store that fit what you described. "
+    "Let me know your budget and I can narrow them down."
+)
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a function returning seconds from a ``random.Random``."""
+    kind, _, args = spec.partition(":")
+    if not args:
+        ms = float(kind)
+        return lambda rng: ms / 1000
+    values = [float(v) for v in args.split(",")]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(*values) / 1000
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(*values)) / 1000
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+def prompt_text(body):
+    return "\n".join(
+        part.get("text", "")
+        for message in body.get("contents", [])
+        for part in message.get("parts", [])
+    )
+
+
+def reply_for(prompt, reply):
+    if "INVENTORY:\n" in prompt and "USER_PREFERENCE:" in prompt:
+        inventory = prompt.split("INVENTORY:\n", 1)[1].split("\n", 1)[0]
+        try:
+            items = json.loads(inventory)
+        except ValueError:
+            items = []
+        return json.dumps(
+            {
+                "recommendations": [
+                    {"item_id": i.get("item_id"), "reason": "Matches your request", "match_score": 80}
+                    for i in items[:3]
+                ],
+                "follow_up_question": "Would you like to see more options?",
+            }
+        )
+    return reply
+
+
+def response_body(text, prompt, finished=True):
+    body = {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "index": 0,
+            }
+        ],
+        "usageMetadata": {
+            "promptTokenCount": len(prompt) // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": (len(prompt) + len(text)) // 4,
+        },
+    }
+    if finished:
+        body["candidates"][0]["finishReason"] = "STOP"
+    return body
+
+
+class FakeGemini:
+    def __init__(
+        self, latency="0", chunk_latency="0", chunks=4, error_rate=0.0, error_status=500,
+        timeout_rate=0.0, hang=60.0, reply=DEFAULT_REPLY, seed=0,
+    ):
+        self.latency = parse_latency(latency)
+        self.chunk_latency = parse_latency(chunk_latency)
+        self.chunks = max(1, chunks)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.reply = reply
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "timeouts": 0, "streams": 0}
+
+    def draw(self):
+        """Return ``(outcome, delay_seconds)`` for the next request."""
+        with self._lock:
+            roll = self._rng.random()
+            delay = self.latency(self._rng)
+            self.stats["requests"] += 1
+            if roll < self.timeout_rate:
+                outcome = "timeouts"
+            elif roll < self.timeout_rate + self.error_rate:
+                outcome = "errors"
+            else:
+                outcome = "ok"
+            self.stats[outcome] += 1
+        return outcome, delay
+
+    def chunk_delay(self):
+        with self._lock:
+            return self.chunk_latency(self._rng)
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    with fake._lock:
+                        self.send_json(200, dict(fake.stats))
+                else:
+                    self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+            def do_POST(self):
+                path = self.path.split("?", 1)[0]
+                match = _PATH_RE.match(path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                if not match:
+                    self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+                    return
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    self.send_json(400, {"error": {"code": 400, "message": "Invalid JSON"}})
+                    return
+                outcome, delay = fake.draw()
+                if outcome == "timeouts":
+                    time.sleep(fake.hang)
+                    self.close_connection = True
+                    return
+                time.sleep(delay)
+                if outcome == "errors":
+                    self.send_json(
+                        fake.error_status,
+                        {"error": {"code": fake.error_status, "message": "Injected error"}},
+                    )
+                    return
+                prompt = prompt_text(body)
+                text = reply_for(prompt, fake.reply)
+                if match.group(2) == "generateContent":
+                    self.send_json(200, response_body(text, prompt))
+                else:
+                    with fake._lock:
+                        fake.stats["streams"] += 1
+                    self.stream(text, prompt)
+
+            def stream(self, text, prompt):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                size = -(-len(text) // fake.chunks)
+                pieces = [text[i : i + size] for i in range(0, len(text), size)] or [""]
+                for n, piece in enumerate(pieces):
+                    if n:
+                        time.sleep(fake.chunk_delay())
+                    event = response_body(piece, prompt, finished=n == len(pieces) - 1)
+                    self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+                    self.wfile.flush()
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=8090):
+        """Return a started ``ThreadingHTTPServer``; call ``shutdown()`` to stop it."""
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="fake-gemini", daemon=True).start()
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="0", help="Response delay in ms, or a distribution.")
+    parser.add_argument("--chunk-latency", default="0", help="Delay between streamed chunks.")
+    parser.add_argument("--chunks", type=int, default=4, help="Pieces per streamed reply.")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--hang", type=float, default=60.0, help="Seconds a timed-out request is held.")
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    fake = FakeGemini(
+        latency=args.latency,
+        chunk_latency=args.chunk_latency,
+        chunks=args.chunks,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        timeout_rate=args.timeout_rate,
+        hang=args.hang,
+        reply=args.reply,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), fake.handler())
+    server.daemon_threads = True
+    print(f"Fake Gemini on http://{args.host}:{args.port}/v1beta")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
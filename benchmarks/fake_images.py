@@ -0,0 +1,131 @@
+"""Local image server standing in for the third-party hosts product images live on.
+
+    python -m benchmarks.fake_images --port 8091 --latency 50
+    THUMBNAIL_ALLOW_PRIVATE=1 flask --app app run
+
+``GET /img/<name>.<jpg|png|webp>?w=1600&h=1200`` returns a generated image of
+that size and format. The picture depends only on ``name``, so the same name
+always gives the same bytes. ``GET /redirect/<path>`` answers with a 302 to
+``/<path>``, ``GET /text`` serves a non-image, and ``GET /stats`` returns
+request counts. Point product image URLs at ``http://127.0.0.1:8091/img/...``
+to exercise the thumbnail pipeline offline.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+
+_FORMATS = {"jpg": ("JPEG", "image/jpeg"), "png": ("PNG", "image/png"), "webp": ("WEBP", "image/webp")}
+
+
+def make_image(name, width, height, fmt):
+    from PIL import Image, ImageDraw
+
+    seed = hashlib.sha256(name.encode("utf-8")).digest()
+    image = Image.new("RGB", (width, height), tuple(seed[:3]))
+    draw = ImageDraw.Draw(image)
+    for i in range(8):
+        x, y = seed[3 + i] * width // 256, seed[11 + i] * height // 256
+        r = max(4, min(width, height) // (4 + i))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(seed[19 + i : 22 + i]))
+    buf = BytesIO()
+    image.save(buf, _FORMATS[fmt][0], quality=90)
+    return buf.getvalue()
+
+
+class FakeImages:
+    def __init__(self, latency_ms=0.0, max_side=4000):
+        self.latency = latency_ms / 1000
+        self.max_side = max_side
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "images": 0}
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_body(self, status, body, content_type, headers=()):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                with fake._lock:
+                    fake.stats["requests"] += 1
+                if parts.path == "/stats":
+                    with fake._lock:
+                        body = json.dumps(fake.stats).encode("utf-8")
+                    self.send_body(200, body, "application/json")
+                    return
+                time.sleep(fake.latency)
+                if parts.path.startswith("/redirect/"):
+                    location = "/" + parts.path[len("/redirect/") :]
+                    if parts.query:
+                        location += "?" + parts.query
+                    self.send_body(302, b"", "text/plain", [("Location", location)])
+                    return
+                if parts.path == "/text":
+                    self.send_body(200, b"not an image", "text/plain")
+                    return
+                name, _, ext = parts.path[len("/img/") :].rpartition(".")
+                if not parts.path.startswith("/img/") or not name or ext not in _FORMATS:
+                    self.send_body(404, b"not found", "text/plain")
+                    return
+                query = parse_qs(parts.query)
+                try:
+                    width = int(query.get("w", ["1600"])[0])
+                    height = int(query.get("h", ["1200"])[0])
+                except ValueError:
+                    self.send_body(400, b"bad size", "text/plain")
+                    return
+                width = max(1, min(width, fake.max_side))
+                height = max(1, min(height, fake.max_side))
+                body = make_image(name, width, height, ext)
+                with fake._lock:
+                    fake.stats["images"] += 1
+                self.send_body(200, body, _FORMATS[ext][1])
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=8091):
+        """Return a started ``ThreadingHTTPServer``; call ``shutdown()`` to stop it."""
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="fake-images", daemon=True).start()
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay per request in ms.")
+    parser.add_argument("--max-side", type=int, default=4000, help="Largest width/height served.")
+    args = parser.parse_args(argv)
+    server = ThreadingHTTPServer(
+        (args.host, args.port), FakeImages(args.latency, args.max_side).handler()
+    )
+    server.daemon_threads = True
+    print(f"Fake image host on http://{args.host}:{args.port}/img/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
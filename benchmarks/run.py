@@ -0,0 +1,468 @@
+"""Benchmark the SmartShop routes against a synthetic catalog.
+
+    python -m benchmarks.run --scale 10k
+    python -m benchmarks.run --scale 1k --workers 4 --threads 4 --duration 20
+    python -m benchmarks.run --scale 1k --save-baseline
+    python -m benchmarks.run --url http://127.0.0.1:8000 --workers 4
+
+Two phases run against data generated by ``benchmarks.synth`` in a scratch
+directory. The route phase calls each route one at a time through Flask's
+test client. The load phase starts ``--workers`` processes, each importing
+the app the way a gunicorn worker would, and runs ``--threads`` clients in
+each against a weighted route mix for ``--duration`` seconds. With
+``--url``, the load phase drives a running server over HTTP instead. In
+process, Gemini is replaced by a stub that answers after ``--llm-latency-ms``.
+Alternatively, ``--fake-gemini LATENCY`` starts ``benchmarks.fake_gemini`` and
+``--gemini-url`` names a running one. Either way the app reaches Gemini over
+its real REST transport, so timeouts and HTTP overhead are included.
+
+Results are compared with ``benchmarks/baseline.json`` for the same scale
+and backend. A route counts as a regression when its p50 latency or its
+throughput is more than ``--tolerance`` worse than the baseline, and the run
+then exits with status 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000}
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+CART_SIZE = 5
+CONTACT = {
+    "name": "Bench User",
+    "phone": "9999999999",
+    "email": "bench@example.com",
+    "address": "1 Bench Street",
+}
+CHAT_TOPICS = ("headphones", "green tea", "backpack", "running shoes", "a gift under 50")
+
+
+# --------------- Gemini stub ---------------
+class _StubHttpResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, text):
+        self._text = text
+
+    def json(self):
+        return {"candidates": [{"content": {"parts": [{"text": self._text}]}}]}
+
+
+class _StubChatResponse:
+    def __init__(self, text, prompt):
+        self.text = text
+        self.usage_metadata = type("Usage", (), {"prompt_token_count": len(prompt) // 4})()
+
+
+class StubGemini:
+    """Stands in for both ``GEMINI_HTTP`` (REST calls) and the chat model (SDK calls)."""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000
+
+    def post(self, url, json=None, timeout=None, stream=False):
+        time.sleep(self.latency)
+        return _StubHttpResponse('["stub recommendation"]')
+
+    def start_chat(self, history=None):
+        return self
+
+    def send_message(self, prompt, stream=False, request_options=None):
+        time.sleep(self.latency)
+        response = _StubChatResponse("Here are a few options you might like.", prompt)
+        return iter([response]) if stream else response
+
+
+# --------------- Clients ---------------
+class HttpClient:
+    """``requests.Session`` with the same ``get``/``post`` calls as Flask's test client."""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def get(self, path):
+        return self.session.get(self.base_url + path, allow_redirects=False, timeout=60)
+
+    def post(self, path, json=None):
+        return self.session.post(self.base_url + path, json=json, timeout=60)
+
+
+def _json(resp):
+    return resp.get_json() if hasattr(resp, "get_json") else resp.json()
+
+
+def import_app(llm_latency_ms):
+    """Import the app against the environment set up by ``prepare_data``.
+
+    Gemini is stubbed out unless ``llm_latency_ms`` is None (a Gemini URL was given).
+    """
+    import app as smartshop
+
+    if llm_latency_ms is None:
+        return smartshop
+    stub = StubGemini(llm_latency_ms)
+    smartshop.GEMINI_HTTP = stub
+    smartshop.chat_model = lambda: stub
+    smartshop.GEMINI_API_KEY = "bench"
+    return smartshop
+
+
+class Shopper:
+    """One logged-in user and retailer pair with a filled cart, as a load client."""
+
+    def __init__(self, make_client):
+        self.user = make_client()
+        self.retailer = make_client()
+        self.user.get("/guest_login/user")
+        self.retailer.get("/guest_login/retailer")
+        items = _json(self.user.get("/api/items?limit=100"))["items"]
+        if not items:
+            raise SystemExit("The catalog is empty; nothing to benchmark.")
+        # Orders reserve stock, so only order what is in stock
+        self.keys = [(i["retailer"], i["item_id"]) for i in items if i.get("stock")]
+        for retailer, item_id in self.keys[:CART_SIZE]:
+            self.user.post("/cart/add", json={"retailer": retailer, "item_id": item_id})
+        self.order_ids = []
+        for _ in range(3):
+            self.create_order(0)
+
+    def create_order(self, i):
+        retailer, item_id = self.keys[i % len(self.keys)]
+        resp = self.user.post(
+            "/order/create",
+            json={"mode": "single", "retailer": retailer, "item_id": item_id, **CONTACT},
+        )
+        if resp.status_code == 200:
+            self.order_ids.append(_json(resp)["order_id"])
+            del self.order_ids[:-50]
+        return resp
+
+    def order_qr(self, i):
+        return self.user.get(f"/order/{self.order_ids[i % len(self.order_ids)]}/qr")
+
+    def assistant_chat(self, i):
+        # A unique message per call, so every turn misses the response cache
+        topic = CHAT_TOPICS[i % len(CHAT_TOPICS)]
+        return self.user.post(
+            "/api/assistant_chat", json={"message": f"I'm looking for {topic} ({i})"}
+        )
+
+
+# name -> (call, weight in the load mix)
+ROUTES = {
+    "GET /app": (lambda s, i: s.user.get("/app"), 30),
+    "GET /store": (lambda s, i: s.retailer.get("/store"), 10),
+    "GET /cart": (lambda s, i: s.user.get("/cart"), 15),
+    "POST /order/create": (Shopper.create_order, 10),
+    "GET /order/<id>/qr": (Shopper.order_qr, 10),
+    "POST /api/assistant_chat": (Shopper.assistant_chat, 5),
+}
+
+
+# --------------- Measurement ---------------
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+    }
+
+
+def timed_call(call, shopper, i):
+    start = time.perf_counter()
+    resp = call(shopper, i)
+    if hasattr(resp, "get_data"):
+        resp.get_data()
+    return time.perf_counter() - start, resp.status_code >= 400
+
+
+def run_routes(smartshop, requests_per_route):
+    shopper = Shopper(smartshop.app.test_client)
+    results = {}
+    for name, (call, _) in ROUTES.items():
+        # warm-up: caches, lazy imports, first renders; QR views cycle through
+        # every recent order, so each order's QR is rendered before timing
+        warmup = len(shopper.order_ids) if call is Shopper.order_qr else 5
+        for i in range(warmup):
+            timed_call(call, shopper, i)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for i in range(requests_per_route):
+            latency, failed = timed_call(call, shopper, i)
+            latencies.append(latency)
+            errors += failed
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+    return results
+
+
+def _load_worker(worker_id, options, start_at):
+    if options["url"]:
+        make_client = lambda: HttpClient(options["url"])  # noqa: E731
+    else:
+        make_client = import_app(options["llm_latency_ms"]).app.test_client
+    names = list(ROUTES)
+    weights = [ROUTES[n][1] for n in names]
+    latencies = {n: [] for n in names}
+    errors = {n: 0 for n in names}
+    lock = threading.Lock()
+
+    def client_loop(thread_id):
+        rng = random.Random(options["seed"] * 1000 + worker_id * 100 + thread_id)
+        shopper = Shopper(make_client)
+        time.sleep(max(0.0, start_at - time.time()))
+        stop_at = start_at + options["duration"]
+        i = 0
+        while time.time() < stop_at:
+            name = rng.choices(names, weights)[0]
+            latency, failed = timed_call(ROUTES[name][0], shopper, i)
+            i += 1
+            with lock:
+                latencies[name].append(latency)
+                errors[name] += failed
+
+    threads = [
+        threading.Thread(target=client_loop, args=(t,)) for t in range(options["threads"])
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    from startup import peak_rss_mib
+
+    return latencies, errors, peak_rss_mib()
+
+
+def run_load(options):
+    # Workers import the app themselves, like gunicorn workers without preload
+    ctx = multiprocessing.get_context("spawn")
+    start_at = time.time() + options["warmup"]
+    with ctx.Pool(options["workers"]) as pool:
+        parts = pool.starmap(
+            _load_worker, [(w, options, start_at) for w in range(options["workers"])]
+        )
+    results = {}
+    for name in ROUTES:
+        latencies = [x for part in parts for x in part[0][name]]
+        errors = sum(part[1][name] for part in parts)
+        results[name] = summarize(latencies, errors, options["duration"])
+    everything = [x for part in parts for lat in part[0].values() for x in lat]
+    total_errors = sum(sum(part[1].values()) for part in parts)
+    results["all"] = summarize(everything, total_errors, options["duration"])
+    rss = [part[2] for part in parts if part[2] is not None]
+    return results, max(rss) if rss else None
+
+
+# --------------- Data ---------------
+def _generate(data_dir, upload_dir, counts, backend, seed):
+    from benchmarks.synth import generate
+
+    generate(data_dir, upload_dir, seed=seed, **counts)
+    if backend == "sqlite":
+        from storage import JsonStorage, SqliteStorage
+
+        SqliteStorage(data_dir / "smartshop.db").import_from(JsonStorage(data_dir, upload_dir))
+
+
+def prepare_data(root, counts, backend, seed):
+    """Generate data under ``root`` (reused when the parameters match) and point the app at it."""
+    data_dir, upload_dir = root / "data", root / "retailer_uploads"
+    manifest = {"counts": counts, "backend": backend, "seed": seed}
+    manifest_path = root / "bench_manifest.json"
+    if not (manifest_path.exists() and json.loads(manifest_path.read_text()) == manifest):
+        for path in (data_dir, upload_dir):
+            shutil.rmtree(path, ignore_errors=True)
+        print(f"Generating {counts['items']} items, {counts['orders']} orders...", flush=True)
+        # In a child process, so the generator's memory doesn't count toward peak RSS
+        proc = multiprocessing.get_context("spawn").Process(
+            target=_generate, args=(data_dir, upload_dir, counts, backend, seed)
+        )
+        proc.start()
+        proc.join()
+        if proc.exitcode:
+            raise SystemExit("Data generation failed.")
+        manifest_path.write_text(json.dumps(manifest))
+    os.environ.update(
+        DATA_PATH=str(data_dir),
+        UPLOAD_PATH=str(upload_dir),
+        STORAGE_BACKEND=backend,
+        SQLITE_PATH=str(data_dir / "smartshop.db"),
+        GEMINI_API_KEY="bench",
+        STARTUP_REPORT="0",
+        PROFILE_SLOW_MS="0",
+    )
+    os.environ.pop("VERCEL", None)
+
+
+# --------------- Reporting ---------------
+def print_table(title, results):
+    print(f"\n{title}")
+    print(f"  {'route':<28}{'reqs':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(
+            f"  {name:<28}{r['requests']:>8}{r['errors']:>8}{r['rps']:>10}"
+            f"{r['p50_ms']:>10}{r['p99_ms']:>10}"
+        )
+
+
+def compare(current, baseline, tolerance):
+    """Return regression messages for routes slower or lower-throughput than the baseline."""
+    regressions = []
+    for phase in ("routes", "load"):
+        for name, base in (baseline.get(phase) or {}).items():
+            now = (current.get(phase) or {}).get(name)
+            if not now:
+                continue
+            if base["p50_ms"] and now["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{phase} {name}: p50 {base['p50_ms']} -> {now['p50_ms']} ms"
+                )
+            if base["rps"] and now["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append(f"{phase} {name}: {base['rps']} -> {now['rps']} req/s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k", help="Catalog size preset.")
+    parser.add_argument("--items", type=int, help="Items in the catalog (overrides --scale).")
+    parser.add_argument("--retailers", type=int, default=10)
+    parser.add_argument("--orders", type=int, help="Orders in the history (default: one per item).")
+    parser.add_argument("--faq", type=int, help="FAQ log entries (default: one per item).")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--data-dir", help="Keep generated data here and reuse it on later runs.")
+    parser.add_argument("--requests", type=int, default=200, help="Calls per route in the route phase.")
+    parser.add_argument("--workers", type=int, default=2, help="Load phase processes (0 skips it).")
+    parser.add_argument("--threads", type=int, default=4, help="Clients per load worker.")
+    parser.add_argument("--duration", type=float, default=10, help="Load phase seconds.")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds allowed for workers to start.")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Stub Gemini response delay.")
+    parser.add_argument("--fake-gemini", metavar="LATENCY", help="Start a fake Gemini server, e.g. normal:300,50.")
+    parser.add_argument("--gemini-url", help="Use a running fake Gemini at this base URL.")
+    parser.add_argument("--url", help="Drive a running server over HTTP in the load phase.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    items = args.items or SCALES[args.scale]
+    counts = {
+        "items": items,
+        "retailers": args.retailers,
+        "orders": items if args.orders is None else args.orders,
+        "faq": items if args.faq is None else args.faq,
+    }
+    label = f"{items}-items/{args.backend}" + ("/http" if args.url else "")
+    results = {"label": label, "counts": counts}
+
+    scratch = smartshop = fake = None
+    llm_latency_ms = args.llm_latency_ms
+    gemini_url = args.gemini_url
+    if args.fake_gemini:
+        from benchmarks.fake_gemini import FakeGemini
+
+        fake = FakeGemini(latency=args.fake_gemini, seed=args.seed)
+        server = fake.serve(port=0)
+        gemini_url = f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+    if gemini_url:
+        os.environ.update(GEMINI_BASE_URL=gemini_url, GEMINI_TRANSPORT="rest")
+        llm_latency_ms = None
+        label += "/fake-gemini"
+        results["label"] = label
+    if args.url is None:
+        if args.data_dir:
+            root = Path(args.data_dir)
+            root.mkdir(parents=True, exist_ok=True)
+        else:
+            scratch = tempfile.TemporaryDirectory(prefix="smartshop-bench-")
+            root = Path(scratch.name)
+        prepare_data(root, counts, args.backend, args.seed)
+    try:
+        if args.url is None:
+            smartshop = import_app(llm_latency_ms)
+            results["startup_ms"] = smartshop.STARTUP.total_ms()
+            results["routes"] = run_routes(smartshop, args.requests)
+            print_table(f"Routes, one at a time ({label})", results["routes"])
+        if args.workers > 0 and args.duration > 0:
+            options = {
+                "url": args.url,
+                "llm_latency_ms": llm_latency_ms,
+                "duration": args.duration,
+                "threads": args.threads,
+                "warmup": args.warmup,
+                "seed": args.seed,
+                "workers": args.workers,
+            }
+            results["load"], results["worker_peak_rss_mib"] = run_load(options)
+            print_table(
+                f"Load: {args.workers} workers x {args.threads} clients, {args.duration:g}s",
+                results["load"],
+            )
+    finally:
+        if smartshop is not None:
+            # Write buffered logins and ratings while the data directory still exists
+            smartshop.ACCOUNTS.flush()
+            smartshop.RATINGS.flush()
+        if scratch is not None:
+            scratch.cleanup()
+
+    if args.url is None:
+        from startup import peak_rss_mib
+
+        results["peak_rss_mib"] = peak_rss_mib()
+        print(f"\nstartup {results['startup_ms']} ms, peak RSS {results['peak_rss_mib']} MiB", end="")
+        if results.get("worker_peak_rss_mib") is not None:
+            print(f" (load workers {results['worker_peak_rss_mib']} MiB)", end="")
+        print()
+
+    if fake is not None:
+        results["fake_gemini"] = dict(fake.stats)
+        print(f"fake Gemini: {results['fake_gemini']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    if args.save_baseline:
+        baselines[label] = results
+        baseline_path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline '{label}' to {baseline_path}")
+        return 0
+    if label not in baselines:
+        print(f"No baseline for '{label}'; run with --save-baseline to record one.")
+        return 0
+    regressions = compare(results, baselines[label], args.tolerance)
+    if regressions:
+        print(f"\nRegressions against baseline '{label}' (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions against baseline '{label}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
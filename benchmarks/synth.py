@@ -0,0 +1,141 @@
+"""Synthetic SmartShop data for benchmarks.
+
+``generate`` lays out a data directory and an upload tree in the same shape the
+JSON backend uses: accounts in ``Auth.json``, one ``details.json`` per item,
+orders in ``orders.jsonl`` and FAQ questions in ``faq_log/`` segments. Output
+is deterministic for a given seed, so runs at the same scale are comparable.
+"""
+import json
+import random
+import uuid
+from pathlib import Path
+
+from order_log import OrderLog
+from segmented_log import SegmentedLog
+
+CATEGORIES = (
+    "electronics", "fashion", "home-kitchen", "books", "sports-outdoors",
+    "beauty", "toys-games", "food-beverages",
+)
+ADJECTIVES = (
+    "Wireless", "Organic", "Premium", "Compact", "Vintage", "Smart", "Ultra",
+    "Classic", "Portable", "Eco", "Deluxe", "Handmade",
+)
+NOUNS = (
+    "Headphones", "Green Tea", "Backpack", "Desk Lamp", "Running Shoes",
+    "Coffee Maker", "Notebook", "Yoga Mat", "Water Bottle", "Keyboard",
+    "Sunglasses", "Blender", "Board Game", "Face Serum", "Jacket",
+)
+QUESTIONS = (
+    "How do I track my order?", "Can I pay with UPI?", "How do I return an item?",
+    "Is shipping free?", "How do I become a retailer?", "Where is my refund?",
+)
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _timestamp(rng):
+    return (
+        f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        f"T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z"
+    )
+
+
+def retailer_name(i):
+    # Retailer 0 is the guest retailer, so /store through /guest_login shows real items
+    return "guest_retailer" if i == 0 else f"bench_retailer_{i:03d}"
+
+
+def make_item(rng, retailer):
+    adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+    created = _timestamp(rng)
+    return {
+        "item_id": _uuid(rng),
+        "retailer": retailer,
+        "name": f"{adjective} {noun}",
+        "category": rng.choice(CATEGORIES),
+        "description_full": f"A {adjective.lower()} {noun.lower()} for everyday use. " * 3,
+        "description_short": f"{adjective} {noun.lower()} built to last",
+        "price": round(rng.uniform(2, 500), 2),
+        "stock": rng.randint(0, 500),
+        "tags": [adjective.lower(), noun.lower(), rng.choice(CATEGORIES)],
+        "created_at": created,
+        "updated_at": created,
+        "image_filename": "https://images.unsplash.com/photo-1556679343-c7306c1976bc?w=500&h=500&fit=crop",
+    }
+
+
+def generate(data_dir, upload_dir, items=1000, retailers=10, orders=1000, faq=1000, seed=42):
+    """Write a synthetic catalog, order history and FAQ log; returns the item keys."""
+    rng = random.Random(seed)
+    data_dir, upload_dir = Path(data_dir), Path(upload_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+
+    accounts = {}
+    for i in range(retailers):
+        name = retailer_name(i)
+        accounts[name] = {
+            "username": name,
+            "role": "retailer",
+            "password": "guest123",
+            "created_at": _timestamp(rng),
+            "last_login": None,
+            "profile": {"is_guest": True} if i == 0 else {},
+        }
+    accounts["guest_user"] = {
+        "username": "guest_user",
+        "role": "user",
+        "password": "guest123",
+        "created_at": _timestamp(rng),
+        "last_login": None,
+        "profile": {"is_guest": True},
+    }
+    (data_dir / "Auth.json").write_text(json.dumps({"accounts": accounts}, indent=2))
+
+    catalog = []
+    for n in range(items):
+        item = make_item(rng, retailer_name(n % retailers))
+        folder = upload_dir / item["retailer"] / item["item_id"]
+        folder.mkdir(parents=True)
+        (folder / "details.json").write_text(json.dumps(item, indent=2))
+        catalog.append(item)
+
+    log = OrderLog(data_dir / "orders.jsonl")
+    for _ in range(orders):
+        picked = rng.sample(catalog, min(len(catalog), rng.randint(1, 4)))
+        log.append(
+            {
+                "order_id": _uuid(rng),
+                "user": "guest_user",
+                "items": [
+                    {"item_id": i["item_id"], "retailer": i["retailer"], "price": i["price"]}
+                    for i in picked
+                ],
+                "contact": {
+                    "name": "Bench User",
+                    "phone": "9999999999",
+                    "email": "bench@example.com",
+                    "address": "1 Bench Street",
+                },
+                "status": rng.choice(("pending_payment", "paid")),
+                "total_amount": round(sum(i["price"] for i in picked), 2),
+                "created_at": _timestamp(rng),
+            }
+        )
+
+    SegmentedLog(data_dir / "faq_log", prefix="faq").write(
+        [
+            {
+                "id": _uuid(rng),
+                "user": "guest_user",
+                "question": rng.choice(QUESTIONS),
+                "answer": "See the FAQ section for details.",
+                "ts": _timestamp(rng),
+            }
+            for _ in range(faq)
+        ]
+    )
+    return [(i["retailer"], i["item_id"]) for i in catalog]
@@ -0,0 +1,300 @@
+"""Shopping cart stores keyed by a short cart id.
+
+A cart maps ``(retailer, item_id)`` to a quantity, in the order lines were
+added, so membership is a dict (or primary-key) lookup. Every store keeps a
+running unit count beside the lines, so ``count`` never reads the cart
+itself. ``MemoryCartStore`` is per process. ``SqliteCartStore`` is shared by
+every worker that opens the same database file. Both drop carts left
+untouched for ``idle_ttl`` seconds. ``SessionCartStore`` keeps the cart in
+Flask's signed session cookie instead, for deployments without a shared
+disk; it ignores the cart id.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from storage import SqliteDatabase
+
+
+def cookie_cart_lines(value):
+    """Yield ``(retailer, item_id, quantity)`` from a cart kept in the session cookie.
+
+    Accepts both the ``{"<retailer>/<item_id>": quantity}`` form and the older
+    list of ``{"retailer", "item_id"}`` dicts.
+    """
+    if isinstance(value, dict):
+        for key, quantity in value.items():
+            retailer, _, item_id = key.rpartition("/")
+            yield retailer, item_id, quantity
+    elif isinstance(value, list):
+        for line in value:
+            yield line["retailer"], line["item_id"], 1
+
+
+def _line(retailer, item_id, quantity):
+    return {"retailer": retailer, "item_id": item_id, "quantity": quantity}
+
+
+class MemoryCartStore:
+    def __init__(self, max_carts=10000, idle_ttl=30 * 86400, max_lines=100):
+        self.max_carts = max_carts
+        self.idle_ttl = idle_ttl
+        self.max_lines = max_lines
+        self._carts = OrderedDict()  # cart_id -> {"lines", "units", "last_seen"}, LRU first
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _live(self, cart_id, now):
+        cart = self._carts.get(cart_id)
+        if cart is not None and now - cart["last_seen"] >= self.idle_ttl:
+            del self._carts[cart_id]
+            self.expired += 1
+            return None
+        return cart
+
+    def _writable(self, cart_id, now):
+        cart = self._live(cart_id, now)
+        if cart is None:
+            cart = self._carts[cart_id] = {"lines": {}, "units": 0, "last_seen": now}
+            while len(self._carts) > self.max_carts:
+                self._carts.popitem(last=False)
+                self.evicted += 1
+        cart["last_seen"] = now
+        self._carts.move_to_end(cart_id)
+        return cart
+
+    def items(self, cart_id):
+        with self._lock:
+            cart = self._live(cart_id, time.time())
+            if cart is None:
+                return []
+            return [_line(r, i, q) for (r, i), q in cart["lines"].items()]
+
+    def count(self, cart_id):
+        with self._lock:
+            cart = self._live(cart_id, time.time())
+            return cart["units"] if cart is not None else 0
+
+    def contains(self, cart_id, retailer, item_id):
+        with self._lock:
+            cart = self._live(cart_id, time.time())
+            return cart is not None and (retailer, item_id) in cart["lines"]
+
+    def set_quantity(self, cart_id, retailer, item_id, quantity, increment=False):
+        """Set (or with ``increment`` add to) a line's quantity; 0 removes it. Returns the unit count.
+
+        Raises ``ValueError`` when a new line would exceed ``max_lines``.
+        """
+        with self._lock:
+            cart = self._writable(cart_id, time.time())
+            lines = cart["lines"]
+            key = (retailer, item_id)
+            old = lines.get(key, 0)
+            new = max(0, old + quantity if increment else quantity)
+            if new and key not in lines and len(lines) >= self.max_lines:
+                raise ValueError(f"A cart holds at most {self.max_lines} different items")
+            if new:
+                lines[key] = new
+            else:
+                lines.pop(key, None)
+            cart["units"] += new - old
+            return cart["units"]
+
+    def clear(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "carts": len(self._carts),
+                "units": sum(c["units"] for c in self._carts.values()),
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+CART_SCHEMA = """
+CREATE TABLE IF NOT EXISTS carts (
+    cart_id TEXT PRIMARY KEY,
+    units INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS carts_last_seen ON carts (last_seen);
+CREATE TABLE IF NOT EXISTS cart_lines (
+    cart_id TEXT NOT NULL,
+    retailer TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    added REAL NOT NULL,
+    PRIMARY KEY (cart_id, retailer, item_id)
+);
+"""
+
+
+class SqliteCartStore:
+    """Cart store shared across processes through one SQLite file."""
+
+    def __init__(self, path, idle_ttl=30 * 86400, max_lines=100, sweep_interval=60):
+        self.db = SqliteDatabase(path, schema=CART_SCHEMA)
+        self.idle_ttl = idle_ttl
+        self.max_lines = max_lines
+        self.sweep_interval = sweep_interval
+        self._swept_at = 0.0
+
+    def items(self, cart_id):
+        rows = self.db.connect().execute(
+            "SELECT l.retailer, l.item_id, l.quantity FROM cart_lines l "
+            "JOIN carts c ON c.cart_id = l.cart_id "
+            "WHERE l.cart_id = ? AND c.last_seen > ? ORDER BY l.added, l.rowid",
+            (cart_id, time.time() - self.idle_ttl),
+        )
+        return [_line(r["retailer"], r["item_id"], r["quantity"]) for r in rows]
+
+    def count(self, cart_id):
+        row = self.db.connect().execute(
+            "SELECT units FROM carts WHERE cart_id = ? AND last_seen > ?",
+            (cart_id, time.time() - self.idle_ttl),
+        ).fetchone()
+        return row["units"] if row else 0
+
+    def contains(self, cart_id, retailer, item_id):
+        row = self.db.connect().execute(
+            "SELECT 1 FROM cart_lines l JOIN carts c ON c.cart_id = l.cart_id "
+            "WHERE l.cart_id = ? AND l.retailer = ? AND l.item_id = ? AND c.last_seen > ?",
+            (cart_id, retailer, item_id, time.time() - self.idle_ttl),
+        ).fetchone()
+        return row is not None
+
+    def set_quantity(self, cart_id, retailer, item_id, quantity, increment=False):
+        """Set (or with ``increment`` add to) a line's quantity; 0 removes it. Returns the unit count.
+
+        Raises ``ValueError`` when a new line would exceed ``max_lines``.
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            self._sweep(conn, now)
+            cart = conn.execute(
+                "SELECT last_seen FROM carts WHERE cart_id = ?", (cart_id,)
+            ).fetchone()
+            if cart is not None and now - cart["last_seen"] >= self.idle_ttl:
+                self._delete(conn, cart_id)
+                cart = None
+            row = conn.execute(
+                "SELECT quantity FROM cart_lines WHERE cart_id = ? AND retailer = ? AND item_id = ?",
+                (cart_id, retailer, item_id),
+            ).fetchone()
+            old = row["quantity"] if row else 0
+            new = max(0, old + quantity if increment else quantity)
+            if new and row is None:
+                lines = conn.execute(
+                    "SELECT COUNT(*) FROM cart_lines WHERE cart_id = ?", (cart_id,)
+                ).fetchone()[0]
+                if lines >= self.max_lines:
+                    raise ValueError(f"A cart holds at most {self.max_lines} different items")
+                conn.execute(
+                    "INSERT INTO cart_lines (cart_id, retailer, item_id, quantity, added) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (cart_id, retailer, item_id, new, now),
+                )
+            elif new:
+                conn.execute(
+                    "UPDATE cart_lines SET quantity = ? "
+                    "WHERE cart_id = ? AND retailer = ? AND item_id = ?",
+                    (new, cart_id, retailer, item_id),
+                )
+            elif row is not None:
+                conn.execute(
+                    "DELETE FROM cart_lines WHERE cart_id = ? AND retailer = ? AND item_id = ?",
+                    (cart_id, retailer, item_id),
+                )
+            conn.execute(
+                "INSERT INTO carts (cart_id, units, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (cart_id) DO UPDATE SET units = units + excluded.units, "
+                "last_seen = excluded.last_seen",
+                (cart_id, new - old, now),
+            )
+            return conn.execute(
+                "SELECT units FROM carts WHERE cart_id = ?", (cart_id,)
+            ).fetchone()["units"]
+
+    def clear(self, cart_id):
+        with self.db.transaction() as conn:
+            self._delete(conn, cart_id)
+
+    @staticmethod
+    def _delete(conn, cart_id):
+        conn.execute("DELETE FROM cart_lines WHERE cart_id = ?", (cart_id,))
+        conn.execute("DELETE FROM carts WHERE cart_id = ?", (cart_id,))
+
+    def _sweep(self, conn, now):
+        if now - self._swept_at < self.sweep_interval:
+            return
+        self._swept_at = now
+        cutoff = now - self.idle_ttl
+        conn.execute(
+            "DELETE FROM cart_lines WHERE cart_id IN "
+            "(SELECT cart_id FROM carts WHERE last_seen <= ?)",
+            (cutoff,),
+        )
+        conn.execute("DELETE FROM carts WHERE last_seen <= ?", (cutoff,))
+
+    def stats(self):
+        row = self.db.connect().execute(
+            "SELECT COUNT(*) AS carts, COALESCE(SUM(units), 0) AS units FROM carts"
+        ).fetchone()
+        return {"backend": "sqlite", "carts": row["carts"], "units": row["units"]}
+
+
+class SessionCartStore:
+    """The cart in the signed session cookie, as ``{"<retailer>/<item_id>": quantity}``."""
+
+    def __init__(self, session, max_lines=100, **_):
+        self.session = session  # flask.session
+        self.max_lines = max_lines
+
+    def _lines(self):
+        return {
+            f"{retailer}/{item_id}": quantity
+            for retailer, item_id, quantity in cookie_cart_lines(self.session.get("cart"))
+        }
+
+    def items(self, cart_id):
+        return [_line(*line) for line in cookie_cart_lines(self._lines())]
+
+    def count(self, cart_id):
+        return sum(self._lines().values())
+
+    def contains(self, cart_id, retailer, item_id):
+        return f"{retailer}/{item_id}" in self._lines()
+
+    def set_quantity(self, cart_id, retailer, item_id, quantity, increment=False):
+        lines = self._lines()
+        key = f"{retailer}/{item_id}"
+        new = max(0, lines.get(key, 0) + quantity if increment else quantity)
+        if new and key not in lines and len(lines) >= self.max_lines:
+            raise ValueError(f"A cart holds at most {self.max_lines} different items")
+        if new:
+            lines[key] = new
+        else:
+            lines.pop(key, None)
+        self.session["cart"] = lines
+        return sum(lines.values())
+
+    def clear(self, cart_id):
+        self.session.pop("cart", None)
+
+    def stats(self):
+        return {"backend": "session"}
+
+
+def open_cart_store(backend, path, session=None, **limits):
+    if backend == "sqlite":
+        return SqliteCartStore(path, **limits)
+    if backend == "memory":
+        return MemoryCartStore(**limits)
+    if backend == "session":
+        return SessionCartStore(session, **limits)
+    raise ValueError(f"Unknown cart backend: {backend}")
@@ -0,0 +1,193 @@
+"""Streaming CSV / JSON Lines parsing and serialization for bulk catalog edits.
+
+Rows are read one at a time from a binary stream, so an import holds at most
+one batch in memory however large the file is. ``clean_row`` validates a row
+and returns the fields in the vocabulary ``update_item`` understands. Blank
+CSV cells and missing JSON keys mean "leave unchanged". ``export_lines``
+serializes items back into either format, in the shape imports accept, so an
+export can be edited and re-imported.
+"""
+import csv
+import io
+import json
+import math
+import re
+
+FORMATS = ("csv", "jsonl")
+EXPORT_FIELDS = (
+    "item_id", "name", "category", "description", "price", "stock", "tags",
+    "image_url", "created_at", "updated_at",
+)
+_ITEM_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+MAX_NAME = 200
+MAX_DESCRIPTION = 5000
+
+
+class RowError(ValueError):
+    pass
+
+
+def normalize_image_url(image_url):
+    """Return ``image_url`` as an absolute http(s) URL (scheme-less input gets https)."""
+    image_url = image_url.strip()
+    if image_url.startswith(("http://", "https://")):
+        return image_url
+    return f"https:{image_url}" if image_url.startswith("//") else f"https://{image_url}"
+
+
+def format_for(filename=None, content_type=None, requested=None):
+    """Pick ``csv`` or ``jsonl`` from an explicit choice, file name or content type."""
+    if requested:
+        return requested if requested in FORMATS else None
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    if mimetype in ("text/csv", "application/csv"):
+        return "csv"
+    if mimetype in ("application/x-ndjson", "application/jsonl", "application/x-jsonlines"):
+        return "jsonl"
+    return None
+
+
+def iter_rows(stream, fmt):
+    """Yield ``(line_number, row_dict_or_RowError)`` from a binary stream, lazily.
+
+    A file that is not UTF-8 or not parseable as CSV ends with one error row.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    rows = _csv_rows(text) if fmt == "csv" else _jsonl_rows(text)
+    try:
+        yield from rows
+    except (UnicodeDecodeError, csv.Error) as e:
+        yield None, RowError(f"Unreadable file: {e}")
+
+
+def _csv_rows(text):
+    reader = csv.DictReader(text)
+    for row in reader:
+        if None in row:
+            yield reader.line_num, RowError("Row has more cells than the header")
+            continue
+        yield reader.line_num, row
+
+
+def _jsonl_rows(text):
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, RowError("Invalid JSON")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, RowError("Each line must be a JSON object")
+            continue
+        yield line_number, row
+
+
+def _present(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _number(value, cast, field):
+    if isinstance(value, bool):
+        raise RowError(f"{field} must be a number")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{field} must be a number") from None
+    if not math.isfinite(number) or number < 0:
+        raise RowError(f"{field} must be zero or more")
+    if cast is int:
+        if number != int(number):
+            raise RowError(f"{field} must be a whole number")
+        return int(number)
+    return round(number, 2)
+
+
+def clean_row(row):
+    """Validate one import row; returns ``(item_id or None, fields)`` or raises ``RowError``."""
+    fields = {}
+    item_id = _present(row, "item_id")
+    if item_id is not None:
+        item_id = str(item_id)
+        if not _ITEM_ID_RE.match(item_id):
+            raise RowError("item_id may only contain letters, digits, '-' and '_'")
+
+    name = _present(row, "name")
+    if name is not None:
+        if len(str(name)) > MAX_NAME:
+            raise RowError(f"name is longer than {MAX_NAME} characters")
+        fields["name"] = str(name)
+    category = _present(row, "category")
+    if category is not None:
+        fields["category"] = str(category)
+    description = _present(row, "description")
+    if description is None:
+        description = _present(row, "description_full")
+    if description is not None:
+        if len(str(description)) > MAX_DESCRIPTION:
+            raise RowError(f"description is longer than {MAX_DESCRIPTION} characters")
+        fields["description_full"] = str(description)
+    price = _present(row, "price")
+    if price is not None:
+        fields["price"] = _number(price, float, "price")
+    stock = _present(row, "stock")
+    if stock is not None:
+        fields["stock"] = _number(stock, int, "stock")
+    tags = _present(row, "tags")
+    if tags is not None:
+        if isinstance(tags, list):
+            tags = ",".join(str(t) for t in tags)
+        fields["tags"] = str(tags)
+    image_url = _present(row, "image_url")
+    if image_url is None:
+        image_url = _present(row, "image_filename")
+    if image_url is not None:
+        fields["image_url"] = normalize_image_url(str(image_url))
+    return item_id, fields
+
+
+def export_row(item):
+    return {
+        "item_id": item.get("item_id"),
+        "name": item.get("name", ""),
+        "category": item.get("category", ""),
+        "description": item.get("description_full", ""),
+        "price": item.get("price", 0),
+        "stock": item.get("stock", 0),
+        "tags": item.get("tags") or [],
+        "image_url": item.get("image_filename") or "",
+        "created_at": item.get("created_at", ""),
+        "updated_at": item.get("updated_at", ""),
+    }
+
+
+def export_lines(items, fmt):
+    """Yield the serialized export of ``items`` chunk by chunk."""
+    if fmt == "jsonl":
+        for item in items:
+            yield json.dumps(export_row(item), ensure_ascii=False) + "\n"
+        return
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for item in items:
+        row = export_row(item)
+        row["tags"] = ",".join(row["tags"])
+        writer.writerow(row)
+        if buf.tell() > 64 * 1024:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
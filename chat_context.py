@@ -0,0 +1,123 @@
+"""Token-budgeted context assembly for the stateful assistant chat.
+
+The model sees a rolling summary of older turns followed by the most recent
+turns verbatim. Product link blocks appended to earlier answers are dropped,
+because every new turn carries its own fresh product context. Summaries are
+extractive (first sentence of each message), so folding costs no model call.
+Token counts are estimated at roughly four characters per token.
+"""
+import re
+import threading
+
+PRODUCT_BLOCK_MARKER = "**Here are the recommended products:**"
+SUMMARY_PREFIX = "Summary of our earlier conversation:\n"
+SUMMARY_ACK = "Got it, I'll keep that in mind."
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+
+def message_text(message):
+    return "".join(p.get("text", "") for p in message.get("parts", []))
+
+
+def strip_product_blocks(text):
+    cut = text.find(PRODUCT_BLOCK_MARKER)
+    return text[:cut].rstrip() if cut != -1 else text
+
+
+def _gist(text, limit):
+    text = " ".join(text.split())
+    match = _SENTENCE_END_RE.search(text)
+    if match:
+        text = text[: match.start()]
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def summarize_turns(summary, messages, max_chars=1200):
+    """Fold ``messages`` into ``summary``, keeping at most ``max_chars`` of the newest lines."""
+    lines = summary.splitlines() if summary else []
+    for message in messages:
+        text = strip_product_blocks(message_text(message))
+        if not text.strip():
+            continue
+        who = "User" if message.get("role") == "user" else "Assistant"
+        lines.append(f"{who}: {_gist(text, 160)}")
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ContextAssembler:
+    def __init__(self, token_budget=1500, recent_turns=4, summary_chars=1200):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_chars = summary_chars
+        self._lock = threading.Lock()
+        self._turns = 0
+        self._prompt_tokens = 0
+        self._max_prompt_tokens = 0
+        self._last_prompt_tokens = 0
+
+    def fold(self, summary, dropped):
+        """Session store hook for messages trimmed off a stored history."""
+        return summarize_turns(summary, dropped, self.summary_chars)
+
+    def assemble(self, history, summary=""):
+        """Return the SDK history to send: summary pair plus recent verbatim turns."""
+        messages = [
+            {"role": m["role"], "parts": [{"text": strip_product_blocks(message_text(m))}]}
+            if m.get("role") == "model"
+            else {"role": m["role"], "parts": list(m.get("parts", []))}
+            for m in history
+        ]
+        split = max(0, len(messages) - 2 * self.recent_turns)
+        while split < len(messages) and messages[split].get("role") != "user":
+            split += 1
+        older, recent = messages[:split], messages[split:]
+        if older:
+            summary = summarize_turns(summary, older, self.summary_chars)
+
+        def size():
+            return estimate_tokens(summary) + sum(
+                estimate_tokens(message_text(m)) for m in recent
+            )
+
+        while len(recent) > 2 and size() > self.token_budget:
+            summary = summarize_turns(summary, recent[:2], self.summary_chars)
+            recent = recent[2:]
+
+        context = []
+        if summary:
+            context = [
+                {"role": "user", "parts": [{"text": SUMMARY_PREFIX + summary}]},
+                {"role": "model", "parts": [{"text": SUMMARY_ACK}]},
+            ]
+        return context + recent
+
+    def record(self, history, prompt, actual_tokens=None):
+        """Track prompt size per turn; prefers the model's reported count when available."""
+        tokens = actual_tokens or (
+            estimate_tokens(prompt) + sum(estimate_tokens(message_text(m)) for m in history)
+        )
+        with self._lock:
+            self._turns += 1
+            self._prompt_tokens += tokens
+            self._last_prompt_tokens = tokens
+            self._max_prompt_tokens = max(self._max_prompt_tokens, tokens)
+        return tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                "turns": self._turns,
+                "prompt_tokens_total": self._prompt_tokens,
+                "prompt_tokens_last": self._last_prompt_tokens,
+                "prompt_tokens_max": self._max_prompt_tokens,
+                "prompt_tokens_avg": round(self._prompt_tokens / self._turns, 1)
+                if self._turns
+                else 0.0,
+            }
@@ -0,0 +1,247 @@
+"""Bounded stores for assistant chat sessions.
+
+A session is ``{"history": [...], "summary": ..., "created_at": ..., "last_seen": ...}``
+where history uses the Gemini SDK message shape. Both stores cap the number of
+live sessions (least recently used go first), expire sessions idle longer than
+a TTL and keep only the most recent messages of each history; messages trimmed
+off are handed to an optional ``fold(summary, dropped)`` hook that returns the
+new rolling summary.
+``MemorySessionStore`` is per process; ``SqliteSessionStore`` is shared by
+every worker that opens the same database file.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from storage import SqliteDatabase
+
+
+def _message_bytes(message):
+    return sum(len(p.get("text", "")) for p in message.get("parts", [])) + 32
+
+
+def trim_history(history, max_messages):
+    """Split into ``(kept, dropped)``: the newest ``max_messages`` starting on a user turn."""
+    if max_messages <= 0 or len(history) <= max_messages:
+        return history, []
+    split = len(history) - max_messages
+    while split < len(history) and history[split].get("role") != "user":
+        split += 1
+    return history[split:], history[:split]
+
+
+def _fold(fold, summary, dropped):
+    if dropped and fold is not None:
+        return fold(summary, dropped)
+    return summary
+
+
+class MemorySessionStore:
+    def __init__(self, max_sessions=1000, idle_ttl=1800, max_messages=40, fold=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.fold = fold
+        self._sessions = OrderedDict()  # id -> record, least recently used first
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _drop(self, session_id):
+        record = self._sessions.pop(session_id)
+        self._bytes -= record["bytes"]
+
+    def _sweep(self, now):
+        # Entries are ordered by last use, so expired ones are all at the front.
+        while self._sessions:
+            session_id, record = next(iter(self._sessions.items()))
+            if now - record["last_seen"] < self.idle_ttl:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                return None
+            if now - record["last_seen"] >= self.idle_ttl:
+                self._drop(session_id)
+                self.expired += 1
+                return None
+            record["last_seen"] = now
+            self._sessions.move_to_end(session_id)
+            return {
+                "history": list(record["history"]),
+                "summary": record["summary"],
+                "created_at": record["created_at"],
+                "last_seen": now,
+            }
+
+    def create(self, session_id, history, created_at):
+        now = time.time()
+        history, dropped = trim_history(list(history), self.max_messages)
+        summary = _fold(self.fold, "", dropped)
+        size = sum(_message_bytes(m) for m in history) + len(summary)
+        with self._lock:
+            self._sweep(now)
+            self._sessions[session_id] = {
+                "history": history,
+                "summary": summary,
+                "created_at": created_at,
+                "last_seen": now,
+                "bytes": size,
+            }
+            self._bytes += size
+            while len(self._sessions) > self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+                self.evicted += 1
+        return {
+            "history": list(history),
+            "summary": summary,
+            "created_at": created_at,
+            "last_seen": now,
+        }
+
+    def append(self, session_id, messages):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                return False
+            history, dropped = trim_history(
+                record["history"] + list(messages), self.max_messages
+            )
+            summary = _fold(self.fold, record["summary"], dropped)
+            size = sum(_message_bytes(m) for m in history) + len(summary)
+            self._bytes += size - record["bytes"]
+            record.update(
+                history=history, summary=summary, bytes=size, last_seen=time.time()
+            )
+            self._sessions.move_to_end(session_id)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "messages": sum(len(r["history"]) for r in self._sessions.values()),
+                "bytes": self._bytes,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+
+SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    history TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    created_at TEXT,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_sessions_last_seen ON chat_sessions (last_seen);
+"""
+
+
+class SqliteSessionStore:
+    """Session store shared across processes through one SQLite file."""
+
+    def __init__(self, path, max_sessions=1000, idle_ttl=1800, max_messages=40, fold=None):
+        self.db = SqliteDatabase(path, schema=SESSION_SCHEMA)
+        conn = self.db.connect()
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(chat_sessions)")}
+        if "summary" not in columns:  # databases created before summaries existed
+            conn.execute("ALTER TABLE chat_sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''")
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.fold = fold
+
+    def get(self, session_id):
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT history, summary, created_at, last_seen FROM chat_sessions "
+                "WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row["last_seen"] >= self.idle_ttl:
+                conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                return None
+            conn.execute(
+                "UPDATE chat_sessions SET last_seen = ? WHERE session_id = ?",
+                (now, session_id),
+            )
+        return {
+            "history": json.loads(row["history"]),
+            "summary": row["summary"],
+            "created_at": row["created_at"],
+            "last_seen": now,
+        }
+
+    def create(self, session_id, history, created_at):
+        now = time.time()
+        history, dropped = trim_history(list(history), self.max_messages)
+        summary = _fold(self.fold, "", dropped)
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions "
+                "(session_id, history, summary, created_at, last_seen) VALUES (?, ?, ?, ?, ?)",
+                (session_id, json.dumps(history), summary, created_at, now),
+            )
+            conn.execute(
+                "DELETE FROM chat_sessions WHERE last_seen <= ?", (now - self.idle_ttl,)
+            )
+            conn.execute(
+                "DELETE FROM chat_sessions WHERE session_id IN ("
+                "SELECT session_id FROM chat_sessions ORDER BY last_seen DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+        return {
+            "history": history,
+            "summary": summary,
+            "created_at": created_at,
+            "last_seen": now,
+        }
+
+    def append(self, session_id, messages):
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT history, summary FROM chat_sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                return False
+            history, dropped = trim_history(
+                json.loads(row["history"]) + list(messages), self.max_messages
+            )
+            summary = _fold(self.fold, row["summary"], dropped)
+            conn.execute(
+                "UPDATE chat_sessions SET history = ?, summary = ?, last_seen = ? "
+                "WHERE session_id = ?",
+                (json.dumps(history), summary, time.time(), session_id),
+            )
+        return True
+
+    def stats(self):
+        row = self.db.connect().execute(
+            "SELECT COUNT(*) AS sessions, "
+            "COALESCE(SUM(LENGTH(history) + LENGTH(summary)), 0) AS bytes "
+            "FROM chat_sessions"
+        ).fetchone()
+        return {"backend": "sqlite", "sessions": row["sessions"], "bytes": row["bytes"]}
+
+
+def open_session_store(backend, path, **limits):
+    if backend == "sqlite":
+        return SqliteSessionStore(path, **limits)
+    if backend == "memory":
+        return MemorySessionStore(**limits)
+    raise ValueError(f"Unknown chat session backend: {backend}")
@@ -7,5 +7,126 @@ GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', 'your-default-key-here')
 # Models (you can adjust if Google updates names)
 GEMINI_RECOMMEND_MODEL = "gemini-2.0-flash"
 GEMINI_FAQ_MODEL = "gemini-2.0-flash"
+GEMINI_CHAT_MODEL = "gemini-2.5-flash"
+
+# Gemini endpoint and chat transport: "sdk" (google-generativeai) or "rest" (plain HTTP to GEMINI_BASE_URL).
+# Point both at benchmarks/fake_gemini.py to exercise the AI paths offline.
+GEMINI_BASE_URL = os.environ.get('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
+GEMINI_TRANSPORT = os.environ.get('GEMINI_TRANSPORT', 'sdk')
+
+# Gemini time budget per call in seconds, per use case; it covers retries. Connect timeout is per attempt.
+GEMINI_TIMEOUTS = {
+    "faq": float(os.environ.get('GEMINI_TIMEOUT_FAQ', '8')),
+    "recommend": float(os.environ.get('GEMINI_TIMEOUT_RECOMMEND', '10')),
+    "chat": float(os.environ.get('GEMINI_TIMEOUT_CHAT', '30')),
+}
+GEMINI_CONNECT_TIMEOUT = float(os.environ.get('GEMINI_CONNECT_TIMEOUT', '3'))
+# Retries for connection errors, timeouts and 429/5xx answers, with jittered exponential backoff
+GEMINI_RETRIES = int(os.environ.get('GEMINI_RETRIES', '2'))
+GEMINI_RETRY_BACKOFF = float(os.environ.get('GEMINI_RETRY_BACKOFF', '0.25'))
+# Keep-alive connections to Gemini per process
+GEMINI_POOL_SIZE = int(os.environ.get('GEMINI_POOL_SIZE', '10'))
+# Consecutive failed calls that open the circuit breaker, and seconds before a probe call is let through
+GEMINI_BREAKER_THRESHOLD = int(os.environ.get('GEMINI_BREAKER_THRESHOLD', '5'))
+GEMINI_BREAKER_RESET = float(os.environ.get('GEMINI_BREAKER_RESET', '30'))
 
 UPI_ID = os.environ.get('UPI_ID', 'upiid@example@bank')
+
+# Seconds between cheap directory-mtime checks that pick up item writes from other workers
+INVENTORY_CHECK_INTERVAL = float(os.environ.get('INVENTORY_CHECK_INTERVAL', '1.0'))
+
+# Storage backend: "json" (files under data/ and retailer_uploads/) or "sqlite"
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+# SQLite database file; defaults to smartshop.db inside the data directory
+SQLITE_PATH = os.environ.get('SQLITE_PATH')
+# Data and upload directories outside Vercel; default to data/ and retailer_uploads/ next to app.py
+DATA_PATH = os.environ.get('DATA_PATH')
+UPLOAD_PATH = os.environ.get('UPLOAD_PATH')
+
+# Products per page on /app and /api/items
+CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', '24'))
+
+# Seconds browsers and CDNs may reuse public catalog responses before revalidating them (0 = always revalidate)
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', '0'))
+
+# Gemini response cache: in-memory LRU size, optional shared tier ("sqlite") and TTLs in seconds
+LLM_CACHE_SIZE = int(os.environ.get('LLM_CACHE_SIZE', '1024'))
+LLM_CACHE_SHARED = os.environ.get('LLM_CACHE_SHARED', '')
+LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH')
+LLM_CACHE_TTLS = {
+    "faq": int(os.environ.get('LLM_CACHE_TTL_FAQ', '86400')),
+    "recommend": int(os.environ.get('LLM_CACHE_TTL_RECOMMEND', '600')),
+    "chat": int(os.environ.get('LLM_CACHE_TTL_CHAT', '300')),
+}
+
+# Upstream Gemini chat calls allowed in flight per process, and how long a request waits for a slot
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '4'))
+LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', '5'))
+
+# Assistant chat sessions: "memory" (per process) or "sqlite" (shared across workers)
+CHAT_SESSION_BACKEND = os.environ.get('CHAT_SESSION_BACKEND', 'memory')
+CHAT_SESSION_PATH = os.environ.get('CHAT_SESSION_PATH')
+CHAT_SESSION_MAX = int(os.environ.get('CHAT_SESSION_MAX', '1000'))
+CHAT_SESSION_TTL = int(os.environ.get('CHAT_SESSION_TTL', '1800'))
+CHAT_HISTORY_MAX_MESSAGES = int(os.environ.get('CHAT_HISTORY_MAX_MESSAGES', '40'))
+
+# Context sent to Gemini per chat turn: estimated token budget, recent turns kept verbatim, summary size
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', '1500'))
+CHAT_CONTEXT_RECENT_TURNS = int(os.environ.get('CHAT_CONTEXT_RECENT_TURNS', '4'))
+CHAT_SUMMARY_CHARS = int(os.environ.get('CHAT_SUMMARY_CHARS', '1200'))
+
+# Password hashing method for werkzeug.security ("scrypt" or "pbkdf2"); older hashes are upgraded on login
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+# Seconds between batched writes of buffered last_login timestamps
+LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', '30'))
+
+# Rating clicks are buffered in memory and flushed every N seconds or after M clicks
+RATING_FLUSH_INTERVAL = float(os.environ.get('RATING_FLUSH_INTERVAL', '5'))
+RATING_FLUSH_EVERY = int(os.environ.get('RATING_FLUSH_EVERY', '100'))
+
+# FAQ question log (JSON backend): segment size in bytes before rotating, and segments kept (0 = all)
+FAQ_LOG_SEGMENT_BYTES = int(os.environ.get('FAQ_LOG_SEGMENT_BYTES', str(1024 * 1024)))
+FAQ_LOG_MAX_SEGMENTS = int(os.environ.get('FAQ_LOG_MAX_SEGMENTS', '0'))
+
+# Rendered payment QR images kept in memory per process (all are also cached on disk)
+QR_CACHE_SIZE = int(os.environ.get('QR_CACHE_SIZE', '256'))
+
+# Bulk product import/update: rows written per batch, and row errors listed in the report
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', '500'))
+BULK_MAX_ERRORS = int(os.environ.get('BULK_MAX_ERRORS', '100'))
+
+# Product image thumbnails: fetched once per image URL on save and resized in a process pool
+# (off by default on Vercel, where nothing runs after the response is sent)
+THUMBNAILS_ENABLED = os.environ.get('THUMBNAILS_ENABLED', '0' if os.environ.get('VERCEL') else '1').lower() in ('1', 'true', 'yes')
+THUMBNAIL_WIDTHS = tuple(int(w) for w in os.environ.get('THUMBNAIL_WIDTHS', '320,640').split(',') if w.strip())
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', '80'))
+THUMBNAIL_PROCESSES = int(os.environ.get('THUMBNAIL_PROCESSES', '2'))
+THUMBNAIL_MAX_BYTES = int(os.environ.get('THUMBNAIL_MAX_BYTES', str(10 * 1024 * 1024)))
+# Allow fetching images from private/loopback addresses (local image servers in development)
+THUMBNAIL_ALLOW_PRIVATE = os.environ.get('THUMBNAIL_ALLOW_PRIVATE', '0').lower() in ('1', 'true', 'yes')
+
+# Checkout stock holds: seconds an unpaid order keeps its stock (0 keeps it until settled),
+# and how often expired holds are released
+STOCK_RESERVATION_TTL = int(os.environ.get('STOCK_RESERVATION_TTL', '900'))
+STOCK_SWEEP_INTERVAL = float(os.environ.get('STOCK_SWEEP_INTERVAL', '30'))
+
+# Shopping carts: "sqlite" (shared across workers), "memory" (per process) or "session" (in the
+# signed cookie; default on Vercel, whose /tmp is not shared between instances)
+CART_BACKEND = os.environ.get('CART_BACKEND', 'session' if os.environ.get('VERCEL') else 'sqlite')
+CART_PATH = os.environ.get('CART_PATH')
+CART_TTL = int(os.environ.get('CART_TTL', str(30 * 86400)))
+CART_MAX_LINES = int(os.environ.get('CART_MAX_LINES', '100'))
+
+# "lazy" defers the inventory scan and SDK imports to first use (default on Vercel); "eager" does them at import
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'lazy' if os.environ.get('VERCEL') else 'eager')
+# Print a one-line startup timing summary when the app is imported
+STARTUP_REPORT = os.environ.get('STARTUP_REPORT', '1').lower() in ('1', 'true', 'yes')
+
+# Serve Prometheus metrics at /metrics (off by default); with a token set, scrapers must send
+# "Authorization: Bearer <token>"
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Profile requests and dump folded stacks for those slower than this many ms (0 = off), sampling every N ms
+PROFILE_SLOW_MS = int(os.environ.get('PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
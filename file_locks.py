@@ -0,0 +1,83 @@
+"""Per-file write locks and atomic saves for the JSON data files.
+
+Each path maps onto one of ``STRIPES`` in-process locks, so writers to
+different files rarely wait on each other, and an advisory ``fcntl.flock`` on
+a ``<file>.lock`` sidecar serializes writers across gunicorn workers. Saves go
+to a temp file in the same directory that is then renamed over the target, so
+readers always see a complete file and never need a lock. ``copy_up``
+seeds a writable file from a read-only original on first use.
+"""
+import contextlib
+import os
+import tempfile
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+STRIPES = 64
+_STRIPE_LOCKS = [threading.Lock() for _ in range(STRIPES)]
+
+
+def _stripe(path):
+    return _STRIPE_LOCKS[zlib.crc32(os.fspath(path).encode("utf-8")) % STRIPES]
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold the write lock for ``path`` in this process and, where possible, across processes.
+
+    Not reentrant: never nest two ``locked`` blocks.
+    """
+    with _stripe(path):
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(f"{os.fspath(path)}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # closing the descriptor releases the flock
+
+
+def atomic_write(path, data, durable=True):
+    """Replace ``path`` with ``data`` (str or bytes) through a temp file and rename.
+
+    ``durable=False`` skips the fsync: readers still never see a partial file,
+    but a power cut may lose the write.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    directory = os.path.dirname(os.fspath(path)) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            os.fchmod(fh.fileno(), 0o644)
+            fh.write(data)
+            fh.flush()
+            if durable:
+                os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+def copy_up(path, seed):
+    """Copy ``seed`` to ``path`` if ``path`` does not exist yet; returns ``path``.
+
+    Used for copy-on-write overlays, where a read-only bundle seeds a writable
+    directory one file at a time instead of being copied wholesale.
+    """
+    if seed is None or os.path.exists(path) or not os.path.exists(seed):
+        return path
+    with locked(path):
+        if not os.path.exists(path):
+            with open(seed, "rb") as fh:
+                atomic_write(path, fh.read())
+    return path
@@ -0,0 +1,153 @@
+"""Pooled, retrying HTTP client for Gemini, guarded by a circuit breaker.
+
+``GeminiHttp.post`` sends through one keep-alive ``requests.Session`` per
+process. The session is created on first use, so importing ``requests``
+stays lazy. Each call gets a total time budget that covers its retries.
+Connection errors, timeouts and 429/5xx answers are retried with full-jitter
+exponential backoff while the budget lasts.
+
+``CircuitBreaker`` opens after ``threshold`` consecutive failed calls. While
+it is open, calls fail at once with ``CircuitOpenError`` instead of waiting
+on the network. After ``reset_timeout`` seconds a single probe call is let
+through: success closes the breaker, and failure keeps it open for another
+period.
+"""
+import contextlib
+import random
+import threading
+import time
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.opened = 0  # times the breaker has tripped
+        self.rejected = 0  # calls refused while open
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        """Return True if a call may go out now; the caller must report its result."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                if self._opened_at is None:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    @contextlib.contextmanager
+    def guard(self):
+        """Run a block as one call: refused while open, any exception counts as a failure."""
+        if not self.allow():
+            raise CircuitOpenError("Gemini circuit breaker is open")
+        try:
+            yield
+        except Exception:
+            self.failure()
+            raise
+        self.success()
+
+
+class GeminiHttp:
+    def __init__(
+        self, http, breaker=None, pool_size=10, retries=2, backoff=0.25, connect_timeout=3.0
+    ):
+        self.http = http  # the requests module (or a lazy proxy for it)
+        self.breaker = breaker or CircuitBreaker()
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.connect_timeout = connect_timeout
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.retried = 0
+
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = self.http.Session()
+                    adapter = self.http.adapters.HTTPAdapter(
+                        pool_connections=2, pool_maxsize=self.pool_size
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def post(self, url, json=None, timeout=15, stream=False):
+        """POST within ``timeout`` seconds in total, retrying transient failures.
+
+        Returns the final response, which may still be a non-200 answer once retries
+        run out. Raises ``CircuitOpenError`` without sending anything while the breaker
+        is open, or the last connection/timeout error.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit breaker is open")
+        transient = (self.http.ConnectionError, self.http.Timeout)
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            error = resp = None
+            try:
+                resp = self.session().post(
+                    url,
+                    json=json,
+                    timeout=(min(self.connect_timeout, remaining), remaining),
+                    stream=stream,
+                )
+            except transient as e:
+                error = e
+            except Exception:
+                self.breaker.failure()
+                raise
+            if resp is not None and resp.status_code not in RETRY_STATUSES:
+                self.breaker.success()
+                return resp
+            delay = random.uniform(0, self.backoff * 2**attempt)
+            if attempt >= self.retries or time.monotonic() + delay >= deadline - 0.05:
+                self.breaker.failure()
+                if error is not None:
+                    raise error
+                return resp
+            if resp is not None:
+                resp.close()
+            attempt += 1
+            self.retried += 1
+            time.sleep(delay)
@@ -0,0 +1,81 @@
+"""Gemini chat over the plain REST API, as an alternative to the SDK transport.
+
+``RestChatModel`` covers the part of ``genai.GenerativeModel`` the app uses:
+``start_chat(history=...)`` and ``send_message(prompt, stream=...,
+request_options={"timeout": ...})``, with responses exposing ``.text`` and
+``.usage_metadata.prompt_token_count``.
+Requests go to ``<base_url>/models/<model>:generateContent`` (or
+``:streamGenerateContent?alt=sse``), so the chat can be pointed at any
+endpoint that speaks the same shapes, such as ``benchmarks.fake_gemini``.
+"""
+import json
+from types import SimpleNamespace
+
+
+class GeminiError(Exception):
+    pass
+
+
+def _response(data):
+    candidates = data.get("candidates") or []
+    parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+    usage = data.get("usageMetadata") or {}
+    return SimpleNamespace(
+        text="".join(p.get("text", "") for p in parts),
+        usage_metadata=SimpleNamespace(prompt_token_count=usage.get("promptTokenCount")),
+    )
+
+
+class RestChatModel:
+    def __init__(self, model_name, base_url, api_key, http, timeout=15):
+        self.model_name = model_name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.http = http  # anything with requests' ``post``
+        self.timeout = timeout
+
+    def start_chat(self, history=None):
+        return RestChat(self, history or [])
+
+    def _url(self, method, **params):
+        query = "&".join(f"{k}={v}" for k, v in {"key": self.api_key, **params}.items())
+        return f"{self.base_url}/models/{self.model_name}:{method}?{query}"
+
+    def generate(self, contents, timeout=None):
+        resp = self.http.post(
+            self._url("generateContent"),
+            json={"contents": contents},
+            timeout=timeout or self.timeout,
+        )
+        if resp.status_code != 200:
+            raise GeminiError(f"Non-200 status {resp.status_code}: {resp.text[:300]}")
+        return _response(resp.json())
+
+    def stream(self, contents, timeout=None):
+        resp = self.http.post(
+            self._url("streamGenerateContent", alt="sse"),
+            json={"contents": contents},
+            timeout=timeout or self.timeout,
+            stream=True,
+        )
+        try:
+            if resp.status_code != 200:
+                raise GeminiError(f"Non-200 status {resp.status_code}: {resp.text[:300]}")
+            for line in resp.iter_lines(decode_unicode=True):
+                if line and line.startswith("data:"):
+                    yield _response(json.loads(line[5:]))
+        finally:
+            resp.close()
+
+
+class RestChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history)
+
+    def send_message(self, prompt, stream=False, request_options=None):
+        contents = self.history + [{"role": "user", "parts": [{"text": prompt}]}]
+        timeout = (request_options or {}).get("timeout")
+        if stream:
+            return self.model.stream(contents, timeout)
+        return self.model.generate(contents, timeout)
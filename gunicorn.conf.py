@@ -0,0 +1,10 @@
+# Gunicorn settings picked up automatically when running `gunicorn app:app`.
+# Threaded workers keep a long-running /api/assistant_chat/stream response from
+# pinning a whole process, so page and cart requests keep being served.
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
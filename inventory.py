@@ -0,0 +1,536 @@
+"""In-memory inventory index over the retailer item tree.
+
+Items live on disk as ``<root>/<retailer>/<item_id>/details.json``. The index
+parses every file once, on ``load`` or the first lookup, and then answers
+lookups from memory. Writes
+made through the index update it directly; writes made by other workers are
+picked up by a throttled stat of the retailer directories, whose mtimes are
+bumped by every writer. ``update`` changes one item as a compare-and-swap
+against its stored version, for read-modify-write changes such as stock
+decrements that must not overwrite a concurrent writer.
+"""
+import bisect
+import calendar
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from file_locks import atomic_write, locked
+
+
+def _timestamp(value):
+    try:
+        return calendar.timegm(time.strptime(value or "", "%Y-%m-%dT%H:%M:%SZ"))
+    except ValueError:
+        return 0
+
+
+class WriteConflict(Exception):
+    """An item kept changing underneath ``InventoryIndex.update``.
+
+    From ``update_many``, ``item_ids`` names the items that were not written
+    and ``results`` holds the outcome for all the others.
+    """
+
+    def __init__(self, message, item_ids=(), results=None):
+        super().__init__(message)
+        self.item_ids = list(item_ids)
+        self.results = results or {}
+
+
+def _fingerprint(key, item):
+    raw = json.dumps([*key, item], sort_keys=True, separators=(",", ":"), default=str)
+    return int.from_bytes(hashlib.blake2b(raw.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _price(item):
+    try:
+        return float(item.get("price") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# Ascending sort keys; the trailing item_id makes every key unique so it can
+# double as a keyset pagination cursor.
+SORT_KEYS = {
+    "newest": lambda item: (-_timestamp(item.get("created_at")), str(item["item_id"])),
+    "price_asc": lambda item: (_price(item), str(item["item_id"])),
+    "price_desc": lambda item: (-_price(item), str(item["item_id"])),
+}
+
+
+class ItemTree:
+    """Filesystem source for item details, one ``details.json`` per item.
+
+    With a ``seed`` directory the tree is a copy-on-write overlay: items are
+    read from ``root`` first and then from the read-only ``seed``, writes
+    always go to ``root``, and deleting a seeded item leaves a ``.deleted``
+    marker in ``root`` that hides it.
+    """
+
+    WHITEOUT = ".deleted"
+
+    def __init__(self, root, seed=None):
+        self.root = Path(root)
+        self.seed = Path(seed) if seed is not None else None
+        self._parsed = {}  # path -> (stat key, item)
+
+    def item_dir(self, retailer, item_id):
+        return self.root / retailer / str(item_id)
+
+    def find_file(self, retailer, item_id, filename):
+        """Return the directory holding an item's ``filename``, checking ``root`` then ``seed``."""
+        for base in (self.root, self.seed):
+            if base is None:
+                continue
+            folder = base / retailer / str(item_id)
+            if (folder / self.WHITEOUT).exists():
+                return None
+            if (folder / filename).exists():
+                return folder
+        return None
+
+    @staticmethod
+    def _dir_mtimes(root):
+        out = {}
+        try:
+            entries = os.scandir(root)
+        except FileNotFoundError:
+            return out
+        with entries:
+            for entry in entries:
+                # Dot-directories (such as .thumbnails) are not retailers
+                if entry.is_dir() and not entry.name.startswith("."):
+                    out[entry.name] = entry.stat().st_mtime_ns
+        return out
+
+    def versions(self):
+        """Return ``{retailer: token}``; a token changes whenever that retailer is written."""
+        out = self._dir_mtimes(self.root)
+        if self.seed is not None:
+            # The seed never changes, so its mtimes only matter for retailers
+            # that have not been written to yet
+            for retailer, mtime in self._dir_mtimes(self.seed).items():
+                out.setdefault(retailer, ("seed", mtime))
+        return out
+
+    def _scan(self, folder):
+        """Yield ``(item_id, item)`` per item directory; ``item`` is None for a deletion marker."""
+        try:
+            entries = os.scandir(folder)
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        with entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                if os.path.exists(os.path.join(entry.path, self.WHITEOUT)):
+                    yield entry.name, None
+                    continue
+                details = os.path.join(entry.path, "details.json")
+                try:
+                    st = os.stat(details)
+                except FileNotFoundError:
+                    self._parsed.pop(details, None)
+                    continue
+                key = (st.st_mtime_ns, st.st_size, st.st_ino)
+                cached = self._parsed.get(details)
+                if cached and cached[0] == key:
+                    yield entry.name, cached[1]
+                    continue
+                try:
+                    with open(details, encoding="utf-8") as fh:
+                        item = json.load(fh)
+                except Exception:
+                    continue
+                self._parsed[details] = (key, item)
+                yield entry.name, item
+
+    def load_retailer(self, retailer):
+        """Return every readable item of ``retailer``, re-parsing only files that changed."""
+        found = dict(self._scan(self.root / retailer))
+        if self.seed is not None:
+            for name, item in self._scan(self.seed / retailer):
+                found.setdefault(name, item)
+        return [item for item in found.values() if item is not None]
+
+    def read(self, retailer, item_id):
+        """Return ``(version, item)`` for one item read straight from disk.
+
+        The version is the file's identity (inode, size, mtime), which every
+        atomic rewrite changes; ``(None, None)`` means there is no such item.
+        """
+        for base in (self.root, self.seed):
+            if base is None:
+                continue
+            folder = base / retailer / str(item_id)
+            if (folder / self.WHITEOUT).exists():
+                return None, None
+            try:
+                with open(folder / "details.json", "rb") as fh:
+                    st = os.fstat(fh.fileno())
+                    item = json.load(fh)
+            except FileNotFoundError:
+                continue
+            return self._version(base, st), item
+        return None, None
+
+    @staticmethod
+    def _version(base, st):
+        return (str(base), st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _current_version(self, retailer, item_id):
+        """``read``'s version without reading the file."""
+        for base in (self.root, self.seed):
+            if base is None:
+                continue
+            folder = base / retailer / str(item_id)
+            if (folder / self.WHITEOUT).exists():
+                return None
+            try:
+                return self._version(base, os.stat(folder / "details.json"))
+            except FileNotFoundError:
+                continue
+        return None
+
+    def read_many(self, retailer, item_ids):
+        """``read`` for several items; returns ``{item_id: (version, item)}``."""
+        return {str(item_id): self.read(retailer, item_id) for item_id in item_ids}
+
+    def swap(self, retailer, item_id, version, item):
+        """Write ``item`` only if the stored item is still at ``version``; returns success."""
+        return bool(self.swap_many(retailer, [(item_id, version, item)]))
+
+    def swap_many(self, retailer, changes, durable=True):
+        """``swap`` each ``(item_id, version, item)``; returns the ids written.
+
+        Each item is locked only while its own version is compared, and the
+        retailer directory is bumped once for the batch. ``durable=False``
+        skips the fsync of each file.
+        """
+        written = set()
+        for item_id, version, item in changes:
+            folder = self.item_dir(retailer, item_id)
+            folder.mkdir(parents=True, exist_ok=True)
+            path = folder / "details.json"
+            with locked(path):
+                if self._current_version(retailer, item_id) != version:
+                    continue
+                atomic_write(path, json.dumps(item, indent=2), durable=durable)
+            written.add(str(item_id))
+        if written:
+            self.touch(retailer)
+        return written
+
+    def write(self, item):
+        self.write_many([item])
+
+    def write_many(self, items):
+        """Write a batch of items, bumping each retailer directory once at the end."""
+        retailers = set()
+        for item in items:
+            folder = self.item_dir(item["retailer"], item["item_id"])
+            folder.mkdir(parents=True, exist_ok=True)
+            (folder / self.WHITEOUT).unlink(missing_ok=True)
+            # Under the item's lock so a concurrent ``swap`` sees this write
+            with locked(folder / "details.json"):
+                atomic_write(folder / "details.json", json.dumps(item, indent=2))
+            retailers.add(item["retailer"])
+        for retailer in retailers:
+            self.touch(retailer)
+
+    def delete(self, retailer, item_id):
+        folder = self.item_dir(retailer, item_id)
+        seeded = self.seed is not None and (
+            self.seed / retailer / str(item_id) / "details.json"
+        ).exists()
+        if not folder.exists() and not seeded:
+            return False
+        if folder.exists():
+            shutil.rmtree(folder)
+        self._parsed.pop(str(folder / "details.json"), None)
+        if seeded:
+            folder.mkdir(parents=True)
+            (folder / self.WHITEOUT).touch()
+        self.touch(retailer)
+        return True
+
+    def touch(self, retailer):
+        # In-place rewrites of details.json leave the directory mtime alone, so
+        # bump it explicitly; nanosecond precision keeps bursts distinguishable.
+        now = time.time_ns()
+        try:
+            os.utime(self.root / retailer, ns=(now, now))
+        except FileNotFoundError:
+            pass
+
+
+class InventoryIndex:
+    """Process-wide item index with secondary indexes by retailer, category and id.
+
+    Returned item dicts are shared with the index and must be treated as
+    read-only; ``get`` hands out a copy because callers decorate single items.
+    """
+
+    def __init__(self, source, check_interval=1.0):
+        self._source = source
+        self._check_interval = check_interval
+        self._lock = threading.RLock()
+        self._items = {}  # (retailer, item_id) -> item
+        self._by_id = {}  # item_id -> item
+        self._by_retailer = {}  # retailer -> {item_id: item}
+        self._by_category = {}  # category -> {(retailer, item_id): item}
+        self._versions = {}
+        self._checked_at = 0.0
+        self._listeners = []
+        self._ordered = {}  # sort -> (version, keys, items)
+        self._loaded = False
+        self.version = 0
+        self._fingerprints = {}  # (retailer, item_id) -> _fingerprint when indexed
+        self._digest = 0  # XOR of every value in _fingerprints
+
+    def subscribe(self, callback):
+        """Call ``callback(key, item)`` on every index change; ``item`` is None on removal."""
+        self._listeners.append(callback)
+        for key, item in self._items.items():
+            callback(key, item)
+
+    # ---- loading ----
+    def load(self):
+        with self._lock:
+            versions = self._source.versions()
+            for retailer in set(self._by_retailer) - set(versions):
+                self._reload_retailer(retailer)
+            for retailer in versions:
+                self._reload_retailer(retailer)
+            self._versions = versions
+            self._checked_at = time.monotonic()
+            self._loaded = True
+
+    def refresh(self, force=False):
+        """Reload retailers whose directory changed since the last check."""
+        if not self._loaded:
+            self.load()
+            return
+        now = time.monotonic()
+        if not force and now - self._checked_at < self._check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            versions = self._source.versions()
+            if versions == self._versions:
+                return
+            stale = {r for r in versions if versions[r] != self._versions.get(r)}
+            stale |= set(self._versions) - set(versions)
+            for retailer in stale:
+                self._reload_retailer(retailer)
+            self._versions = versions
+
+    def _reload_retailer(self, retailer):
+        fresh = {
+            str(item.get("item_id")): item
+            for item in self._source.load_retailer(retailer)
+            if item.get("item_id")
+        }
+        current = self._by_retailer.get(retailer, {})
+        for item_id in list(current):
+            if item_id not in fresh:
+                self._unindex(retailer, item_id)
+        for item_id, item in fresh.items():
+            if current.get(item_id) is not item:
+                self._index(retailer, item)
+
+    def _index(self, retailer, item):
+        item_id = str(item["item_id"])
+        key = (retailer, item_id)
+        old = self._items.get(key)
+        if old is not None:
+            self._by_category.get(old.get("category"), {}).pop(key, None)
+        fingerprint = _fingerprint(key, item)
+        self._digest ^= self._fingerprints.get(key, 0) ^ fingerprint
+        self._fingerprints[key] = fingerprint
+        self._items[key] = item
+        self._by_id[item_id] = item
+        self._by_retailer.setdefault(retailer, {})[item_id] = item
+        self._by_category.setdefault(item.get("category"), {})[key] = item
+        self.version += 1
+        for callback in self._listeners:
+            callback(key, item)
+
+    def _unindex(self, retailer, item_id):
+        key = (retailer, item_id)
+        old = self._items.pop(key, None)
+        if old is None:
+            return
+        if self._by_id.get(item_id) is old:
+            del self._by_id[item_id]
+        self._by_retailer.get(retailer, {}).pop(item_id, None)
+        self._by_category.get(old.get("category"), {}).pop(key, None)
+        self._digest ^= self._fingerprints.pop(key, 0)
+        self.version += 1
+        for callback in self._listeners:
+            callback(key, None)
+
+    # ---- writes ----
+    def save(self, item):
+        with self._lock:
+            self._source.write(item)
+            self._index(item["retailer"], item)
+        return item
+
+    def save_many(self, items):
+        """Write ``items`` as one batch, then index them together.
+
+        The source write happens outside the index lock so readers are not
+        held up by a large batch; a concurrent refresh can only index the
+        same items from disk.
+        """
+        self._source.write_many(items)
+        with self._lock:
+            for item in items:
+                self._index(item["retailer"], item)
+        return items
+
+    def update(self, retailer, item_id, mutate, attempts=32, durable=True):
+        """Change one item with an optimistic compare-and-swap on its stored version.
+
+        ``mutate`` gets a fresh copy of the stored item and returns the item to
+        write, or None to leave it as it is; an exception it raises aborts the
+        update. It is called again whenever another writer got in first, so it
+        must not have side effects. Returns the item now stored, or None if
+        there is no such item. Only this one item is locked, and only while its
+        version is compared and the new copy written. ``durable=False`` lets
+        the source skip flushing the write to disk.
+        """
+        return self.update_many(retailer, {str(item_id): mutate}, attempts, durable)[str(item_id)]
+
+    def update_many(self, retailer, mutations, attempts=32, durable=True):
+        """``update`` for ``{item_id: mutate}`` of one retailer, reading and writing in batches.
+
+        Items that lost a race are read and mutated again on their own; the
+        rest are not retried. Returns ``{item_id: item or None}``. Raises
+        ``WriteConflict`` if some item changed on every attempt, after the
+        others have been written.
+        """
+        pending = {str(item_id): mutate for item_id, mutate in mutations.items()}
+        results = {}
+        for _ in range(attempts):
+            reads = self._source.read_many(retailer, list(pending))
+            changes = []
+            for item_id, mutate in pending.items():
+                version, current = reads[item_id]
+                if current is None:
+                    results[item_id] = None
+                    continue
+                item = mutate(dict(current))
+                if item is None:
+                    results[item_id] = current
+                else:
+                    changes.append((item_id, version, item))
+            written = (
+                self._source.swap_many(retailer, changes, durable) if changes else set()
+            )
+            with self._lock:
+                for item_id, _, item in changes:
+                    if item_id in written:
+                        self._index(retailer, item)
+                        results[item_id] = item
+            pending = {
+                item_id: pending[item_id]
+                for item_id, _, _ in changes
+                if item_id not in written
+            }
+            if not pending:
+                return results
+        raise WriteConflict(
+            f"{retailer}/{', '.join(sorted(pending))} changed on every attempt",
+            sorted(pending),
+            results,
+        )
+
+    def delete(self, retailer, item_id):
+        with self._lock:
+            removed = self._source.delete(retailer, str(item_id))
+            self._unindex(retailer, str(item_id))
+        return removed
+
+    # ---- reads ----
+    def get(self, retailer, item_id):
+        self.refresh()
+        item = self._items.get((retailer, str(item_id)))
+        return dict(item) if item is not None else None
+
+    def get_many(self, keys):
+        """Return copies of the items at ``(retailer, item_id)`` keys, skipping missing ones.
+
+        All items come from one consistent snapshot, so prices and stock
+        levels across a cart are read together.
+        """
+        self.refresh()
+        with self._lock:
+            found = [self._items.get((retailer, str(item_id))) for retailer, item_id in keys]
+        return [dict(item) for item in found if item is not None]
+
+    def find(self, item_id):
+        self.refresh()
+        item = self._by_id.get(str(item_id))
+        return dict(item) if item is not None else None
+
+    def all(self):
+        self.refresh()
+        with self._lock:
+            return list(self._items.values())
+
+    def for_retailer(self, retailer):
+        self.refresh()
+        with self._lock:
+            return list(self._by_retailer.get(retailer, {}).values())
+
+    def in_category(self, category):
+        self.refresh()
+        with self._lock:
+            return list(self._by_category.get(category, {}).values())
+
+    def ordered(self, sort):
+        """Return ``(keys, items)`` sorted by ``SORT_KEYS[sort]``, cached until the index changes."""
+        self.refresh()
+        with self._lock:
+            cached = self._ordered.get(sort)
+            if cached and cached[0] == self.version:
+                return cached[1], cached[2]
+            key_fn = SORT_KEYS[sort]
+            pairs = sorted(((key_fn(item), item) for item in self._items.values()), key=lambda p: p[0])
+            keys = [k for k, _ in pairs]
+            items = [item for _, item in pairs]
+            self._ordered[sort] = (self.version, keys, items)
+            return keys, items
+
+    def page(self, sort, after=None, limit=24, predicate=None):
+        """Return up to ``limit`` items following the ``after`` key, plus the last key returned."""
+        keys, items = self.ordered(sort)
+        start = bisect.bisect_right(keys, tuple(after)) if after else 0
+        out = []
+        last = None
+        for i in range(start, len(items)):
+            if predicate is None or predicate(items[i]):
+                out.append(items[i])
+                last = keys[i]
+                if len(out) == limit:
+                    break
+        return out, last
+
+    def catalog_version(self):
+        """Return a digest of every item's key and whole stored document.
+
+        Unlike ``version``, which counts changes in this process, it depends
+        only on the items indexed, so workers holding the same catalog agree.
+        """
+        self.refresh()
+        return f"{self._digest:016x}"
+
+    def __len__(self):
+        return len(self._items)
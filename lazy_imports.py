@@ -0,0 +1,38 @@
+"""Deferred imports for heavy optional SDKs.
+
+``LazyModule("google.generativeai")`` stands in for the module and imports it
+on first attribute access, so processes that never call Gemini (or cold
+starts that serve a static page first) do not pay for the import.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    def __init__(self, name, on_import=None):
+        self.__dict__.update(_name=name, _on_import=on_import, _module=None)
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_name"])
+                    if self.__dict__["_on_import"] is not None:
+                        self.__dict__["_on_import"](module)
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def resolve(module):
+    """Import a ``LazyModule`` now (used to warm up eagerly); plain modules pass through."""
+    return module._load() if isinstance(module, LazyModule) else module
@@ -0,0 +1,145 @@
+"""Response cache for Gemini calls.
+
+Keys are a hash of the model name and the normalized prompt, so repeats that
+differ only in case, spacing or punctuation share an entry. Every use case
+(``faq``, ``recommend``, ``chat``) has its own TTL and hit/miss counters.
+Lookups go to an in-process LRU first and then to an optional shared tier
+(SQLite) that all gunicorn workers read and write.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from storage import SqliteDatabase
+
+_PUNCT_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+
+
+def normalize_prompt(text):
+    return " ".join(_PUNCT_RE.sub(" ", text.lower()).split())
+
+
+def cache_key(model_name, prompt):
+    raw = f"{model_name}\0{normalize_prompt(prompt)}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class MemoryLRU:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+SQLITE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    use_case TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_expiry ON llm_cache (expires_at);
+"""
+
+
+class SqliteTier:
+    """Cache tier shared by every process that opens the same database file."""
+
+    def __init__(self, path, prune_every=500):
+        self.db = SqliteDatabase(path, schema=SQLITE_CACHE_SCHEMA)
+        self._prune_every = prune_every
+        self._writes = 0
+
+    def get(self, key):
+        row = self.db.connect().execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row["expires_at"] <= time.time():
+            return None
+        return row["value"], row["expires_at"]
+
+    def set(self, key, use_case, value, expires_at):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, use_case, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, use_case, value, expires_at),
+            )
+            self._writes += 1
+            if self._writes % self._prune_every == 0:
+                conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+
+
+class ResponseCache:
+    def __init__(self, ttls, memory_size=1024, shared=None, default_ttl=300):
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        self.memory = MemoryLRU(memory_size)
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, use_case, field):
+        with self._lock:
+            stats = self._stats.setdefault(use_case, {"hits": 0, "misses": 0, "stores": 0})
+            stats[field] += 1
+
+    def get(self, use_case, model_name, prompt):
+        key = cache_key(model_name, prompt)
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            try:
+                found = self.shared.get(key)
+            except Exception as e:
+                print(f"[LLM cache] Shared tier read failed: {e}")
+                found = None
+            if found is not None:
+                value, expires_at = found
+                self.memory.set(key, value, expires_at)
+        self._count(use_case, "hits" if value is not None else "misses")
+        return value
+
+    def set(self, use_case, model_name, prompt, value):
+        ttl = self.ttls.get(use_case, self.default_ttl)
+        if value is None or ttl <= 0:
+            return
+        key = cache_key(model_name, prompt)
+        expires_at = time.time() + ttl
+        self.memory.set(key, value, expires_at)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, use_case, value, expires_at)
+            except Exception as e:
+                print(f"[LLM cache] Shared tier write failed: {e}")
+        self._count(use_case, "stores")
+
+    def stats(self):
+        with self._lock:
+            out = {use_case: dict(s) for use_case, s in self._stats.items()}
+        for s in out.values():
+            lookups = s["hits"] + s["misses"]
+            s["hit_ratio"] = round(s["hits"] / lookups, 4) if lookups else 0.0
+        return {"entries": len(self.memory), "use_cases": out}
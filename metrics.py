@@ -0,0 +1,144 @@
+"""In-process metrics with Prometheus text exposition.
+
+``METRICS`` is the process-wide registry. Counters and histograms are keyed by
+name plus a label set; collectors registered with ``add_collector`` are called
+at scrape time for values other objects already track (cache stats, session
+counts). Each gunicorn worker keeps its own registry, so a scrape reflects the
+worker that served it.
+"""
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}  # name -> (type, help)
+        self._counters = {}  # name -> {label_key: value}
+        self._histograms = {}  # name -> (buckets, {label_key: row})
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        self._help[name] = ("counter", help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self._help[name] = ("histogram", help_text)
+        self._histograms.setdefault(name, (tuple(buckets), {}))
+
+    def add_collector(self, collect):
+        """``collect()`` returns ``[(name, type, help, [(labels, value)])]`` at scrape time."""
+        self._collectors.append(collect)
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            buckets, series = self._histograms.setdefault(name, (DEFAULT_BUCKETS, {}))
+            row = series.get(key)
+            if row is None:
+                row = series[key] = [0] * (len(buckets) + 2)  # buckets..., sum, count
+            i = bisect.bisect_left(buckets, value)
+            if i < len(buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        """Decorator form of ``timer``."""
+
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorate
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {
+                n: (b, {k: list(r) for k, r in s.items()})
+                for n, (b, s) in self._histograms.items()
+            }
+        for name, series in sorted(counters.items()):
+            kind, help_text = self._help.get(name, ("counter", name))
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        for name, (buckets, series) in sorted(histograms.items()):
+            kind, help_text = self._help.get(name, ("histogram", name))
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for key, row in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(buckets, row):
+                    cumulative += count
+                    le = _format_labels(key, [("le", _format_value(float(bound)))])
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f'{name}_bucket{_format_labels(key, [("le", "+Inf")])} {row[-1]}')
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(row[-2])}")
+                lines.append(f"{name}_count{_format_labels(key)} {row[-1]}")
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"[Metrics] Collector failed: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(
+                        f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+METRICS.histogram("smartshop_storage_seconds", "Time spent in storage operations.")
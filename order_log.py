@@ -0,0 +1,172 @@
+"""Append-only JSON Lines log of orders with an ``order_id`` -> offset index.
+
+Every write appends one line, and a later line for the same ``order_id``
+supersedes earlier ones. The index maps each id to the byte range of its
+newest line, so a lookup is one positioned read however long the history
+is. Lines appended by other processes are picked up by scanning only the
+unread tail of the file, and ``compact`` rewrites the log without the
+superseded lines. Appends and compaction hold the log's file lock, so a
+compaction in one worker never drops a line another worker is appending.
+An optional read-only ``seed`` log is copied into place on first use.
+"""
+import json
+import os
+import threading
+
+from file_locks import copy_up, locked
+
+
+class OrderLog:
+    def __init__(self, path, compact_min=1000, compact_ratio=1.0, seed=None):
+        self.path = path
+        self.seed = seed
+        self.compact_min = compact_min
+        self.compact_ratio = compact_ratio
+        self._lock = threading.Lock()
+        self._index = {}  # order_id -> (offset, length) of its newest line
+        self._end = 0  # bytes of the file already indexed
+        # The file the index describes, kept open: reads go through it, so a
+        # compaction in another process can never move lines under an offset,
+        # and while it is open its inode cannot be reused by a newer file.
+        self._file = None
+        self._inode = None
+        self._dead = 0  # superseded or unreadable lines still in the file
+
+    def _ensure_seeded(self):
+        if self.seed is not None:
+            copy_up(self.path, self.seed)
+            self.seed = None
+
+    def _reset(self, file=None):
+        if self._file is not None:
+            self._file.close()
+        self._file = file
+        self._inode = os.fstat(file.fileno()).st_ino if file is not None else None
+        self._index, self._end, self._dead = {}, 0, 0
+
+    def _catch_up(self):
+        """Index lines appended since the last call; start over if the file was replaced."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if st.st_ino != self._inode or st.st_size < self._end:
+            try:
+                self._reset(open(self.path, "rb"))
+            except FileNotFoundError:
+                self._reset()
+                return
+            st = os.fstat(self._file.fileno())
+        offset = self._end
+        for line in self._lines(offset, st.st_size):
+            if not line.endswith(b"\n"):
+                break  # another writer is mid-append; index it next time
+            try:
+                order_id = json.loads(line)["order_id"]
+            except (ValueError, KeyError, TypeError):
+                order_id = None
+            if order_id is None or order_id in self._index:
+                self._dead += 1
+            if order_id is not None:
+                self._index[order_id] = (offset, len(line))
+            offset += len(line)
+        self._end = offset
+
+    def _lines(self, start, end, chunk=1 << 20):
+        """Yield the lines of the open file between two offsets, the last one possibly partial."""
+        fd = self._file.fileno()
+        pending = b""
+        while start < end:
+            data = os.pread(fd, min(chunk, end - start), start)
+            if not data:
+                break
+            start += len(data)
+            *lines, pending = (pending + data).split(b"\n")
+            for line in lines:
+                yield line + b"\n"
+        if pending:
+            yield pending
+
+    def _read(self, offset, length):
+        return json.loads(os.pread(self._file.fileno(), length, offset))
+
+    def append(self, order):
+        """Write ``order`` as a new line, superseding any earlier line with its id."""
+        line = (json.dumps(order, ensure_ascii=False) + "\n").encode("utf-8")
+        self._ensure_seeded()
+        with self._lock, locked(self.path):
+            with open(self.path, "ab") as f:
+                f.write(line)
+            self._catch_up()
+            if self._dead >= self.compact_min and self._dead > self.compact_ratio * len(
+                self._index
+            ):
+                self._compact()
+
+    def append_missing(self, orders):
+        """Append the ``orders`` whose id the log does not hold yet; returns how many it appended.
+
+        The ids are checked under the log's file lock, so callers racing to
+        import the same orders append each one once.
+        """
+        self._ensure_seeded()
+        with self._lock, locked(self.path):
+            self._catch_up()
+            missing = {o["order_id"]: o for o in orders if o["order_id"] not in self._index}
+            if missing:
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(
+                        (json.dumps(o, ensure_ascii=False) + "\n").encode("utf-8")
+                        for o in missing.values()
+                    ))
+                self._catch_up()
+        return len(missing)
+
+    def get(self, order_id):
+        self._ensure_seeded()
+        with self._lock:
+            self._catch_up()
+            entry = self._index.get(order_id)
+            if entry is None:
+                return None
+            return self._read(*entry)
+
+    def all(self):
+        """Return the newest version of every order, oldest first."""
+        self._ensure_seeded()
+        with self._lock:
+            self._catch_up()
+            return [self._read(*entry) for entry in sorted(self._index.values())]
+
+    def compact(self):
+        """Rewrite the log keeping only the newest line per order; returns the order count."""
+        self._ensure_seeded()
+        with self._lock, locked(self.path):
+            self._catch_up()
+            return self._compact()
+
+    def _compact(self):
+        if not self._index:
+            return 0
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        index, offset = {}, 0
+        with open(tmp, "wb") as dst:
+            for order_id, (start, length) in sorted(
+                self._index.items(), key=lambda kv: kv[1][0]
+            ):
+                dst.write(os.pread(self._file.fileno(), length, start))
+                index[order_id] = (offset, length)
+                offset += length
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp, self.path)
+        self._reset(open(self.path, "rb"))
+        self._index, self._end = index, offset
+        return len(index)
+
+    def stats(self):
+        self._ensure_seeded()
+        with self._lock:
+            self._catch_up()
+            return {"orders": len(self._index), "dead": self._dead, "bytes": self._end}
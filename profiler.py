@@ -0,0 +1,83 @@
+"""Opt-in sampling profiler that keeps stacks only for slow requests.
+
+While enabled, one background thread samples the Python stack of every thread
+currently serving a request, every ``interval`` seconds. When a request ends
+after more than ``threshold`` seconds, its samples are written in collapsed
+("folded") stack format, one ``frame;frame;frame count`` line per distinct
+stack, which ``flamegraph.pl`` and speedscope read directly.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SlowRequestProfiler:
+    def __init__(self, directory, threshold=0.5, interval=0.005):
+        self.directory = directory
+        self.threshold = threshold
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> Counter of folded stacks
+        self._thread = None
+        self.dumps = 0
+
+    def start(self):
+        """Begin sampling the calling thread; returns a token for ``stop``."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._sample_loop, name="request-profiler", daemon=True
+                )
+                self._thread.start()
+        return ident, time.perf_counter()
+
+    def stop(self, token, name):
+        """Stop sampling; write the stacks if the request was slow. Returns the file path or None."""
+        ident, started = token
+        with self._lock:
+            samples = self._active.pop(ident, None)
+        elapsed = time.perf_counter() - started
+        if not samples or elapsed < self.threshold:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        label = _UNSAFE_RE.sub("_", name).strip("_") or "request"
+        path = os.path.join(
+            self.directory, f"{stamp}-{int(elapsed * 1000)}ms-{label[:60]}.folded"
+        )
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        self.dumps += 1
+        return path
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is None or ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    samples[";".join(reversed(stack))] += 1
@@ -0,0 +1,85 @@
+"""Rendered UPI QR codes cached in memory and on disk.
+
+An order's payment payload never changes, so its QR PNG is rendered once and
+then served from an in-process LRU, backed by ``<order_id>.<etag>.png`` files
+that every worker shares. The ETag is a hash of the payload, so a changed UPI
+ID or amount gets a new image rather than a stale one.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from file_locks import atomic_write
+
+_ORDER_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def render_qr_png(payload):
+    import qrcode  # deferred: pulls in Pillow, which only QR rendering needs
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=6,
+        border=2,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def payload_etag(payload):
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:20]
+
+
+class QrCache:
+    def __init__(self, directory, memory_size=256):
+        self.directory = directory
+        self.memory_size = memory_size
+        self._memory = OrderedDict()  # (order_id, etag) -> png bytes
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qr")
+        self.renders = 0
+
+    def get(self, order_id, payload):
+        """Return ``(png_bytes, etag)`` for an order, rendering it only on first use."""
+        if not _ORDER_ID_RE.match(order_id):
+            raise ValueError(f"Invalid order id: {order_id!r}")
+        etag = payload_etag(payload)
+        key = (order_id, etag)
+        with self._lock:
+            png = self._memory.get(key)
+            if png is not None:
+                self._memory.move_to_end(key)
+                return png, etag
+        path = self.directory / f"{order_id}.{etag}.png"
+        try:
+            png = path.read_bytes()
+        except FileNotFoundError:
+            png = render_qr_png(payload)
+            self.renders += 1
+            os.makedirs(self.directory, exist_ok=True)
+            atomic_write(path, png)
+        with self._lock:
+            self._memory[key] = png
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+        return png, etag
+
+    def warm(self, order_id, payload):
+        """Render in the background so the first view is already cached."""
+
+        def render():
+            try:
+                self.get(order_id, payload)
+            except Exception as e:
+                print(f"QR pre-render error: {e}")
+
+        self._executor.submit(render)
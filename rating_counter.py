@@ -0,0 +1,86 @@
+"""Write-behind aggregation of recommendation rating clicks.
+
+Increments land in an in-process delta and are added to storage in one
+batch every ``flush_interval`` seconds or after ``flush_every`` clicks,
+whichever comes first. Storage applies each flush as an increment, so deltas
+from every worker add up. Reads are served from the last totals seen in
+storage plus this process's pending delta; the totals are re-read at most
+once per ``flush_interval`` to pick up other workers' flushes.
+"""
+import atexit
+import threading
+import time
+
+
+class RatingCounter:
+    def __init__(self, storage, flush_interval=5.0, flush_every=100):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._base = None  # totals last read from storage
+        self._base_at = 0.0
+        self._delta = {}
+        self._inflight = {}  # delta being written by flush, still counted in reads
+        self._pending = 0
+        self._timer = None
+        atexit.register(self.flush)
+
+    def incr(self, rating, amount=1):
+        """Count a click and return the current totals."""
+        with self._lock:
+            self._delta[rating] = self._delta.get(rating, 0) + amount
+            self._pending += amount
+            flush_now = self._pending >= self.flush_every
+            if not flush_now and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+        return self.totals()
+
+    def totals(self):
+        now = time.monotonic()
+        with self._lock:
+            stale = self._base is None or now - self._base_at >= self.flush_interval
+        if stale:
+            base = dict(self.storage.get_ratings())
+            with self._lock:
+                self._base, self._base_at = base, now
+        with self._lock:
+            out = dict(self._base)
+            for delta in (self._inflight, self._delta):
+                for rating, amount in delta.items():
+                    out[rating] = out.get(rating, 0) + amount
+        return out
+
+    def flush(self):
+        # One flush at a time, so a slow write never double-counts a delta
+        with self._flush_lock:
+            with self._lock:
+                delta, self._delta, self._pending = self._delta, {}, 0
+                self._inflight = dict(delta)
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            base = None
+            try:
+                for rating in list(delta):
+                    base = self.storage.add_rating(rating, delta[rating])
+                    del delta[rating]
+            except Exception as e:
+                print(f"[Ratings] Flush failed: {e}")
+                with self._lock:
+                    # Put back only what was not written, and re-read the rest
+                    for rating, amount in delta.items():
+                        self._delta[rating] = self._delta.get(rating, 0) + amount
+                        self._pending += amount
+                    self._inflight = {}
+                    self._base_at = 0.0
+                return
+            with self._lock:
+                if base is not None:
+                    self._base, self._base_at = dict(base), time.monotonic()
+                self._inflight = {}
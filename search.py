@@ -0,0 +1,152 @@
+"""Tokenized inverted index with BM25 ranking for product retrieval.
+
+Documents are item dicts keyed by ``(retailer, item_id)``. Name, category,
+tags and description are indexed with per-field weights, and the index is
+kept current through ``InventoryIndex.subscribe`` so it never rescans the
+catalog. Query terms also match longer indexed words they prefix
+("lapt" -> "laptop", "laptop" -> "laptops") at a reduced weight.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+STOPWORDS = frozenset(
+    """a an and are any can do does for from give have i im in is it looking me
+    my need of on or please show some something the to want what with you""".split()
+)
+
+FIELD_WEIGHTS = (
+    ("name", 3),
+    ("category", 2),
+    ("tags", 2),
+    ("description_full", 1),
+)
+
+PREFIX_WEIGHT = 0.5
+MIN_PREFIX_LEN = 3
+
+
+def tokenize(text):
+    return [
+        t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS
+    ]
+
+
+def item_terms(item):
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        value = item.get(field) or ""
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(v) for v in value)
+        for token in tokenize(str(value)):
+            terms[token] += weight
+    return terms
+
+
+class SearchIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings = {}  # term -> {key: tf}
+        self._doc_terms = {}  # key -> Counter
+        self._doc_len = {}  # key -> weighted length
+        self._docs = {}  # key -> item
+        self._total_len = 0
+        self._vocab = []  # sorted terms, rebuilt lazily for prefix lookups
+        self._vocab_dirty = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ---- maintenance ----
+    def on_inventory_change(self, key, item):
+        """``InventoryIndex.subscribe`` callback: ``item`` is None on removal."""
+        if item is None:
+            self.remove(key)
+        else:
+            self.add(key, item)
+
+    def add(self, key, item):
+        terms = item_terms(item)
+        with self._lock:
+            self._remove(key)
+            for term, tf in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._vocab_dirty = True
+                postings[key] = tf
+            length = sum(terms.values())
+            self._doc_terms[key] = terms
+            self._doc_len[key] = length
+            self._docs[key] = item
+            self._total_len += length
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        terms = self._doc_terms.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+                self._vocab_dirty = True
+        self._total_len -= self._doc_len.pop(key)
+        del self._docs[key]
+
+    # ---- querying ----
+    def _expand(self, term):
+        """Yield ``(indexed_term, weight)`` pairs matched by one query term."""
+        if term in self._postings:
+            yield term, 1.0
+        if len(term) < MIN_PREFIX_LEN:
+            return
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        i = bisect.bisect_right(self._vocab, term)
+        while i < len(self._vocab) and self._vocab[i].startswith(term):
+            yield self._vocab[i], PREFIX_WEIGHT
+            i += 1
+
+    def scores(self, query, keys=None):
+        """Return ``{key: bm25_score}`` for documents matching ``query``."""
+        query_terms = set(tokenize(query))
+        scores = {}
+        with self._lock:
+            n = len(self._docs)
+            if not n or not query_terms:
+                return scores
+            avg_len = self._total_len / n
+            k1, b = self.k1, self.b
+            for q in query_terms:
+                for term, weight in self._expand(q):
+                    postings = self._postings[term]
+                    df = len(postings)
+                    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                    for key, tf in postings.items():
+                        if keys is not None and key not in keys:
+                            continue
+                        norm = tf + k1 * (1 - b + b * self._doc_len[key] / avg_len)
+                        scores[key] = scores.get(key, 0.0) + weight * idf * tf * (k1 + 1) / norm
+        return scores
+
+    def search(self, query, limit=5, keys=None):
+        """Return up to ``limit`` ``(score, item)`` pairs, best first."""
+        scores = self.scores(query, keys)
+        top = heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+        hits = [(score, self._docs.get(key)) for key, score in top]
+        return [(score, item) for score, item in hits if item is not None]
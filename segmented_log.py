@@ -0,0 +1,124 @@
+"""Size-bounded, rotating JSON Lines segments written by a background thread.
+
+``append`` only enqueues the entry; a writer thread drains the bounded queue
+and appends whole batches to the newest ``<prefix>-NNNNNN.jsonl`` segment in
+``directory``. A segment that reaches ``max_bytes`` is closed and a new one
+started, and only the newest ``max_segments`` are kept (0 keeps all). When
+the queue is full, ``append`` writes synchronously instead of dropping the
+entry. Rotation holds the directory's file lock, so workers sharing the
+directory agree on the current segment.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+
+from file_locks import locked
+
+
+class SegmentedLog:
+    def __init__(
+        self, directory, prefix="log", max_bytes=1 << 20, max_segments=0, queue_size=1000
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_segments = max_segments
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def segments(self):
+        """Return segment paths, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        start = f"{self.prefix}-"
+        return [
+            self.directory / name
+            for name in sorted(names)
+            if name.startswith(start) and name.endswith(".jsonl")
+        ]
+
+    def _segment_path(self, number):
+        return self.directory / f"{self.prefix}-{number:06d}.jsonl"
+
+    # ---- writing ----
+    def append(self, entry):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.write([entry])
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.prefix}-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception as e:
+                print(f"[{self.prefix}] Write failed, {len(batch)} entries lost: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def write(self, entries):
+        """Append ``entries`` now, rotating whenever the current segment is full."""
+        lines = [(json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8") for e in entries]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with locked(self.directory):
+            segments = self.segments() or [self._segment_path(1)]
+            path = segments[-1]
+            size = path.stat().st_size if path.exists() else 0
+            while lines:
+                if size >= self.max_bytes:
+                    path = self._segment_path(int(path.stem.rsplit("-", 1)[1]) + 1)
+                    segments.append(path)
+                    size = 0
+                # Fill the segment up to max_bytes, but always at least one line
+                take, chunk = 0, 0
+                while take < len(lines) and (take == 0 or size + chunk < self.max_bytes):
+                    chunk += len(lines[take])
+                    take += 1
+                with open(path, "ab") as fh:
+                    fh.write(b"".join(lines[:take]))
+                lines, size = lines[take:], size + chunk
+            if self.max_segments:
+                for old in segments[: -self.max_segments]:
+                    old.unlink(missing_ok=True)
+
+    def flush(self):
+        """Block until every queued entry has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    # ---- reading ----
+    def __iter__(self):
+        for path in self.segments():
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    for line in fh:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue  # torn or partially written line
+            except FileNotFoundError:
+                continue  # rotated away while reading
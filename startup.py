@@ -0,0 +1,52 @@
+"""Startup timing report.
+
+``StartupTimer`` is created at the top of ``app.py`` and marks the end of each
+initialization phase, so cold starts can be compared across deployments and
+``STARTUP_MODE`` settings.
+"""
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StartupTimer:
+    def __init__(self, mode=None):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = []  # (name, milliseconds)
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, round((now - self._last) * 1000, 1)))
+        self._last = now
+
+    def total_ms(self):
+        return round((self._last - self.started) * 1000, 1)
+
+    def report(self):
+        return {
+            "mode": self.mode,
+            "total_ms": self.total_ms(),
+            "peak_rss_mib": peak_rss_mib(),
+            "phases": dict(self.phases),
+        }
+
+    def summary(self):
+        phases = ", ".join(f"{name} {ms}ms" for name, ms in self.phases)
+        return (
+            f"[Startup] {self.mode} start in {self.total_ms()}ms, "
+            f"peak RSS {peak_rss_mib()} MiB ({phases})"
+        )
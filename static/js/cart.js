@@ -6,6 +6,9 @@ async function removeFromCart(item_id, retailer){
   const res = await postJSON('/cart/remove', { item_id, retailer });
   return res;
 }
+async function setCartQuantity(item_id, retailer, quantity){
+  return postJSON('/cart/add', { item_id, retailer, quantity });
+}
 async function clearCart(){
   return postJSON('/cart/clear', {});
 }
@@ -52,6 +55,18 @@ function setupCartPage(){
       }
     });
   }
+  document.querySelectorAll('.qty-input').forEach(input=>{
+    input.addEventListener('change', async ()=>{
+      const quantity = parseInt(input.value, 10);
+      if(!(quantity >= 1)) return;
+      const r = await setCartQuantity(input.getAttribute('data-item'), input.getAttribute('data-retailer'), quantity);
+      if(r.ok){
+        location.reload();
+      } else {
+        alert('Error updating quantity: '+(r.error||''));
+      }
+    });
+  });
   document.querySelectorAll('.remove-btn').forEach(btn=>{
     btn.addEventListener('click', async ()=>{
       const item_id = btn.getAttribute('data-item');
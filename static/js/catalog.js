@@ -0,0 +1,41 @@
+// Lazy-loads further catalog pages into the /app product grid on scroll.
+function initCatalogGrid(){
+  const grid = document.getElementById('productGrid');
+  const sentinel = document.getElementById('productGridSentinel');
+  if(!grid || !sentinel) return;
+  let cursor = grid.dataset.nextCursor;
+  let loading = false;
+
+  async function loadNextPage(){
+    if(loading || !cursor) return;
+    loading = true;
+    sentinel.textContent = 'Loading more products...';
+    try {
+      const params = new URLSearchParams(grid.dataset.query || '');
+      params.set('cursor', cursor);
+      params.set('html', '1');
+      const res = await fetch('/api/items?' + params.toString());
+      const data = await res.json();
+      if(!data.ok) throw new Error(data.error || 'Failed to load products');
+      grid.insertAdjacentHTML('beforeend', data.html);
+      grid.querySelectorAll('.product-card').forEach(el => { el.style.opacity = '1'; });
+      cursor = data.next_cursor;
+      sentinel.textContent = '';
+    } catch (error) {
+      console.error('Catalog error:', error);
+      sentinel.textContent = 'Could not load more products.';
+      cursor = null;
+    } finally {
+      loading = false;
+    }
+    if(cursor && sentinel.getBoundingClientRect().top < window.innerHeight){
+      loadNextPage();
+    }
+  }
+
+  if(!cursor) return;
+  const observer = new IntersectionObserver(entries => {
+    if(entries.some(e => e.isIntersecting)) loadNextPage();
+  }, { rootMargin: '400px' });
+  observer.observe(sentinel);
+}
@@ -46,7 +46,7 @@ function initOrderPage(mode){
     const data = await res.json();
     if(data.ok){
       const img = document.createElement('img');
-      img.src = 'data:image/png;base64,' + data.image;
+      img.src = data.image_url;
       img.alt = 'Payment QR';
       img.style.maxWidth = '200px';
       qrContainer.innerHTML = '';
@@ -0,0 +1,170 @@
+"""Stock reservations for checkout, without a global lock.
+
+``StockEngine.reserve(order_id, lines)`` takes stock for every line of an
+order or for none of them. Each item is decremented on its own through
+``InventoryIndex.update``, a compare-and-swap against that item's stored
+version, so checkouts of different items never wait on each other and two
+checkouts of the last unit cannot both succeed. If a line is short, the lines
+already taken are put back before ``OutOfStock`` is raised; meanwhile other
+shoppers may briefly see those units as gone, which can only undersell.
+
+A reservation is stored as ``held`` until ``expires_at``. ``commit`` (payment
+received) keeps the stock taken, and ``release`` (cancelled, or expired when
+``sweep`` finds it) puts it back. Both first move the record out of ``held``
+with the storage's ``claim_reservation``, which only one worker can win, so
+stock is returned at most once.
+"""
+import threading
+import time
+from collections import Counter
+
+
+class OutOfStock(Exception):
+    def __init__(self, retailer, item_id, requested, available):
+        super().__init__(f"Only {available} left of {retailer}/{item_id}, {requested} requested")
+        self.retailer = retailer
+        self.item_id = item_id
+        self.requested = requested
+        self.available = available
+
+
+def _now_iso():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+class StockEngine:
+    def __init__(self, inventory, storage, ttl=900, sweep_interval=30, on_release=None):
+        self.inventory = inventory
+        self.storage = storage  # add/get/claim/iter_reservations
+        self.ttl = ttl  # seconds a held reservation lasts; 0 keeps it until settled
+        self.sweep_interval = sweep_interval
+        self.on_release = on_release  # called with (reservation, reason) after stock is back
+        self._sweep_lock = threading.Lock()
+        self._swept_at = 0.0
+        self._sweeper = None
+        self.reserved = 0
+        self.rejected = 0
+        self.committed = 0
+        self.released = Counter()  # reason -> count
+
+    # ---- single items ----
+    def _adjust(self, retailer, item_id, delta):
+        def apply(item):
+            available = int(item.get("stock") or 0)
+            if available + delta < 0:
+                raise OutOfStock(retailer, item_id, -delta, available)
+            item["stock"] = available + delta
+            item["updated_at"] = _now_iso()
+            return item
+
+        # Not fsynced, like the order log and reservations written with it
+        return self.inventory.update(retailer, item_id, apply, durable=False)
+
+    # ---- orders ----
+    def reserve(self, order_id, lines):
+        """Hold stock for ``(retailer, item_id, quantity)`` lines; all or nothing.
+
+        Returns the stored reservation. Raises ``OutOfStock`` (or ``LookupError``
+        for an item that no longer exists) with nothing held.
+        """
+        self.maybe_sweep()
+        wanted = Counter()
+        for retailer, item_id, quantity in lines:
+            wanted[(retailer, str(item_id))] += int(quantity)
+        taken = []
+        try:
+            for (retailer, item_id), quantity in sorted(wanted.items()):
+                if self._adjust(retailer, item_id, -quantity) is None:
+                    raise LookupError(f"No such item {retailer}/{item_id}")
+                taken.append((retailer, item_id, quantity))
+        except Exception as e:
+            if isinstance(e, OutOfStock):
+                self.rejected += 1
+            self._put_back(taken)
+            raise
+        now = time.time()
+        reservation = {
+            "order_id": order_id,
+            "lines": [
+                {"retailer": r, "item_id": i, "quantity": q} for r, i, q in taken
+            ],
+            "state": "held",
+            "created_at": _now_iso(),
+            "expires_at": now + self.ttl if self.ttl > 0 else None,
+        }
+        try:
+            self.storage.add_reservation(reservation)
+        except Exception:
+            self._put_back(taken)
+            raise
+        self.reserved += 1
+        return reservation
+
+    def _put_back(self, lines):
+        for retailer, item_id, quantity in lines:
+            try:
+                self._adjust(retailer, item_id, quantity)
+            except Exception as e:
+                print(f"[Stock] Could not return {quantity} x {retailer}/{item_id}: {e}")
+
+    def commit(self, order_id):
+        """Keep the stock of a held reservation for good; returns it, or None if not held."""
+        reservation = self.storage.claim_reservation(order_id, "committed")
+        if reservation is not None:
+            self.committed += 1
+        return reservation
+
+    def release(self, order_id, reason="cancelled"):
+        """Return the stock of a held reservation; returns it, or None if not held."""
+        reservation = self.storage.claim_reservation(order_id, reason)
+        if reservation is None:
+            return None
+        self._put_back(
+            (line["retailer"], line["item_id"], line["quantity"])
+            for line in reservation["lines"]
+        )
+        self.released[reason] += 1
+        if self.on_release is not None:
+            try:
+                self.on_release(reservation, reason)
+            except Exception as e:
+                print(f"[Stock] Release callback failed for {order_id}: {e}")
+        return reservation
+
+    # ---- expiry ----
+    def sweep(self, now=None):
+        """Release every held reservation past its expiry; returns how many were released."""
+        now = time.time() if now is None else now
+        released = 0
+        for reservation in list(self.storage.iter_reservations("held")):
+            expires_at = reservation.get("expires_at")
+            if expires_at is not None and expires_at <= now:
+                if self.release(reservation["order_id"], "expired") is not None:
+                    released += 1
+        return released
+
+    def maybe_sweep(self):
+        """Sweep if the last sweep in this process is older than ``sweep_interval``."""
+        now = time.monotonic()
+        if now - self._swept_at < self.sweep_interval or not self._sweep_lock.acquire(False):
+            return
+        try:
+            self._swept_at = now
+            self.sweep()
+        except Exception as e:
+            print(f"[Stock] Reservation sweep failed: {e}")
+        finally:
+            self._sweep_lock.release()
+
+    def start(self):
+        """Sweep in a daemon thread every ``sweep_interval`` seconds."""
+        if self._sweeper is not None or self.ttl <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(max(self.sweep_interval, 1.0))
+                self.maybe_sweep()
+
+        self._sweeper = threading.Thread(target=run, name="stock-sweeper", daemon=True)
+        self._sweeper.start()
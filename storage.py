@@ -0,0 +1,837 @@
+"""Storage backends for accounts, orders, FAQ, ratings and item details.
+
+``JsonStorage`` keeps the original on-disk layout (``data/*.json`` plus one
+``details.json`` per item), except that orders live in an append-only
+``data/orders.jsonl`` log, the FAQ question log in rotating segments under
+``data/faq_log/`` and stock reservations as one file each under
+``data/reservations/``. ``SqliteStorage`` keeps the same records in indexed
+tables of a single WAL-mode database so every mutation is a row-level write.
+Both expose the same methods, and ``.items`` on either is a source for
+``inventory.InventoryIndex``.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from file_locks import atomic_write, copy_up, locked
+from inventory import ItemTree
+from metrics import METRICS
+from order_log import OrderLog
+from segmented_log import SegmentedLog
+
+DEFAULT_RATINGS = {"excellent": 0, "good": 0, "bad": 0}
+
+
+# --------------- Utility JSON I/O ---------------
+def _read_json(path, default):
+    try:
+        return json.loads(path.read_text() or "null") or default
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError:
+        return default
+
+
+@METRICS.timed("smartshop_storage_seconds", op="load_json")
+def load_json(path, default):
+    # Saves are atomic renames, so reads need no lock
+    data = _read_json(path, default)
+    if data is None:
+        with locked(path):
+            data = _read_json(path, default)
+            if data is None:
+                atomic_write(path, json.dumps(default, indent=2))
+                return default
+    return data
+
+
+@METRICS.timed("smartshop_storage_seconds", op="save_json")
+def save_json(path, data):
+    with locked(path):
+        atomic_write(path, json.dumps(data, indent=2))
+
+
+@METRICS.timed("smartshop_storage_seconds", op="update_json")
+def update_json(path, default, mutate):
+    """Read, ``mutate(data)`` and save ``path`` under its lock; returns what ``mutate`` returns."""
+    with locked(path):
+        data = _read_json(path, default)
+        if data is None:
+            data = default
+        result = mutate(data)
+        atomic_write(path, json.dumps(data, indent=2))
+    return result
+
+
+def _now_iso():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+# --------------- JSON backend ---------------
+class JsonStorage:
+    name = "json"
+
+    def __init__(
+        self,
+        data_dir,
+        upload_dir,
+        faq_segment_bytes=1 << 20,
+        faq_max_segments=0,
+        data_seed=None,
+        upload_seed=None,
+    ):
+        # Optional read-only originals: files are read from data_seed until
+        # their first write copies them into data_dir (copy-on-write)
+        self.data_seed = data_seed
+        self.auth_file = data_dir / "Auth.json"
+        self.count_file = data_dir / "count.json"
+        self.faq_file = data_dir / "FAQ.json"
+        # Stores legacy purchase 'requests' and 'orders'
+        self.purchase_file = data_dir / "purchase.json"
+        self.order_log = OrderLog(
+            data_dir / "orders.jsonl", seed=self._seed_of(data_dir / "orders.jsonl")
+        )
+        self.faq_log = SegmentedLog(
+            data_dir / "faq_log",
+            prefix="faq",
+            max_bytes=faq_segment_bytes,
+            max_segments=faq_max_segments,
+        )
+        self._static_faq = None  # (stat key, static_faq) of the last FAQ.json parsed
+        self._legacy_order_cache = None  # (stat key, orders) of the last purchase.json parsed
+        self.reservation_dir = data_dir / "reservations"
+        self.items = ItemTree(upload_dir, seed=upload_seed)
+
+    # ---- copy-on-write overlay ----
+    def _seed_of(self, path):
+        return self.data_seed / path.name if self.data_seed is not None else None
+
+    def _read(self, path):
+        """The writable copy of a data file if there is one, else its seed original."""
+        seed = self._seed_of(path)
+        if seed is not None and not path.exists() and seed.exists():
+            return seed
+        return path
+
+    def _writable(self, path):
+        """Copy a seeded data file into data_dir before its first write."""
+        return copy_up(path, self._seed_of(path))
+
+    def init_defaults(self, static_faq):
+        # Only creates files that are missing. Orders and FAQ questions still
+        # kept in purchase.json / FAQ.json are read through until
+        # migrate_legacy moves them, so startup never rewrites them.
+        load_json(
+            self._read(self.count_file),
+            {"recommendation_ratings": dict(DEFAULT_RATINGS), "last_updated": _now_iso()},
+        )
+        load_json(self._read(self.faq_file), {"static_faq": static_faq})
+        load_json(self._read(self.purchase_file), {"requests": [], "orders": []})
+
+    def migrate_legacy(self):
+        """Move orders and FAQ questions kept in purchase.json / FAQ.json into their logs.
+
+        Safe to run from several processes at once; every entry is moved once.
+        Orders the log already holds are kept as they are there. Returns the
+        counts moved.
+        """
+        moved = {"orders": 0, "faq_log": 0}
+        legacy = (_read_json(self._read(self.purchase_file), {}) or {}).get("orders") or []
+        if legacy:
+            # Logged before they leave purchase.json, so a crash loses none
+            moved["orders"] = self.order_log.append_missing(legacy)
+            ids = {o["order_id"] for o in legacy}
+
+            def drop(data):
+                data.setdefault("requests", [])
+                data["orders"] = [o for o in data.get("orders") or [] if o["order_id"] not in ids]
+
+            update_json(self._writable(self.purchase_file), {}, drop)
+        if "dynamic_log" in (_read_json(self._read(self.faq_file), {}) or {}):
+            # Claimed (removed from FAQ.json) first, so only one run writes them
+            questions = update_json(
+                self._writable(self.faq_file), {}, lambda data: data.pop("dynamic_log", None)
+            ) or []
+            if questions:
+                self.faq_log.write(questions)
+            moved["faq_log"] = len(questions)
+        return moved
+
+    # ---- accounts ----
+    def _accounts(self):
+        return load_json(self._read(self.auth_file), {"accounts": {}})
+
+    def get_account(self, username):
+        return self._accounts()["accounts"].get(username)
+
+    def iter_accounts(self):
+        return iter(self._accounts()["accounts"].values())
+
+    def add_account(self, account):
+        def add(auth):
+            accounts = auth.setdefault("accounts", {})
+            if account["username"] in accounts:
+                return False
+            accounts[account["username"]] = account
+            return True
+
+        return update_json(self._writable(self.auth_file), {"accounts": {}}, add)
+
+    def update_account(self, username, fields):
+        return bool(self.update_accounts({username: fields}))
+
+    def update_accounts(self, updates):
+        """Apply ``{username: fields}`` in one write; returns how many accounts changed."""
+
+        def update(auth):
+            accounts = auth.setdefault("accounts", {})
+            changed = 0
+            for username, fields in updates.items():
+                if username in accounts:
+                    accounts[username].update(fields)
+                    changed += 1
+            return changed
+
+        return update_json(self._writable(self.auth_file), {"accounts": {}}, update)
+
+    # ---- orders ----
+    def _purchases(self):
+        data = load_json(
+            self._read(self.purchase_file), {"requests": [], "orders": []}
+        )
+        data.setdefault("requests", [])
+        data.setdefault("orders", [])
+        return data
+
+    def add_order(self, order):
+        self.order_log.append(order)
+
+    def _legacy_orders(self):
+        """``{order_id: order}`` still in purchase.json, parsed once per change of the file."""
+        try:
+            st = self._read(self.purchase_file).stat()
+        except FileNotFoundError:
+            return {}
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached = self._legacy_order_cache
+        if cached is None or cached[0] != key:
+            orders = {o["order_id"]: o for o in self._purchases()["orders"]}
+            cached = self._legacy_order_cache = (key, orders)
+        return cached[1]
+
+    def get_order(self, order_id):
+        order = self.order_log.get(order_id)
+        if order is None:
+            # purchase.json keeps older orders until migrate_legacy moves them
+            order = copy.deepcopy(self._legacy_orders().get(order_id))
+        return order
+
+    def iter_orders(self):
+        orders = self.order_log.all()
+        logged = {o["order_id"] for o in orders}
+        orders += [copy.deepcopy(o) for i, o in self._legacy_orders().items() if i not in logged]
+        return iter(orders)
+
+    def compact_orders(self):
+        return self.order_log.compact()
+
+    def iter_purchase_requests(self):
+        return iter(self._purchases()["requests"])
+
+    # ---- FAQ ----
+    def _faq(self):
+        return load_json(self._read(self.faq_file), {"static_faq": []})
+
+    def get_static_faq(self):
+        # FAQ.json only changes when edited by hand, so parse it once per change
+        try:
+            st = self._read(self.faq_file).stat()
+        except FileNotFoundError:
+            return []
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached = self._static_faq
+        if cached is None or cached[0] != key:
+            cached = self._static_faq = (key, self._faq().get("static_faq", []))
+        return cached[1]
+
+    def append_faq_log(self, entry):
+        self.faq_log.append(entry)
+
+    def iter_faq_log(self):
+        self.faq_log.flush()
+        # FAQ.json keeps older questions until migrate_legacy moves them
+        yield from self._faq().get("dynamic_log", [])
+        yield from self.faq_log
+
+    # ---- ratings ----
+    def _counts(self):
+        return load_json(self._read(self.count_file), {})
+
+    def get_ratings(self):
+        return self._counts().get("recommendation_ratings", {})
+
+    def add_rating(self, rating, amount=1):
+        def add(counts):
+            rec = counts.setdefault("recommendation_ratings", dict(DEFAULT_RATINGS))
+            rec[rating] = rec.get(rating, 0) + amount
+            counts["last_updated"] = _now_iso()
+            return rec
+
+        return update_json(self._writable(self.count_file), {}, add)
+
+    # ---- stock reservations ----
+    def add_reservation(self, reservation):
+        os.makedirs(self.reservation_dir, exist_ok=True)
+        # Not fsynced: losing a record leaves its stock held, which never oversells
+        atomic_write(
+            self.reservation_dir / f"{reservation['order_id']}.json",
+            json.dumps(reservation, indent=2),
+            durable=False,
+        )
+
+    def get_reservation(self, order_id):
+        for folder in (self.reservation_dir, self.reservation_dir / "settled"):
+            reservation = _read_json(folder / f"{order_id}.json", None)
+            if reservation:
+                return reservation
+        return None
+
+    def claim_reservation(self, order_id, state):
+        """Move a ``held`` reservation to ``state``; returns it, or None if it was not held.
+
+        Settled reservations move to ``settled/``, so sweeps only read open ones.
+        """
+        path = self.reservation_dir / f"{order_id}.json"
+        # One lock for all claims: settling is rare, and it spares a sidecar per order
+        with locked(self.reservation_dir / "claims"):
+            reservation = _read_json(path, None)
+            if not reservation or reservation.get("state") != "held":
+                return None
+            reservation["state"] = state
+            reservation["settled_at"] = _now_iso()
+            os.makedirs(self.reservation_dir / "settled", exist_ok=True)
+            atomic_write(self.reservation_dir / "settled" / path.name, json.dumps(reservation, indent=2))
+            path.unlink()
+        return reservation
+
+    def iter_reservations(self, state="held"):
+        folder = self.reservation_dir if state == "held" else self.reservation_dir / "settled"
+        try:
+            names = sorted(os.listdir(folder))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(".json"):
+                reservation = _read_json(folder / name, None)
+                if reservation and reservation.get("state") == state:
+                    yield reservation
+
+
+# --------------- SQLite backend ---------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    username TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    password TEXT NOT NULL,
+    created_at TEXT,
+    last_login TEXT,
+    profile TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total_amount REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_user ON orders (user, created_at);
+CREATE TABLE IF NOT EXISTS purchase_requests (
+    request_id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS faq_static (
+    position INTEGER PRIMARY KEY,
+    q TEXT NOT NULL,
+    a TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS faq_log (
+    id TEXT PRIMARY KEY,
+    user TEXT,
+    question TEXT NOT NULL,
+    answer TEXT,
+    ts TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS faq_log_ts ON faq_log (ts);
+CREATE TABLE IF NOT EXISTS ratings (
+    rating TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS items (
+    retailer TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    category TEXT,
+    updated_at TEXT,
+    rev INTEGER NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (retailer, item_id)
+);
+CREATE INDEX IF NOT EXISTS items_category ON items (category);
+CREATE TABLE IF NOT EXISTS item_versions (
+    retailer TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stock_reservations (
+    order_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    expires_at REAL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stock_reservations_expiry ON stock_reservations (state, expires_at);
+"""
+
+
+class SqliteDatabase:
+    """Per-thread connections to one WAL-mode database file."""
+
+    def __init__(self, path, schema=SCHEMA):
+        self.path = str(path)
+        self._local = threading.local()
+        self.connect().executescript(schema)
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def transaction(self):
+        return _Transaction(self.connect())
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SqliteItemSource:
+    """``InventoryIndex`` source backed by the ``items`` table."""
+
+    def __init__(self, db):
+        self.db = db
+        self._parsed = {}  # (retailer, item_id) -> (rev, item)
+
+    def versions(self):
+        rows = self.db.connect().execute("SELECT retailer, version FROM item_versions")
+        return {row["retailer"]: row["version"] for row in rows}
+
+    def load_retailer(self, retailer):
+        items = []
+        rows = self.db.connect().execute(
+            "SELECT item_id, rev, doc FROM items WHERE retailer = ?", (retailer,)
+        )
+        for row in rows:
+            key = (retailer, row["item_id"])
+            cached = self._parsed.get(key)
+            if cached and cached[0] == row["rev"]:
+                items.append(cached[1])
+                continue
+            item = json.loads(row["doc"])
+            self._parsed[key] = (row["rev"], item)
+            items.append(item)
+        return items
+
+    def write(self, item):
+        self.write_many([item])
+
+    def write_many(self, items):
+        """Write a batch of items in one transaction, so it lands all at once or not at all."""
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO items (retailer, item_id, category, updated_at, rev, doc) "
+                "VALUES (?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (retailer, item_id) DO UPDATE SET category = excluded.category, "
+                "updated_at = excluded.updated_at, rev = rev + 1, doc = excluded.doc",
+                [
+                    (
+                        item["retailer"],
+                        str(item["item_id"]),
+                        item.get("category"),
+                        item.get("updated_at"),
+                        json.dumps(item),
+                    )
+                    for item in items
+                ],
+            )
+            for retailer in {item["retailer"] for item in items}:
+                self._bump(conn, retailer)
+
+    def read(self, retailer, item_id):
+        """Return ``(rev, item)`` for one item, or ``(None, None)`` if it does not exist."""
+        row = self.db.connect().execute(
+            "SELECT rev, doc FROM items WHERE retailer = ? AND item_id = ?", (retailer, item_id)
+        ).fetchone()
+        return (row["rev"], json.loads(row["doc"])) if row else (None, None)
+
+    def read_many(self, retailer, item_ids):
+        """``read`` for several items in one query per 500 ids; returns ``{item_id: (rev, item)}``."""
+        ids = [str(item_id) for item_id in item_ids]
+        found = {}
+        conn = self.db.connect()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            rows = conn.execute(
+                "SELECT item_id, rev, doc FROM items WHERE retailer = ? "
+                f"AND item_id IN ({', '.join('?' * len(chunk))})",
+                (retailer, *chunk),
+            )
+            for row in rows:
+                found[row["item_id"]] = (row["rev"], json.loads(row["doc"]))
+        return {item_id: found.get(item_id, (None, None)) for item_id in ids}
+
+    def swap(self, retailer, item_id, version, item):
+        """Write ``item`` only if its row is still at revision ``version``; returns success."""
+        return bool(self.swap_many(retailer, [(item_id, version, item)]))
+
+    def swap_many(self, retailer, changes, durable=True):
+        """``swap`` each ``(item_id, version, item)`` in one transaction; returns the ids written.
+
+        ``durable`` is accepted for parity with ``ItemTree``; commits follow
+        the database's ``synchronous`` setting either way.
+        """
+        written = set()
+        with self.db.transaction() as conn:
+            for item_id, version, item in changes:
+                cur = conn.execute(
+                    "UPDATE items SET category = ?, updated_at = ?, rev = rev + 1, doc = ? "
+                    "WHERE retailer = ? AND item_id = ? AND rev = ?",
+                    (
+                        item.get("category"),
+                        item.get("updated_at"),
+                        json.dumps(item),
+                        retailer,
+                        str(item_id),
+                        version,
+                    ),
+                )
+                if cur.rowcount:
+                    written.add(str(item_id))
+            if written:
+                self._bump(conn, retailer)
+        return written
+
+    def delete(self, retailer, item_id):
+        with self.db.transaction() as conn:
+            cur = conn.execute(
+                "DELETE FROM items WHERE retailer = ? AND item_id = ?", (retailer, item_id)
+            )
+            if cur.rowcount:
+                self._bump(conn, retailer)
+        self._parsed.pop((retailer, item_id), None)
+        return bool(cur.rowcount)
+
+    @staticmethod
+    def _bump(conn, retailer):
+        conn.execute(
+            "INSERT INTO item_versions (retailer, version) VALUES (?, 1) "
+            "ON CONFLICT (retailer) DO UPDATE SET version = version + 1",
+            (retailer,),
+        )
+
+
+class SqliteStorage:
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.db = SqliteDatabase(path)
+        self.items = SqliteItemSource(self.db)
+
+    def init_defaults(self, static_faq):
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO ratings (rating, count, updated_at) VALUES (?, 0, ?)",
+                [(rating, _now_iso()) for rating in DEFAULT_RATINGS],
+            )
+            if not conn.execute("SELECT 1 FROM faq_static LIMIT 1").fetchone():
+                conn.executemany(
+                    "INSERT INTO faq_static (position, q, a) VALUES (?, ?, ?)",
+                    [(pos, f["q"], f["a"]) for pos, f in enumerate(static_faq)],
+                )
+
+    # ---- accounts ----
+    @staticmethod
+    def _account(row):
+        if row is None:
+            return None
+        account = dict(row)
+        account["profile"] = json.loads(account["profile"] or "{}")
+        return account
+
+    def get_account(self, username):
+        row = self.db.connect().execute(
+            "SELECT * FROM accounts WHERE username = ?", (username,)
+        ).fetchone()
+        return self._account(row)
+
+    def iter_accounts(self):
+        for row in self.db.connect().execute("SELECT * FROM accounts"):
+            yield self._account(row)
+
+    def add_account(self, account):
+        with self.db.transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO accounts "
+                "(username, role, password, created_at, last_login, profile) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    account["username"],
+                    account["role"],
+                    account["password"],
+                    account.get("created_at"),
+                    account.get("last_login"),
+                    json.dumps(account.get("profile") or {}),
+                ),
+            )
+        return bool(cur.rowcount)
+
+    def update_account(self, username, fields):
+        return bool(self.update_accounts({username: fields}))
+
+    def update_accounts(self, updates):
+        """Apply ``{username: fields}`` in one transaction; returns how many accounts changed."""
+        changed = 0
+        with self.db.transaction() as conn:
+            for username, fields in updates.items():
+                columns = [
+                    c
+                    for c in ("role", "password", "created_at", "last_login", "profile")
+                    if c in fields
+                ]
+                if not columns:
+                    continue
+                values = [
+                    json.dumps(fields[c]) if c == "profile" else fields[c] for c in columns
+                ]
+                assignments = ", ".join(f"{c} = ?" for c in columns)
+                cur = conn.execute(
+                    f"UPDATE accounts SET {assignments} WHERE username = ?",
+                    (*values, username),
+                )
+                changed += cur.rowcount
+        return changed
+
+    # ---- orders ----
+    def add_order(self, order):
+        with self.db.transaction() as conn:
+            self._insert_order(conn, order)
+
+    @staticmethod
+    def _insert_order(conn, order):
+        conn.execute(
+            "INSERT OR REPLACE INTO orders (order_id, user, status, total_amount, created_at, doc) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                order["order_id"],
+                order["user"],
+                order["status"],
+                order["total_amount"],
+                order["created_at"],
+                json.dumps(order),
+            ),
+        )
+
+    def get_order(self, order_id):
+        row = self.db.connect().execute(
+            "SELECT doc FROM orders WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        return json.loads(row["doc"]) if row else None
+
+    def iter_orders(self):
+        for row in self.db.connect().execute("SELECT doc FROM orders ORDER BY created_at"):
+            yield json.loads(row["doc"])
+
+    def iter_purchase_requests(self):
+        for row in self.db.connect().execute("SELECT doc FROM purchase_requests"):
+            yield json.loads(row["doc"])
+
+    # ---- FAQ ----
+    def get_static_faq(self):
+        rows = self.db.connect().execute("SELECT q, a FROM faq_static ORDER BY position")
+        return [{"q": row["q"], "a": row["a"]} for row in rows]
+
+    def append_faq_log(self, entry):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO faq_log (id, user, question, answer, ts) "
+                "VALUES (:id, :user, :question, :answer, :ts)",
+                entry,
+            )
+
+    def iter_faq_log(self):
+        for row in self.db.connect().execute("SELECT * FROM faq_log ORDER BY ts"):
+            yield dict(row)
+
+    # ---- ratings ----
+    def get_ratings(self):
+        rows = self.db.connect().execute("SELECT rating, count FROM ratings")
+        return {row["rating"]: row["count"] for row in rows}
+
+    def add_rating(self, rating, amount=1):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO ratings (rating, count, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (rating) DO UPDATE SET count = count + excluded.count, "
+                "updated_at = excluded.updated_at",
+                (rating, amount, _now_iso()),
+            )
+        return self.get_ratings()
+
+    # ---- stock reservations ----
+    def add_reservation(self, reservation):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stock_reservations (order_id, state, expires_at, doc) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    reservation["order_id"],
+                    reservation["state"],
+                    reservation.get("expires_at"),
+                    json.dumps(reservation),
+                ),
+            )
+
+    def get_reservation(self, order_id):
+        row = self.db.connect().execute(
+            "SELECT doc FROM stock_reservations WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        return json.loads(row["doc"]) if row else None
+
+    def claim_reservation(self, order_id, state):
+        """Move a ``held`` reservation to ``state``; returns it, or None if it was not held."""
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT doc FROM stock_reservations WHERE order_id = ? AND state = 'held'",
+                (order_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            reservation = json.loads(row["doc"])
+            reservation["state"] = state
+            reservation["settled_at"] = _now_iso()
+            conn.execute(
+                "UPDATE stock_reservations SET state = ?, doc = ? WHERE order_id = ?",
+                (state, json.dumps(reservation), order_id),
+            )
+        return reservation
+
+    def iter_reservations(self, state="held"):
+        rows = self.db.connect().execute(
+            "SELECT doc FROM stock_reservations WHERE state = ? ORDER BY expires_at", (state,)
+        )
+        for row in rows.fetchall():
+            yield json.loads(row["doc"])
+
+    # ---- migration ----
+    def import_from(self, source):
+        """Copy every record of ``source`` into this database; returns row counts."""
+        stats = {}
+        with self.db.transaction() as conn:
+            accounts = list(source.iter_accounts())
+            conn.executemany(
+                "INSERT OR REPLACE INTO accounts "
+                "(username, role, password, created_at, last_login, profile) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        a["username"],
+                        a["role"],
+                        a["password"],
+                        a.get("created_at"),
+                        a.get("last_login"),
+                        json.dumps(a.get("profile") or {}),
+                    )
+                    for a in accounts
+                ],
+            )
+            stats["accounts"] = len(accounts)
+
+            orders = list(source.iter_orders())
+            for order in orders:
+                self._insert_order(conn, order)
+            stats["orders"] = len(orders)
+
+            requests = list(source.iter_purchase_requests())
+            conn.executemany(
+                "INSERT OR REPLACE INTO purchase_requests (request_id, doc) VALUES (?, ?)",
+                [(r["request_id"], json.dumps(r)) for r in requests],
+            )
+            stats["purchase_requests"] = len(requests)
+
+            static_faq = source.get_static_faq()
+            conn.execute("DELETE FROM faq_static")
+            conn.executemany(
+                "INSERT INTO faq_static (position, q, a) VALUES (?, ?, ?)",
+                [(pos, f["q"], f["a"]) for pos, f in enumerate(static_faq)],
+            )
+            stats["faq_static"] = len(static_faq)
+
+            log = list(source.iter_faq_log())
+            conn.executemany(
+                "INSERT OR REPLACE INTO faq_log (id, user, question, answer, ts) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (e["id"], e.get("user"), e["question"], e.get("answer"), e["ts"])
+                    for e in log
+                ],
+            )
+            stats["faq_log"] = len(log)
+
+            ratings = source.get_ratings()
+            conn.executemany(
+                "INSERT OR REPLACE INTO ratings (rating, count, updated_at) VALUES (?, ?, ?)",
+                [(rating, count, _now_iso()) for rating, count in ratings.items()],
+            )
+            stats["ratings"] = len(ratings)
+
+            item_count = 0
+            for retailer in source.items.versions():
+                for item in source.items.load_retailer(retailer):
+                    conn.execute(
+                        "INSERT OR REPLACE INTO items "
+                        "(retailer, item_id, category, updated_at, rev, doc) "
+                        "VALUES (?, ?, ?, ?, 1, ?)",
+                        (
+                            retailer,
+                            str(item["item_id"]),
+                            item.get("category"),
+                            item.get("updated_at"),
+                            json.dumps(item),
+                        ),
+                    )
+                    item_count += 1
+                SqliteItemSource._bump(conn, retailer)
+            stats["items"] = item_count
+        return stats
+
+
+def open_storage(backend, data_dir, upload_dir, sqlite_path=None, **json_options):
+    if backend == "sqlite":
+        return SqliteStorage(sqlite_path or data_dir / "smartshop.db")
+    if backend == "json":
+        return JsonStorage(data_dir, upload_dir, **json_options)
+    raise ValueError(f"Unknown storage backend: {backend}")
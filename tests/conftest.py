@@ -0,0 +1,79 @@
+"""Shared fixtures.
+
+The app reads its configuration and opens its stores when ``app`` is
+imported, so the environment points it at a scratch copy of the bundled
+data before any test imports it.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRATCH = Path(tempfile.mkdtemp(prefix="smartshop-tests-"))
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+
+_generated = shutil.ignore_patterns(
+    "*.db", "*.db-*", "*.lock", ".thumbnails", "qr_cache", "profiles", "reservations",
+    "orders.jsonl", "faq_log",
+)
+shutil.copytree(ROOT / "data", SCRATCH / "data", ignore=_generated)
+shutil.copytree(ROOT / "retailer_uploads", SCRATCH / "retailer_uploads", ignore=_generated)
+
+os.environ.pop("VERCEL", None)
+os.environ.update(
+    {
+        "DATA_PATH": str(SCRATCH / "data"),
+        "UPLOAD_PATH": str(SCRATCH / "retailer_uploads"),
+        "SECRET_KEY": "tests",
+        "GEMINI_API_KEY": "",
+        "STARTUP_REPORT": "0",
+        "THUMBNAILS_ENABLED": "0",
+        "INVENTORY_CHECK_INTERVAL": "0",
+    }
+)
+
+
+@pytest.fixture(scope="session")
+def smartshop():
+    import app
+
+    return app
+
+
+@pytest.fixture
+def client(smartshop):
+    return smartshop.app.test_client()
+
+
+@pytest.fixture
+def shopper(smartshop):
+    client = smartshop.app.test_client()
+    client.get("/guest_login/user")
+    return client
+
+
+@pytest.fixture
+def retailer(smartshop):
+    client = smartshop.app.test_client()
+    client.get("/guest_login/retailer")
+    return client
+
+
+@pytest.fixture
+def place_order(smartshop, shopper):
+    """Order one unit of the best-stocked item as ``shopper``; returns the order id."""
+
+    def place_order():
+        item = max(smartshop.INVENTORY.all(), key=lambda i: int(i.get("stock") or 0))
+        resp = shopper.post("/order/create", json={
+            "retailer": item["retailer"], "item_id": item["item_id"],
+            "name": "Ann", "phone": "1", "email": "a@example.com", "address": "Pune",
+        })
+        assert resp.status_code == 200
+        return resp.get_json()["order_id"]
+
+    return place_order
@@ -0,0 +1,93 @@
+import pytest
+
+from accounts import AccountStore
+from storage import JsonStorage
+
+FAST = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture
+def storage(tmp_path):
+    (tmp_path / "data").mkdir()
+    return JsonStorage(tmp_path / "data", tmp_path / "uploads")
+
+
+def account(username, password="pw"):
+    return {"username": username, "role": "user", "password": password, "profile": {}}
+
+
+def test_passwords_are_stored_hashed(storage):
+    accounts = AccountStore(storage, method=FAST)
+    assert accounts.add(account("ann", "secret"))
+    assert not accounts.add(account("ann", "other"))
+    stored = storage.get_account("ann")["password"]
+    assert stored.startswith("pbkdf2:") and "secret" not in stored
+    assert accounts.authenticate("ann", "secret")["username"] == "ann"
+    assert accounts.authenticate("ann", "wrong") is None
+    assert accounts.authenticate("bob", "secret") is None
+
+
+def test_plaintext_and_outdated_hashes_are_upgraded_on_login(storage):
+    storage.add_account(account("old", "plain"))
+    AccountStore(storage, method="pbkdf2:sha256:500").add(account("weak", "pw"))
+    accounts = AccountStore(storage, method=FAST)
+
+    assert accounts.authenticate("old", "nope") is None
+    assert storage.get_account("old")["password"] == "plain"  # no upgrade on a failed login
+    assert accounts.authenticate("old", "plain")
+    assert accounts.authenticate("weak", "pw")
+    for username in ("old", "weak"):
+        assert storage.get_account(username)["password"].startswith("pbkdf2:sha256:1000$")
+    assert accounts.authenticate("old", "plain")
+
+
+def test_accounts_registered_by_another_worker_are_found(storage):
+    accounts = AccountStore(storage, method=FAST)
+    assert accounts.get("ann") is None  # fills the index
+    AccountStore(storage, method=FAST).add(account("ann", "pw"))
+    assert accounts.authenticate("ann", "pw") is not None
+
+
+def test_login_stamps_are_written_in_one_batch(storage, monkeypatch):
+    accounts = AccountStore(storage, method=FAST, flush_interval=3600)
+    for name in ("ann", "bob"):
+        accounts.add(account(name))
+    writes = []
+    real = storage.update_accounts
+    monkeypatch.setattr(storage, "update_accounts", lambda u: writes.append(u) or real(u))
+
+    accounts.record_login("ann", "2026-01-01T00:00:00Z")
+    accounts.record_login("bob", "2026-01-01T00:00:01Z")
+    assert accounts.get("ann")["last_login"] == "2026-01-01T00:00:00Z"
+    assert storage.get_account("ann").get("last_login") is None
+    assert accounts.flush() == 2
+    assert len(writes) == 1
+    assert storage.get_account("bob")["last_login"] == "2026-01-01T00:00:01Z"
+    assert accounts.flush() == 0
+
+
+def test_failed_flush_keeps_the_stamps(storage, monkeypatch):
+    accounts = AccountStore(storage, method=FAST, flush_interval=3600)
+    accounts.add(account("ann"))
+    accounts.record_login("ann", "2026-01-01T00:00:00Z")
+
+    def broken(updates):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(storage, "update_accounts", broken)
+    assert accounts.flush() == 0
+    monkeypatch.undo()
+    assert accounts.flush() == 1
+    assert storage.get_account("ann")["last_login"] == "2026-01-01T00:00:00Z"
+
+
+def test_register_then_log_in(client):
+    form = {"username": "carol", "password": "hunter22", "role": "user"}
+    assert client.post("/register", data=form).status_code == 302
+    assert b"Username already exists." in client.post("/register", data=form).data
+    for wrong in ({"password": "wrong"}, {"role": "retailer"}):
+        assert b"Invalid credentials" in client.post("/login", data={**form, **wrong}).data
+    assert client.get("/app").status_code == 302  # still logged out
+    resp = client.post("/login", data=form)
+    assert resp.status_code == 302 and resp.location.endswith("/app")
+    assert client.get("/app").status_code == 200
@@ -0,0 +1,114 @@
+import json
+import time
+import uuid
+
+import pytest
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class FakeChatModel:
+    """Stands in for the Gemini chat model: replies with ``reply`` split into words."""
+
+    def __init__(self, reply="Try the red mug", delay=0.0, fail_after=None):
+        self.reply, self.delay, self.fail_after = reply, delay, fail_after
+        self.histories = []
+
+    def start_chat(self, history):
+        self.histories.append(history)
+        return self
+
+    def send_message(self, prompt, stream=False, request_options=None):
+        words = self.reply.split(" ")
+        if not stream:
+            return Chunk(self.reply)
+        return self._stream(words)
+
+    def _stream(self, words):
+        for n, word in enumerate(words):
+            if n == self.fail_after:
+                raise ConnectionError("upstream went away")
+            time.sleep(self.delay)
+            yield Chunk(word if n == 0 else " " + word)
+
+
+@pytest.fixture
+def model(smartshop, monkeypatch):
+    fake = FakeChatModel()
+    monkeypatch.setattr(smartshop, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(smartshop, "GEMINI_TRANSPORT", "rest")  # no circuit breaker
+    monkeypatch.setattr(smartshop, "chat_model", lambda: fake)
+    return fake
+
+
+def events(resp):
+    out = []
+    for block in resp.get_data(as_text=True).split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def ask(client, message=None):
+    # A fresh message each time so the response cache never answers
+    message = message or f"any mugs? {uuid.uuid4().hex}"
+    return client.post("/api/assistant_chat/stream", json={"message": message})
+
+
+def test_reply_streams_token_by_token(model, shopper, smartshop):
+    resp = ask(shopper)
+    assert resp.mimetype == "text/event-stream"
+    got = events(resp)
+    assert got[0][0] == "session" and got[-1][0] == "done"
+    tokens = [data["text"] for name, data in got if name == "token"]
+    assert tokens[:4] == ["Try", " the", " red", " mug"]
+    session_id = got[0][1]["session_id"]
+    history = smartshop.CHAT_STORE.get(session_id)["history"]
+    assert history[-1]["parts"][0]["text"].startswith("Try the red mug")
+
+
+def test_upstream_failure_mid_stream_ends_the_turn_politely(model, shopper, smartshop):
+    model.fail_after = 2
+    got = events(ask(shopper))
+    tokens = [data["text"] for name, data in got if name == "token"]
+    assert tokens[:2] == ["Try", " the"]
+    assert tokens[2] == "\n\n" + smartshop.AI_ERROR_MESSAGE
+    assert got[-1][0] == "done"
+
+
+def test_requests_are_validated(client, shopper):
+    assert client.post("/api/assistant_chat/stream", json={"message": "hi"}).status_code == 401
+    assert shopper.post("/api/assistant_chat/stream", json={"message": "  "}).status_code == 400
+
+
+def test_busy_when_every_upstream_slot_is_taken(model, shopper, smartshop, monkeypatch):
+    monkeypatch.setattr(smartshop, "LLM_QUEUE_TIMEOUT", 0.01)
+    held = 0
+    while smartshop.LLM_SLOTS.acquire(blocking=False):
+        held += 1
+    try:
+        tokens = [d["text"] for name, d in events(ask(shopper)) if name == "token"]
+    finally:
+        for _ in range(held):
+            smartshop.LLM_SLOTS.release()
+    assert tokens[0] == smartshop.AI_BUSY_MESSAGE
+    assert model.histories == []
+
+
+def test_heartbeats_while_waiting_and_slot_released(model, smartshop):
+    model.delay = 0.05
+    before = smartshop.LLM_SLOTS._value
+    chunks = list(smartshop.stream_gemini_with_history(
+        f"slow {uuid.uuid4().hex}", "no products", [], heartbeat=0.01,
+    ))
+    assert None in chunks
+    assert "".join(c for c in chunks if c) == "Try the red mug"
+    deadline = time.monotonic() + 2
+    while smartshop.LLM_SLOTS._value != before and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert smartshop.LLM_SLOTS._value == before
@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.run import compare, percentile, summarize
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run(*args):
+    env = {k: v for k, v in os.environ.items() if k not in ("DATA_PATH", "UPLOAD_PATH")}
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--items", "30", "--retailers", "3",
+         "--requests", "2", "--workers", "0", *args],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300,
+    )
+
+
+def test_summary_and_percentiles():
+    assert percentile([], 50) == 0.0
+    assert percentile([0.1, 0.2, 0.3, 0.4], 50) == 0.3
+    assert summarize([0.002, 0.001], 1, 0.5) == {
+        "requests": 2, "errors": 1, "rps": 4.0, "p50_ms": 2.0, "p99_ms": 2.0,
+    }
+
+
+def test_compare_flags_slower_routes_only():
+    baseline = {"routes": {"GET /app": {"p50_ms": 10, "rps": 100},
+                           "GET /cart": {"p50_ms": 1, "rps": 100}}}
+    current = {"routes": {"GET /app": {"p50_ms": 12, "rps": 70},
+                          "GET /cart": {"p50_ms": 1.1, "rps": 95}}}
+    assert compare(current, baseline, 0.25) == ["routes GET /app: 100 -> 70 req/s"]
+    assert compare(current, baseline, 0.1) == [
+        "routes GET /app: p50 10 -> 12 ms", "routes GET /app: 100 -> 70 req/s",
+    ]
+
+
+def test_smoke_run_against_a_saved_baseline(tmp_path):
+    baseline, out = tmp_path / "baseline.json", tmp_path / "results.json"
+    saved = run("--baseline", str(baseline), "--save-baseline")
+    assert saved.returncode == 0, saved.stderr
+    recorded = json.loads(baseline.read_text())["30-items/json"]
+    assert {r["errors"] for r in recorded["routes"].values()} == {0}
+
+    again = run("--baseline", str(baseline), "--json", str(out), "--tolerance", "100")
+    assert again.returncode == 0, again.stdout + again.stderr
+    assert json.loads(out.read_text())["routes"].keys() == recorded["routes"].keys()
+
+    for route in recorded["routes"].values():
+        route["rps"] *= 1000  # an impossibly fast baseline
+    baseline.write_text(json.dumps({"30-items/json": recorded}))
+    regressed = run("--baseline", str(baseline))
+    assert regressed.returncode == 1
+    assert "Regressions against baseline" in regressed.stdout
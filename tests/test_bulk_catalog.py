@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def prefix():
+    return f"t{uuid.uuid4().hex[:8]}"
+
+
+def import_csv(retailer, text, **query):
+    params = "&".join(f"{k}={v}" for k, v in {"format": "csv", **query}.items())
+    return retailer.post(f"/store/import?{params}", data=text.encode(), content_type="text/csv")
+
+
+def test_csv_import_creates_updates_and_reports_bad_rows(smartshop, retailer, prefix):
+    text = (
+        "item_id,name,category,price,stock,tags\n"
+        f"{prefix}-a,Mug,kitchen,4.50,10,\"blue,ceramic\"\n"
+        f"{prefix}-b,Plate,kitchen,abc,1,\n"
+        f"{prefix}-c,,kitchen,3,1,\n"
+        f"{prefix}-a,,,5.00,,\n"
+    )
+    report = import_csv(retailer, text).get_json()
+    assert report["ok"] and report["done"]
+    assert (report["rows"], report["created"], report["updated"], report["failed"]) == (4, 1, 1, 2)
+    assert [(e["row"], e["error"]) for e in report["errors"]] == [
+        (3, "price must be a number"), (4, "name is required for new items"),
+    ]
+    item = smartshop.INVENTORY.get("guest_retailer", f"{prefix}-a")
+    assert (item["name"], item["price"], item["stock"]) == ("Mug", 5.0, 10)
+    assert item["tags"] == ["blue", "ceramic"]
+
+
+def test_dry_run_and_update_mode_write_nothing_new(smartshop, retailer, prefix):
+    text = f"item_id,name,price\n{prefix}-x,Lamp,20\n"
+    dry = import_csv(retailer, text, dry_run=1).get_json()
+    assert dry["created"] == 1 and dry["dry_run"]
+    update_only = import_csv(retailer, text, mode="update").get_json()
+    assert update_only["failed"] == 1 and update_only["errors"][0]["error"] == "No such item"
+    assert smartshop.INVENTORY.get("guest_retailer", f"{prefix}-x") is None
+
+
+def test_progress_streams_a_report_per_batch(smartshop, retailer, prefix, monkeypatch):
+    monkeypatch.setattr(smartshop, "BULK_BATCH_SIZE", 2)
+    rows = "".join(json.dumps({"item_id": f"{prefix}-{n}", "name": f"N{n}"}) + "\n" for n in range(5))
+    resp = retailer.post("/store/import?format=jsonl&progress=1", data=rows.encode())
+    reports = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [r["done"] for r in reports] == [False, False, True]
+    assert reports[-1]["created"] == 5 and reports[-1]["batches"] == 3
+
+
+def test_export_round_trips(retailer, prefix):
+    import_csv(retailer, f"item_id,name,price,stock\n{prefix}-e,Kettle,30,2\n")
+    resp = retailer.get("/store/export?format=csv")
+    assert resp.mimetype == "text/csv"
+    rows = {r["item_id"]: r for r in csv.DictReader(io.StringIO(resp.get_data(as_text=True)))}
+    assert rows[f"{prefix}-e"]["name"] == "Kettle"
+    again = import_csv(retailer, resp.get_data(as_text=True), mode="update").get_json()
+    assert again["failed"] == 0 and again["updated"] == 0
+    assert retailer.get("/store/export?format=xml").status_code == 400
+
+
+def test_batch_update(smartshop, retailer, prefix):
+    import_csv(retailer, f"item_id,name,price,stock\n{prefix}-u,Bowl,8,3\n")
+    resp = retailer.post("/store/items/batch_update", json={"updates": [
+        {"item_id": f"{prefix}-u", "price": 7.5, "stock": 9},
+        {"item_id": f"{prefix}-u", "stock": -1},
+        "not an object",
+    ]})
+    report = resp.get_json()
+    assert report["updated"] == 1 and report["failed"] == 2
+    item = smartshop.INVENTORY.get("guest_retailer", f"{prefix}-u")
+    assert (item["price"], item["stock"]) == (7.5, 9)
+    assert retailer.post("/store/items/batch_update", json={"updates": []}).status_code == 400
+
+
+def test_only_retailers_may_bulk_edit(shopper):
+    assert shopper.post("/store/import?format=csv", data=b"name\nx\n").status_code == 403
+    assert shopper.get("/store/export").status_code == 403
+    assert shopper.post("/store/items/batch_update", json={"updates": [{}]}).status_code == 403
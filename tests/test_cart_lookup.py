@@ -0,0 +1,54 @@
+import pytest
+
+
+@pytest.fixture
+def get_many_calls(smartshop, monkeypatch):
+    calls = []
+    real = smartshop.INVENTORY.get_many
+
+    def spy(keys):
+        calls.append(list(keys))
+        return real(keys)
+
+    monkeypatch.setattr(smartshop.INVENTORY, "get_many", spy)
+    return calls
+
+
+def in_stock(smartshop, count):
+    items = [i for i in smartshop.INVENTORY.all() if int(i.get("stock") or 0) >= 2]
+    assert len(items) >= count
+    return items[:count]
+
+
+def test_checkout_resolves_the_cart_in_one_lookup(smartshop, shopper, get_many_calls):
+    items = in_stock(smartshop, 2)
+    for item, quantity in zip(items, (1, 2)):
+        resp = shopper.post("/cart/add", json={
+            "retailer": item["retailer"], "item_id": item["item_id"], "quantity": quantity,
+        })
+        assert resp.get_json()["ok"]
+    get_many_calls.clear()
+
+    page = shopper.get("/cart/checkout")
+    assert page.status_code == 200
+    assert len(get_many_calls) == 1
+    assert sorted(get_many_calls[0]) == sorted((i["retailer"], i["item_id"]) for i in items)
+    total = float(items[0]["price"]) + 2 * float(items[1]["price"])
+    assert f"{total:.2f}" in page.get_data(as_text=True)
+
+
+def test_bulk_lookup_is_memoized_and_skips_missing_items(smartshop, get_many_calls):
+    a, b = in_stock(smartshop, 2)
+    key_a, key_b = (a["retailer"], a["item_id"]), (b["retailer"], b["item_id"])
+    with smartshop.app.test_request_context():
+        found = smartshop.get_items_bulk([key_a, ("nobody", "missing"), key_b, key_a])
+        assert [i["item_id"] for i in found] == [a["item_id"], b["item_id"], a["item_id"]]
+        assert smartshop.get_items_bulk([key_b, ("nobody", "missing")])[0]["item_id"] == b["item_id"]
+    assert len(get_many_calls) == 1
+    assert len(get_many_calls[0]) == 3  # each distinct key once
+
+
+def test_empty_cart_checkout_goes_back_to_the_cart(shopper, get_many_calls):
+    shopper.post("/cart/clear")
+    resp = shopper.get("/cart/checkout")
+    assert resp.status_code == 302 and resp.location.endswith("/cart")
@@ -0,0 +1,134 @@
+import time
+
+import pytest
+
+from carts import MemoryCartStore, SessionCartStore, cookie_cart_lines, open_cart_store
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return open_cart_store(request.param, tmp_path / "carts.db", idle_ttl=100, max_lines=3,
+                           **({"sweep_interval": 0} if request.param == "sqlite" else {}))
+
+
+def test_lines_and_running_count(store):
+    assert store.set_quantity("c1", "r", "1", 2) == 2
+    assert store.set_quantity("c1", "r", "2", 1, increment=True) == 3
+    assert store.set_quantity("c1", "r", "1", 3, increment=True) == 6
+    assert store.set_quantity("c2", "r", "1", 1) == 1
+    assert store.items("c1") == [
+        {"retailer": "r", "item_id": "1", "quantity": 5},
+        {"retailer": "r", "item_id": "2", "quantity": 1},
+    ]
+    assert store.contains("c1", "r", "2") and not store.contains("c1", "s", "2")
+    assert store.set_quantity("c1", "r", "2", 0) == 5
+    assert not store.contains("c1", "r", "2")
+    assert store.set_quantity("c1", "r", "9", 0) == 5  # removing a missing line is a no-op
+    assert store.count("c1") == 5 and store.count("unknown") == 0
+    store.clear("c1")
+    assert store.items("c1") == [] and store.count("c2") == 1
+    assert store.stats()["carts"] == 1
+
+
+def test_max_lines_is_enforced(store):
+    for item_id in "123":
+        store.set_quantity("c", "r", item_id, 1)
+    with pytest.raises(ValueError, match="at most 3"):
+        store.set_quantity("c", "r", "4", 1)
+    assert store.set_quantity("c", "r", "1", 4) == 6  # existing lines can still change
+    assert len(store.items("c")) == 3
+
+
+def test_idle_carts_expire(store, clock):
+    store.set_quantity("old", "r", "1", 2)
+    clock.now += 60
+    store.set_quantity("fresh", "r", "1", 1)
+    assert store.count("old") == 2
+    clock.now += 50  # "old" idle for 110s, "fresh" for 50s
+    assert store.count("old") == 0 and store.items("old") == []
+    assert not store.contains("old", "r", "1")
+    assert store.set_quantity("old", "r", "2", 1) == 1  # starts over
+    assert store.items("old") == [{"retailer": "r", "item_id": "2", "quantity": 1}]
+    assert store.count("fresh") == 1
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryCartStore(max_carts=2)
+    store.set_quantity("a", "r", "1", 1)
+    store.set_quantity("b", "r", "1", 1)
+    store.set_quantity("a", "r", "2", 1)
+    store.set_quantity("c", "r", "1", 1)
+    assert store.count("b") == 0 and store.count("a") == 2
+    assert store.stats()["evicted"] == 1
+
+
+def test_session_store_keeps_the_cart_in_the_cookie(smartshop):
+    with smartshop.app.test_request_context():
+        from flask import session
+
+        session["cart"] = [{"retailer": "r", "item_id": "1"}]  # the older list form
+        store = SessionCartStore(session, max_lines=2)
+        assert store.set_quantity(None, "r", "1", 2, increment=True) == 3
+        assert store.set_quantity(None, "r", "2", 1) == 4
+        assert session["cart"] == {"r/1": 3, "r/2": 1}
+        with pytest.raises(ValueError):
+            store.set_quantity(None, "r", "3", 1)
+        assert store.contains(None, "r", "2") and store.count(None) == 4
+        store.clear(None)
+        assert "cart" not in session and store.items(None) == []
+
+
+def test_cookie_cart_lines_reads_both_forms():
+    assert list(cookie_cart_lines({"shop/a/1": 2})) == [("shop/a", "1", 2)]
+    assert list(cookie_cart_lines([{"retailer": "r", "item_id": "1"}])) == [("r", "1", 1)]
+    assert list(cookie_cart_lines(None)) == []
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError, match="redis"):
+        open_cart_store("redis", tmp_path / "carts.db")
+
+
+def test_cookie_holds_only_the_cart_id(smartshop, shopper):
+    item = max(smartshop.INVENTORY.all(), key=lambda i: int(i.get("stock") or 0))
+    shopper.post("/cart/clear")
+    resp = shopper.post("/cart/add", json={"retailer": item["retailer"], "item_id": item["item_id"]})
+    assert resp.get_json() == {"ok": True, "count": 1}
+    with shopper.session_transaction() as sess:
+        assert "cart" not in sess
+        cart_id = sess["cart_id"]
+    assert smartshop.CARTS.contains(cart_id, item["retailer"], item["item_id"])
+
+    resp = shopper.post("/cart/add", json={
+        "retailer": item["retailer"], "item_id": item["item_id"], "quantity": 10 ** 6,
+    })
+    assert resp.status_code == 409
+
+
+def test_legacy_cookie_cart_is_migrated(smartshop, shopper):
+    item = max(smartshop.INVENTORY.all(), key=lambda i: int(i.get("stock") or 0))
+    with shopper.session_transaction() as sess:
+        sess.pop("cart_id", None)
+        sess["cart"] = {f"{item['retailer']}/{item['item_id']}": 2}
+    assert shopper.get("/cart").status_code == 200
+    with shopper.session_transaction() as sess:
+        assert "cart" not in sess
+        cart_id = sess["cart_id"]
+    assert smartshop.CARTS.items(cart_id) == [
+        {"retailer": item["retailer"], "item_id": item["item_id"], "quantity": 2},
+    ]
@@ -0,0 +1,53 @@
+import pytest
+
+
+def walk(client, query):
+    """Every item of every page, following ``next_cursor``."""
+    seen, cursor = [], None
+    while True:
+        resp = client.get(f"/api/items?{query}" + (f"&cursor={cursor}" if cursor else ""))
+        assert resp.status_code == 200
+        body = resp.get_json()
+        seen += body["items"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+def test_pages_cover_the_catalog_once_in_order(smartshop, shopper):
+    expected = smartshop.INVENTORY.all()
+    assert len(expected) > 3
+    items = walk(shopper, "sort=price_asc&limit=2")
+    assert sorted(i["item_id"] for i in items) == sorted(i["item_id"] for i in expected)
+    prices = [float(i.get("price") or 0) for i in items]
+    assert prices == sorted(prices)
+
+
+def test_filters(smartshop, shopper):
+    items = walk(shopper, "retailer=guest_retailer&in_stock=1&min_price=10&max_price=nan&limit=3")
+    expected = [
+        i for i in smartshop.INVENTORY.for_retailer("guest_retailer")
+        if float(i.get("price") or 0) >= 10 and int(i.get("stock") or 0) > 0
+    ]
+    assert sorted(i["item_id"] for i in items) == sorted(i["item_id"] for i in expected)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "WyJuZXdlc3QiXQ", "WyJuZXdlc3QiLDEsMl0"])
+def test_malformed_cursor_is_rejected(shopper, cursor):
+    resp = shopper.get(f"/api/items?cursor={cursor}")
+    assert resp.status_code == 400
+    assert resp.get_json()["ok"] is False
+
+
+def test_cursor_from_another_sort_is_rejected(shopper):
+    cursor = shopper.get("/api/items?sort=price_desc&limit=1").get_json()["next_cursor"]
+    resp = shopper.get(f"/api/items?sort=newest&cursor={cursor}")
+    assert resp.status_code == 400
+    assert "sort" in resp.get_json()["error"]
+
+
+def test_html_cards_for_the_lazy_grid(shopper):
+    body = shopper.get("/api/items?limit=2&html=1").get_json()
+    assert len(body["items"]) == 2
+    for item in body["items"]:
+        assert item["item_id"] in body["html"]
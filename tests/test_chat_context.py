@@ -0,0 +1,60 @@
+from chat_context import (
+    PRODUCT_BLOCK_MARKER,
+    SUMMARY_ACK,
+    SUMMARY_PREFIX,
+    ContextAssembler,
+    estimate_tokens,
+    message_text,
+    summarize_turns,
+)
+
+
+def msg(role, text):
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def conversation(turns, answer="Sure. Here is more detail than anyone needs."):
+    history = []
+    for n in range(turns):
+        history += [msg("user", f"Question {n}? Also this."), msg("model", f"{answer} ({n})")]
+    return history
+
+
+def test_short_conversations_pass_through():
+    history = conversation(2)
+    assert ContextAssembler(recent_turns=4).assemble(history) == history
+
+
+def test_older_turns_become_a_summary():
+    context = ContextAssembler(recent_turns=2).assemble(conversation(5))
+    assert context[0]["parts"][0]["text"].startswith(SUMMARY_PREFIX + "User: Question 0?")
+    assert context[1] == msg("model", SUMMARY_ACK)
+    assert context[2:] == conversation(5)[-4:]
+
+
+def test_token_budget_folds_recent_turns_too():
+    history = conversation(4, answer="x" * 400)
+    context = ContextAssembler(token_budget=300, recent_turns=4).assemble(history)
+    size = sum(estimate_tokens(message_text(m)) for m in context)
+    assert size <= 300
+    assert context[-2:] == history[-2:]  # the latest turn always stays verbatim
+
+
+def test_product_links_are_dropped_from_earlier_answers():
+    answer = msg("model", f"Try the mug.\n\n{PRODUCT_BLOCK_MARKER}\n🔗 [Mug](/product/r/1)")
+    context = ContextAssembler().assemble([msg("user", "Mugs?"), answer])
+    assert message_text(context[1]) == "Try the mug."
+
+
+def test_summary_keeps_the_newest_lines_within_its_cap():
+    summary = summarize_turns("", conversation(20), max_chars=200)
+    assert len(summary) <= 200
+    assert summary.splitlines()[-1].startswith("Assistant: Sure.")
+
+
+def test_record_prefers_the_reported_token_count():
+    context = ContextAssembler()
+    assert context.record([msg("user", "abcd" * 10)], "abcd") == 11
+    assert context.record([], "ignored", actual_tokens=50) == 50
+    assert context.stats()["prompt_tokens_max"] == 50
+    assert context.stats()["prompt_tokens_avg"] == 30.5
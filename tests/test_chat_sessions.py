@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from chat_sessions import open_session_store, trim_history
+
+
+def turn(n):
+    return [{"role": "user", "parts": [{"text": f"q{n}"}]},
+            {"role": "model", "parts": [{"text": f"a{n}"}]}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def open_store(request, tmp_path):
+    def open_store(**limits):
+        return open_session_store(request.param, tmp_path / "sessions.db", **limits)
+
+    return open_store
+
+
+def test_least_recently_used_session_is_evicted(open_store, clock):
+    store = open_store(max_sessions=2)
+    for name in ("a", "b"):
+        store.create(name, turn(0), "2026-01-01T00:00:00Z")
+        clock[0] += 1
+    assert store.get("a") is not None  # "b" is now the least recently used
+    clock[0] += 1
+    store.create("c", [], None)
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["sessions"] == 2
+
+
+def test_idle_sessions_expire(open_store, clock):
+    store = open_store(idle_ttl=60)
+    store.create("a", turn(0), None)
+    clock[0] += 59
+    assert store.get("a")["history"] == turn(0)  # and is touched
+    clock[0] += 59
+    assert store.append("a", turn(1))
+    clock[0] += 60
+    assert store.get("a") is None
+    assert not store.append("a", turn(2))
+
+
+def test_history_is_capped_and_trimmed_turns_are_folded(open_store):
+    folded = []
+
+    def fold(summary, dropped):
+        folded.append(dropped)
+        return summary + "".join(m["parts"][0]["text"] for m in dropped)
+
+    store = open_store(max_messages=3, fold=fold)
+    store.create("a", turn(0), None)
+    store.append("a", turn(1))
+    session = store.get("a")
+    # Three messages would start on a model turn, so only the last full turn is kept
+    assert session["history"] == turn(1)
+    assert session["summary"] == "q0a0"
+    assert folded == [turn(0)]
+
+
+def test_trim_history_never_splits_a_turn():
+    history = turn(0) + turn(1) + turn(2)
+    assert trim_history(history, 10) == (history, [])
+    assert trim_history(history, 4) == (turn(1) + turn(2), turn(0))
+    assert trim_history(history, 0) == (history, [])
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError, match="redis"):
+        open_session_store("redis", tmp_path / "x.db")
@@ -0,0 +1,71 @@
+import json
+import random
+
+import pytest
+import requests
+
+from benchmarks.fake_gemini import DEFAULT_REPLY, FakeGemini, parse_latency
+from gemini_rest import GeminiError, RestChatModel
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(**options):
+        fake = FakeGemini(**options)
+        server = fake.serve(port=0)
+        servers.append(server)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+        return fake, RestChatModel("gemini-test", base_url, "key", requests, timeout=5)
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_chat_and_stream_match_gemini_shapes(serve):
+    fake, model = serve(chunks=3)
+    chat = model.start_chat(history=[{"role": "user", "parts": [{"text": "hi"}]}])
+    reply = chat.send_message("Any mugs?")
+    assert reply.text == DEFAULT_REPLY
+    assert reply.usage_metadata.prompt_token_count == len("hi\nAny mugs?") // 4
+    pieces = [chunk.text for chunk in chat.send_message("Any mugs?", stream=True)]
+    assert len(pieces) == 3 and "".join(pieces) == DEFAULT_REPLY
+    assert fake.stats == {"requests": 2, "ok": 2, "errors": 0, "timeouts": 0, "streams": 1}
+
+
+def test_recommendation_prompts_get_recommendation_json(serve):
+    _, model = serve()
+    inventory = [{"item_id": str(n), "name": f"Item {n}"} for n in range(5)]
+    prompt = f"INVENTORY:\n{json.dumps(inventory)}\nUSER_PREFERENCE: cheap"
+    body = json.loads(model.start_chat().send_message(prompt).text)
+    assert [r["item_id"] for r in body["recommendations"]] == ["0", "1", "2"]
+
+
+def test_injected_errors_and_timeouts(serve):
+    _, model = serve(error_rate=1.0, error_status=503)
+    with pytest.raises(GeminiError, match="503"):
+        model.start_chat().send_message("hello")
+    fake, model = serve(timeout_rate=1.0, hang=2)
+    with pytest.raises(requests.Timeout):
+        model.start_chat().send_message("hello", request_options={"timeout": 0.2})
+    assert fake.stats["timeouts"] == 1
+
+
+def test_unknown_paths_and_bad_json(serve):
+    fake, model = serve()
+    base = model.base_url
+    assert requests.post(f"{base}/models/x:countTokens", json={}).status_code == 404
+    assert requests.post(f"{base}/models/x:generateContent", data=b"{").status_code == 400
+    assert requests.get(base.replace("/v1beta", "/stats")).json()["requests"] == 0
+
+
+def test_latency_specs_are_seeded_and_validated():
+    assert parse_latency("250")(random.Random(0)) == 0.25
+    normal = parse_latency("normal:300,50")
+    assert normal(random.Random(1)) == normal(random.Random(1))
+    assert 0.1 <= parse_latency("uniform:100,200")(random.Random(2)) <= 0.2
+    with pytest.raises(ValueError, match="Unknown latency"):
+        parse_latency("pareto:1,2")
@@ -0,0 +1,90 @@
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+import file_locks
+from file_locks import atomic_write, copy_up, locked
+from storage import update_json
+
+
+def bump(path, times):
+    for _ in range(times):
+        update_json(path, {"n": 0}, lambda data: data.update(n=data["n"] + 1))
+
+
+def test_threads_never_lose_an_update(tmp_path):
+    path = tmp_path / "count.json"
+    threads = [threading.Thread(target=bump, args=(path, 50)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert json.loads(path.read_text()) == {"n": 200}
+
+
+def test_processes_never_lose_an_update(tmp_path):
+    path = tmp_path / "count.json"
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=bump, args=(path, 25)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    bump(path, 25)
+    for w in workers:
+        w.join(timeout=60)
+        assert w.exitcode == 0
+    assert json.loads(path.read_text()) == {"n": 100}
+
+
+def test_different_files_do_not_share_one_lock(tmp_path):
+    held = threading.Event()
+    release = threading.Event()
+    a = tmp_path / "a.json"
+    b = next(p for p in (tmp_path / f"b{n}.json" for n in range(64))
+             if file_locks._stripe(p) is not file_locks._stripe(a))
+
+    def hold_a():
+        with locked(a):
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold_a)
+    thread.start()
+    held.wait(5)
+    try:
+        atomic_write(b, "{}")  # would block on a single global lock
+        with locked(b):
+            pass
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_failed_save_leaves_the_old_file_and_no_temp(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    atomic_write(path, '{"v": 1}')
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        atomic_write(path, '{"v": 2}')
+    assert path.read_text() == '{"v": 1}'
+    assert [p.name for p in tmp_path.iterdir() if not p.name.endswith(".lock")] == ["data.json"]
+
+
+def test_copy_up_seeds_once(tmp_path):
+    seed = tmp_path / "seed.json"
+    seed.write_text("original")
+    path = tmp_path / "data" / "seed.json"
+    path.parent.mkdir()
+    assert copy_up(path, seed) == path
+    assert path.read_text() == "original"
+    path.write_text("edited")
+    copy_up(path, seed)
+    assert path.read_text() == "edited"
+    assert copy_up(tmp_path / "data" / "other.json", tmp_path / "missing.json").name == "other.json"
+    assert not (tmp_path / "data" / "other.json").exists()
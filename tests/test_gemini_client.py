@@ -0,0 +1,107 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from gemini_client import CircuitBreaker, CircuitOpenError, GeminiHttp
+
+
+class ScriptedSession:
+    """Answers each post with the next scripted status code or exception."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.posts = []
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def post(self, url, json=None, timeout=None, stream=False):
+        self.posts.append(timeout)
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(status_code=outcome, close=lambda: None)
+
+
+def client(*script, breaker=None, **options):
+    session = ScriptedSession(script)
+    http = SimpleNamespace(
+        Session=lambda: session,
+        adapters=SimpleNamespace(HTTPAdapter=lambda **kw: None),
+        ConnectionError=requests.ConnectionError,
+        Timeout=requests.Timeout,
+    )
+    options.setdefault("backoff", 0.001)
+    return GeminiHttp(http, breaker=breaker or CircuitBreaker(threshold=2), **options), session
+
+
+def test_transient_failures_are_retried():
+    gemini, session = client(503, requests.ConnectionError("reset"), 200, retries=2)
+    assert gemini.post("http://gemini/x", timeout=5).status_code == 200
+    assert gemini.retried == 2 and len(session.posts) == 3
+    assert gemini.breaker.state == "closed"
+    connect, read = session.posts[0]
+    assert connect == 3.0 and 4 < read <= 5
+
+
+def test_client_errors_are_not_retried():
+    gemini, session = client(400)
+    assert gemini.post("http://gemini/x").status_code == 400
+    assert len(session.posts) == 1
+
+
+def test_retries_stop_at_the_limit_and_the_deadline():
+    gemini, _ = client(*[requests.Timeout("slow")] * 3, retries=2)
+    with pytest.raises(requests.Timeout):
+        gemini.post("http://gemini/x")
+    assert gemini.retried == 2
+
+    gemini, session = client(503, 503, retries=5, backoff=10)
+    assert gemini.post("http://gemini/x", timeout=1).status_code == 503
+    assert len(session.posts) == 1  # the backoff would overrun the budget
+
+
+def test_breaker_opens_then_lets_one_probe_through():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+    gemini, session = client(500, 500, 200, breaker=breaker, retries=0)
+    gemini.post("http://gemini/x")
+    gemini.post("http://gemini/x")
+    assert breaker.state == "open" and breaker.opened == 1
+    with pytest.raises(CircuitOpenError):
+        gemini.post("http://gemini/x")
+    assert len(session.posts) == 2 and breaker.rejected == 1
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()  # nobody else meanwhile
+    breaker.success()
+    assert breaker.state == "closed"
+
+
+def test_a_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+    with pytest.raises(ValueError), breaker.guard():
+        raise ValueError("upstream")
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    with pytest.raises(ValueError), breaker.guard():
+        raise ValueError("still down")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError), breaker.guard():
+        pass
+
+
+def test_open_breaker_answers_the_chat_without_calling_gemini(smartshop, shopper, monkeypatch):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+    breaker.failure()
+    monkeypatch.setattr(smartshop, "GEMINI_BREAKER", breaker)
+    monkeypatch.setattr(smartshop, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(smartshop, "GEMINI_TRANSPORT", "sdk")
+    monkeypatch.setattr(smartshop, "chat_model", lambda: SimpleNamespace(
+        start_chat=lambda history: SimpleNamespace(
+            send_message=lambda *a, **kw: pytest.fail("called Gemini"))))
+    resp = shopper.post("/api/assistant_chat", json={"message": f"breaker {time.time()}"})
+    assert resp.get_json()["response"].startswith(smartshop.AI_ERROR_MESSAGE)
+    assert breaker.rejected == 1
@@ -0,0 +1,74 @@
+import pytest
+
+from inventory import InventoryIndex, ItemTree
+
+
+@pytest.fixture
+def frozen_clock(smartshop, monkeypatch):
+    """Every write lands in the same second, as quick successive edits do."""
+    monkeypatch.setattr(smartshop, "now_iso", lambda: "2026-01-01T00:00:00Z")
+
+
+def upload(retailer, name, **fields):
+    form = {"name": name, "price": "12.5", "stock": "3", "image_url": "https://img.example/a.jpg"}
+    resp = retailer.post("/store/upload", data={**form, **fields})
+    assert resp.status_code == 200
+    return resp.get_json()["item"]
+
+
+def test_unchanged_catalog_revalidates_with_304(shopper):
+    first = shopper.get("/api/items")
+    assert first.status_code == 200 and first.headers["ETag"]
+    again = shopper.get("/api/items", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_same_second_rename_changes_the_catalog_etag(frozen_clock, retailer, shopper):
+    item = upload(retailer, "Canvas tote")
+    query = "/api/items?retailer=guest_retailer&limit=100"
+    before = shopper.get(query)
+    page_before = shopper.get("/app")
+    assert item["item_id"] in {i["item_id"] for i in before.get_json()["items"]}
+
+    resp = retailer.post(f"/update_product/{item['item_id']}", data={"name": "Canvas tote XL"})
+    assert resp.get_json()["ok"]
+
+    after = shopper.get(query, headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    names = {i["item_id"]: i["name"] for i in after.get_json()["items"]}
+    assert names[item["item_id"]] == "Canvas tote XL"
+    page = shopper.get("/app", headers={"If-None-Match": page_before.headers["ETag"]})
+    assert page.status_code == 200
+
+
+def test_catalog_version_covers_every_field(tmp_path):
+    index = InventoryIndex(ItemTree(tmp_path))
+    item = {"retailer": "r", "item_id": "1", "name": "Mug", "price": 4.0, "stock": 2,
+            "updated_at": "2026-01-01T00:00:00Z"}
+    index.save(dict(item))
+    unedited = index.catalog_version()
+    index.save({**item, "description_full": "Blue"})
+    assert index.catalog_version() != unedited
+    index.save(dict(item))
+    assert index.catalog_version() == unedited
+    index.delete("r", "1")
+    assert index.catalog_version() == f"{0:016x}"
+
+
+def test_product_page_validators_follow_the_viewer(smartshop, client, shopper):
+    item = max(smartshop.INVENTORY.all(), key=lambda i: int(i.get("stock") or 0))
+    url = f"/product/{item['retailer']}/{item['item_id']}"
+    anonymous = client.get(url)
+    assert anonymous.status_code == 200
+    assert anonymous.cache_control.public and anonymous.last_modified is not None
+    etag = anonymous.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    shopper.post("/cart/clear")
+    before = shopper.get(url)
+    assert before.cache_control.private and before.last_modified is None
+    shopper.post("/cart/add", json={"retailer": item["retailer"], "item_id": item["item_id"]})
+    after = shopper.get(url, headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200  # the page now says the item is in the cart
+    assert client.get("/product/nobody/missing").status_code == 404
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from inventory import InventoryIndex, ItemTree
+
+
+def item(item_id, retailer="r", **fields):
+    return {"retailer": retailer, "item_id": item_id, "name": f"Item {item_id}",
+            "category": "misc", "price": 1.0, "stock": 1, **fields}
+
+
+def write_on_disk(root, data):
+    """Another worker's write: the file and the retailer directory's mtime."""
+    folder = root / data["retailer"] / data["item_id"]
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / "details.json").write_text(json.dumps(data))
+    ItemTree(root).touch(data["retailer"])
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "uploads"
+    for n in range(3):
+        write_on_disk(root, item(str(n), category="mugs" if n else "bags"))
+    return root
+
+
+def test_lookups_come_from_the_index(tree, monkeypatch):
+    index = InventoryIndex(ItemTree(tree), check_interval=60)
+    index.load()
+    monkeypatch.setattr(ItemTree, "load_retailer", lambda *a: pytest.fail("rescanned"))
+    assert len(index) == 3
+    assert index.get("r", "1")["name"] == "Item 1"
+    assert index.find("2")["retailer"] == "r"
+    assert {i["item_id"] for i in index.in_category("mugs")} == {"1", "2"}
+    assert index.get("r", "nope") is None
+    copy = index.get("r", "1")
+    copy["name"] = "scribbled"
+    assert index.get("r", "1")["name"] == "Item 1"
+
+
+def test_other_workers_writes_are_picked_up_after_the_interval(tree):
+    index = InventoryIndex(ItemTree(tree), check_interval=60)
+    index.load()
+    write_on_disk(tree, item("1", name="Renamed", category="bags"))
+    write_on_disk(tree, item("9", retailer="s"))
+    assert index.get("r", "1")["name"] == "Item 1"  # still within the interval
+
+    index.refresh(force=True)
+    assert index.get("r", "1")["name"] == "Renamed"
+    assert {i["item_id"] for i in index.in_category("mugs")} == {"2"}
+    assert index.get("s", "9") is not None
+
+
+def test_only_changed_files_are_parsed_again(tree, monkeypatch):
+    source = ItemTree(tree)
+    index = InventoryIndex(source, check_interval=0)
+    index.load()
+    parsed = []
+    real_load = json.load
+    monkeypatch.setattr(json, "load", lambda fh, **kw: parsed.append(fh.name) or real_load(fh, **kw))
+    write_on_disk(tree, item("0", price=2.0))
+    assert index.get("r", "0")["price"] == 2.0
+    assert [p.split("/")[-2] for p in parsed] == ["0"]
+
+
+def test_removed_and_unreadable_items_drop_out(tree):
+    index = InventoryIndex(ItemTree(tree), check_interval=0)
+    index.load()
+    (tree / "r" / "1" / "details.json").write_text("{not json")
+    (tree / "r" / "2" / "details.json").unlink()
+    ItemTree(tree).touch("r")
+    assert [i["item_id"] for i in index.all()] == ["0"]
+    assert index.find("2") is None
+    assert index.in_category("mugs") == []
+
+
+def test_seed_overlay_and_deletion_marker(tree, tmp_path):
+    root = tmp_path / "writable"
+    index = InventoryIndex(ItemTree(root, seed=tree), check_interval=0)
+    assert index.get("r", "0")["name"] == "Item 0"
+    index.save(item("0", name="Edited"))
+    assert index.delete("r", "1")
+    assert not index.delete("r", "missing")
+
+    fresh = InventoryIndex(ItemTree(root, seed=tree))
+    assert fresh.get("r", "0")["name"] == "Edited"
+    assert fresh.get("r", "1") is None
+    assert fresh.get("r", "2")["name"] == "Item 2"
+    assert (tree / "r" / "1" / "details.json").exists()  # the seed is never written
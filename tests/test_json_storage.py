@@ -0,0 +1,104 @@
+import json
+import threading
+
+import file_locks
+from storage import JsonStorage
+
+STATIC_FAQ = [{"q": "How do I register?", "a": "Use Register."}]
+
+
+def legacy_data(path, orders=3, questions=4):
+    path.mkdir()
+    (path / "purchase.json").write_text(json.dumps({
+        "requests": [],
+        "orders": [{"order_id": f"o{i}", "status": "pending"} for i in range(orders)],
+    }))
+    (path / "FAQ.json").write_text(json.dumps({
+        "static_faq": STATIC_FAQ,
+        "dynamic_log": [{"id": f"q{i}", "question": f"q{i}?"} for i in range(questions)],
+    }))
+    (path / "count.json").write_text(json.dumps({"recommendation_ratings": {}}))
+    return path
+
+
+def snapshot(path):
+    return {p.relative_to(path): p.read_bytes() for p in sorted(path.rglob("*")) if p.is_file()}
+
+
+def test_startup_leaves_existing_files_alone(tmp_path):
+    data = legacy_data(tmp_path / "data")
+    before = snapshot(data)
+    storage = JsonStorage(data, tmp_path / "uploads")
+    storage.init_defaults(STATIC_FAQ)
+    assert snapshot(data) == before
+    assert storage.get_order("o1")["status"] == "pending"
+    assert sorted(o["order_id"] for o in storage.iter_orders()) == ["o0", "o1", "o2"]
+    assert [e["id"] for e in storage.iter_faq_log()] == ["q0", "q1", "q2", "q3"]
+
+
+def test_startup_on_a_read_only_seed_writes_nothing(tmp_path):
+    seed = legacy_data(tmp_path / "seed")
+    data = tmp_path / "data"
+    data.mkdir()
+    storage = JsonStorage(data, tmp_path / "uploads", data_seed=seed)
+    storage.init_defaults(STATIC_FAQ)
+    assert snapshot(data) == {}
+    assert storage.get_order("o2") is not None
+
+
+def test_migrate_legacy_moves_each_entry_once(tmp_path):
+    data = legacy_data(tmp_path / "data")
+    storage = JsonStorage(data, tmp_path / "uploads")
+    storage.add_order({"order_id": "o1", "status": "paid"})  # newer than purchase.json
+
+    assert storage.migrate_legacy() == {"orders": 2, "faq_log": 4}
+    assert storage.migrate_legacy() == {"orders": 0, "faq_log": 0}
+    assert json.loads((data / "purchase.json").read_text())["orders"] == []
+    assert "dynamic_log" not in json.loads((data / "FAQ.json").read_text())
+    assert storage.get_order("o1")["status"] == "paid"
+    assert sorted(o["order_id"] for o in storage.iter_orders()) == ["o0", "o1", "o2"]
+    assert [e["id"] for e in storage.iter_faq_log()] == ["q0", "q1", "q2", "q3"]
+
+
+class OneStripe:
+    """Every path on one stripe, failing instead of deadlocking when a thread nests locks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owner = None
+
+    def __enter__(self):
+        assert self._owner != threading.get_ident(), "nested file locks"
+        self._lock.acquire()
+        self._owner = threading.get_ident()
+
+    def __exit__(self, *exc):
+        self._owner = None
+        self._lock.release()
+
+
+def test_concurrent_migrations_do_not_duplicate(tmp_path, monkeypatch, workers=4):
+    stripe = OneStripe()
+    monkeypatch.setattr(file_locks, "_stripe", lambda path: stripe)
+    data = legacy_data(tmp_path / "data", orders=50, questions=50)
+    stores = [JsonStorage(data, tmp_path / "uploads") for _ in range(workers)]
+    results, errors = [], []
+
+    def migrate(storage):
+        try:
+            results.append(storage.migrate_legacy())
+        except AssertionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=migrate, args=(s,)) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert sum(r["orders"] for r in results) == 50
+    assert sum(r["faq_log"] for r in results) == 50
+    fresh = JsonStorage(data, tmp_path / "uploads")
+    lines = (data / "orders.jsonl").read_text().splitlines()
+    assert len(lines) == len({json.loads(line)["order_id"] for line in lines}) == 50
+    assert len(list(fresh.iter_faq_log())) == 50
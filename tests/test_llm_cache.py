@@ -0,0 +1,61 @@
+import time
+
+from llm_cache import MemoryLRU, ResponseCache, SqliteTier, cache_key
+
+
+class Clock:
+    def __init__(self, monkeypatch):
+        self.now = 1_000_000.0
+        monkeypatch.setattr(time, "time", lambda: self.now)
+
+
+def test_prompts_differing_in_case_and_punctuation_share_a_key():
+    assert cache_key("m", "What is  the PRICE?") == cache_key("m", "what is the price")
+    assert cache_key("m", "price") != cache_key("other-model", "price")
+
+
+def test_entries_expire_per_use_case(monkeypatch):
+    clock = Clock(monkeypatch)
+    cache = ResponseCache({"faq": 60, "chat": 0})
+    cache.set("faq", "m", "Shipping?", "2 days")
+    cache.set("chat", "m", "Hello", "Hi")  # a TTL of 0 disables caching
+    assert cache.get("faq", "m", "shipping") == "2 days"
+    assert cache.get("chat", "m", "Hello") is None
+    clock.now += 61
+    assert cache.get("faq", "m", "shipping") is None
+    assert cache.stats()["use_cases"]["faq"] == {
+        "hits": 1, "misses": 1, "stores": 1, "hit_ratio": 0.5,
+    }
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = MemoryLRU(max_entries=2)
+    far = time.time() + 60
+    lru.set("a", 1, far)
+    lru.set("b", 2, far)
+    assert lru.get("a") == 1
+    lru.set("c", 3, far)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c"), len(lru)) == (1, 3, 2)
+
+
+def test_shared_tier_serves_other_workers(tmp_path):
+    path = tmp_path / "llm_cache.db"
+    ResponseCache({"faq": 60}, shared=SqliteTier(path)).set("faq", "m", "Returns?", "30 days")
+    other = ResponseCache({"faq": 60}, shared=SqliteTier(path))
+    assert other.get("faq", "m", "returns") == "30 days"
+    assert len(other.memory) == 1  # promoted into the worker's own LRU
+
+
+def test_a_broken_shared_tier_only_costs_a_miss(tmp_path):
+    class Broken:
+        def get(self, key):
+            raise OSError("disk gone")
+
+        def set(self, *args):
+            raise OSError("disk gone")
+
+    cache = ResponseCache({"faq": 60}, shared=Broken())
+    assert cache.get("faq", "m", "q") is None
+    cache.set("faq", "m", "q", "a")
+    assert cache.get("faq", "m", "q") == "a"
@@ -0,0 +1,70 @@
+import time
+
+from metrics import Metrics
+from profiler import SlowRequestProfiler
+
+
+def test_metrics_are_off_by_default(client):
+    assert client.get("/metrics").status_code == 404
+
+
+def test_enabled_metrics_report_requests(smartshop, client, monkeypatch):
+    monkeypatch.setattr(smartshop, "METRICS_ENABLED", True)
+    client.get("/")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    assert "smartshop_http_request_seconds_count" in resp.get_data(as_text=True)
+
+
+def test_metrics_token(smartshop, client, monkeypatch):
+    monkeypatch.setattr(smartshop, "METRICS_ENABLED", True)
+    monkeypatch.setattr(smartshop, "METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3crét"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_histograms_render_cumulative_buckets():
+    metrics = Metrics()
+    metrics.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        metrics.observe("latency_seconds", value, route='/a"b')
+    text = metrics.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/a\\"b",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a\\"b",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/a\\"b"} 4' in text
+
+
+def test_a_failing_collector_does_not_break_the_scrape():
+    metrics = Metrics()
+    metrics.counter("hits_total", "Hits.")
+    metrics.inc("hits_total", kind="x")
+
+    def broken():
+        raise RuntimeError("boom")
+
+    metrics.add_collector(broken)
+    metrics.add_collector(lambda: [("sessions", "gauge", "Sessions.", [({}, 3)])])
+    text = metrics.render()
+    assert 'hits_total{kind="x"} 1' in text
+    assert "sessions 3" in text
+
+
+def test_profiler_keeps_stacks_of_slow_requests_only(tmp_path):
+    profiler = SlowRequestProfiler(tmp_path, threshold=0.05, interval=0.002)
+    assert profiler.stop(profiler.start(), "GET /fast") is None
+
+    token = profiler.start()
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    path = profiler.stop(token, "GET /slow/<id>")
+    assert path is not None and path.endswith("GET_slow_id.folded")
+    lines = open(path).read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("test_profiler_keeps_stacks_of_slow_requests_only" in line for line in lines)
+    assert profiler.dumps == 1
@@ -0,0 +1,84 @@
+import json
+
+from order_log import OrderLog
+
+
+def order(order_id, **fields):
+    return {"order_id": order_id, "status": "pending", **fields}
+
+
+def test_newest_line_wins(tmp_path):
+    log = OrderLog(tmp_path / "orders.jsonl")
+    log.append(order("a"))
+    log.append(order("b"))
+    log.append(order("a", status="paid"))
+    assert log.get("a")["status"] == "paid"
+    assert log.get("missing") is None
+    assert [o["order_id"] for o in log.all()] == ["b", "a"]
+    assert log.stats()["dead"] == 1
+
+
+def test_lines_from_another_writer_and_partial_appends(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    reader, writer = OrderLog(path), OrderLog(path)
+    writer.append(order("a"))
+    assert reader.get("a") is not None
+    line = json.dumps(order("b")) + "\n"
+    with open(path, "a") as f:
+        f.write(line[:10])  # another worker mid-append
+        f.flush()
+        assert reader.get("b") is None
+        f.write(line[10:])
+    assert reader.get("b") == order("b")
+    writer.append(order("c"))
+    assert reader.get("c") is not None
+    assert reader.stats()["dead"] == 0
+
+
+def test_compaction_elsewhere_between_index_and_read(tmp_path, monkeypatch):
+    path = tmp_path / "orders.jsonl"
+    reader, compactor = OrderLog(path), OrderLog(path)
+    for i in range(20):
+        compactor.append(order(f"o{i}", note="x" * i))
+        compactor.append(order(f"o{i}", status="paid", note="x" * i))
+    catch_up = reader._catch_up
+
+    def compact_right_after_indexing():
+        catch_up()
+        compactor.compact()  # moves every line the reader just indexed
+
+    monkeypatch.setattr(reader, "_catch_up", compact_right_after_indexing)
+    assert reader.get("o19") == order("o19", status="paid", note="x" * 19)
+    assert [o["order_id"] for o in reader.all()] == [f"o{i}" for i in range(20)]
+    monkeypatch.undo()
+    assert reader.get("o7")["status"] == "paid"
+    assert reader.stats() == {"orders": 20, "dead": 0, "bytes": path.stat().st_size}
+
+
+def test_automatic_compaction(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    log = OrderLog(path, compact_min=5, compact_ratio=1.0)
+    for i in range(6):
+        log.append(order("a", n=i))
+    assert log.stats()["dead"] == 0
+    assert len(path.read_text().splitlines()) == 1
+    assert log.get("a")["n"] == 5
+
+
+def test_append_missing_skips_known_ids(tmp_path):
+    log = OrderLog(tmp_path / "orders.jsonl")
+    log.append(order("a", status="paid"))
+    assert log.append_missing([order("a"), order("b")]) == 1
+    assert log.append_missing([order("b")]) == 0
+    assert log.get("a")["status"] == "paid"
+
+
+def test_orders_are_found_by_id_before_and_after_compaction(smartshop, shopper, place_order):
+    order_id = place_order()
+    assert shopper.post(f"/order/{order_id}/verify").status_code == 200
+
+    result = smartshop.app.test_cli_runner().invoke(args=["compact-orders"])
+    assert "orders kept" in result.output
+    assert shopper.post(f"/order/{order_id}/verify").status_code == 200
+    assert shopper.get(f"/order/{order_id}/qr").get_json()["ok"]
+    assert shopper.post("/order/no-such-order/verify").status_code == 404
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from qr_cache import QrCache
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+def test_each_payload_is_rendered_once_across_workers(tmp_path):
+    first = QrCache(tmp_path, memory_size=1)
+    png, etag = first.get("order-1", "upi://pay?pa=shop@upi&am=10.00")
+    assert png.startswith(PNG)
+    assert first.get("order-1", "upi://pay?pa=shop@upi&am=10.00") == (png, etag)
+    other_worker = QrCache(tmp_path)
+    assert other_worker.get("order-1", "upi://pay?pa=shop@upi&am=10.00") == (png, etag)
+    assert first.renders == 1 and other_worker.renders == 0
+
+
+def test_a_changed_payload_gets_a_new_image(tmp_path):
+    cache = QrCache(tmp_path)
+    _, old = cache.get("order-1", "upi://pay?pa=shop@upi&am=10.00")
+    _, new = cache.get("order-1", "upi://pay?pa=shop@upi&am=12.00")
+    assert old != new and cache.renders == 2
+
+
+def test_order_ids_cannot_escape_the_directory(tmp_path):
+    with pytest.raises(ValueError):
+        QrCache(tmp_path / "qr").get("../../etc/passwd", "upi://pay")
+    assert not (tmp_path / "qr").exists()
+
+
+def test_warm_renders_in_the_background(tmp_path):
+    cache = QrCache(tmp_path)
+    cache.warm("order-2", "upi://pay?am=1")
+    deadline = time.monotonic() + 10
+    while not list(tmp_path.glob("order-2.*.png")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert list(tmp_path.glob("order-2.*.png"))
+
+
+def test_qr_image_revalidates(shopper, place_order):
+    order_id = place_order()
+    image_url = shopper.get(f"/order/{order_id}/qr").get_json()["image_url"]
+    image = shopper.get(image_url)
+    assert image.mimetype == "image/png" and image.data.startswith(PNG)
+    again = shopper.get(image_url, headers={"If-None-Match": image.headers["ETag"]})
+    assert again.status_code == 304
+    assert shopper.get("/order/unknown/qr.png").status_code == 404
@@ -0,0 +1,78 @@
+import pytest
+
+from rating_counter import RatingCounter
+from storage import JsonStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    (tmp_path / "data").mkdir()
+    storage = JsonStorage(tmp_path / "data", tmp_path / "uploads")
+    storage.init_defaults([])
+    return storage
+
+
+def counting(storage, monkeypatch):
+    writes = []
+    real = storage.add_rating
+    monkeypatch.setattr(storage, "add_rating", lambda r, a=1: writes.append((r, a)) or real(r, a))
+    return writes
+
+
+def test_clicks_are_written_in_batches(storage, monkeypatch):
+    writes = counting(storage, monkeypatch)
+    counter = RatingCounter(storage, flush_interval=3600, flush_every=5)
+    for _ in range(4):
+        totals = counter.incr("good")
+    assert totals["good"] == 4
+    assert writes == []
+    counter.incr("bad")  # the fifth click flushes
+    assert sorted(writes) == [("bad", 1), ("good", 4)]
+    assert storage.get_ratings()["good"] == 4
+    assert counter.totals() == {"excellent": 0, "good": 4, "bad": 1}
+
+
+def test_workers_add_up(storage):
+    workers = [RatingCounter(storage, flush_interval=0, flush_every=1000) for _ in range(2)]
+    for worker in workers:
+        worker.incr("excellent", 3)
+        worker.flush()
+    assert storage.get_ratings()["excellent"] == 6
+    assert workers[0].totals()["excellent"] == 6
+
+
+def test_a_failed_flush_loses_no_clicks(storage, monkeypatch):
+    counter = RatingCounter(storage, flush_interval=3600, flush_every=1000)
+    counter.incr("good", 2)
+    counter.incr("bad")
+
+    def full_disk(rating, amount=1):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(storage, "add_rating", full_disk)
+    counter.flush()
+    assert counter.totals()["good"] == 2
+    monkeypatch.undo()
+    counter.flush()
+    assert storage.get_ratings() == {"excellent": 0, "good": 2, "bad": 1}
+    assert counter.totals() == {"excellent": 0, "good": 2, "bad": 1}
+
+
+def test_a_flush_failing_halfway_counts_nothing_twice(storage, monkeypatch):
+    counter = RatingCounter(storage, flush_interval=3600, flush_every=1000)
+    counter.incr("good", 2)
+    counter.incr("bad", 5)
+    real = storage.add_rating
+    calls = []
+
+    def fail_second(rating, amount=1):
+        calls.append(rating)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        return real(rating, amount)
+
+    monkeypatch.setattr(storage, "add_rating", fail_second)
+    counter.flush()
+    monkeypatch.undo()
+    counter.flush()
+    assert storage.get_ratings() == {"excellent": 0, "good": 2, "bad": 5}
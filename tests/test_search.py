@@ -0,0 +1,53 @@
+from search import SearchIndex, tokenize
+
+
+def doc(name, category="", tags=(), description=""):
+    return {"name": name, "category": category, "tags": list(tags), "description_full": description}
+
+
+def index_of(**docs):
+    index = SearchIndex()
+    for key, item in docs.items():
+        index.add(key, item)
+    return index
+
+
+def names(hits):
+    return [item["name"] for _, item in hits]
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("I want a Blue-Mug, please!") == ["blue", "mug"]
+
+
+def test_name_matches_outrank_description_matches():
+    index = index_of(
+        a=doc("Steel bottle", description="Keeps tea hot"),
+        b=doc("Tea kettle", category="kitchen"),
+        c=doc("Notebook", description="Ruled pages"),
+    )
+    assert names(index.search("tea")) == ["Tea kettle", "Steel bottle"]
+    assert index.search("bicycle") == []
+    assert index.search("the and") == []
+
+
+def test_prefixes_match_longer_words_at_lower_weight():
+    index = index_of(a=doc("Laptops"), b=doc("Lapt stand"))
+    assert names(index.search("lapt")) == ["Lapt stand", "Laptops"]
+    assert names(index.search("laptop")) == ["Laptops"]
+    assert index.search("la") == []  # too short to expand
+
+
+def test_inventory_changes_keep_the_index_current():
+    index = index_of(a=doc("Red mug"), b=doc("Blue mug"))
+    index.on_inventory_change("a", doc("Red plate"))
+    index.on_inventory_change("b", None)
+    assert len(index) == 1
+    assert index.search("mug") == []
+    assert names(index.search("plate")) == ["Red plate"]
+
+
+def test_search_within_keys():
+    index = index_of(a=doc("Red mug"), b=doc("Blue mug"))
+    assert names(index.search("mug", keys={"b"})) == ["Blue mug"]
+    assert names(index.search("mug", limit=1, keys={"a", "b"})) in (["Red mug"], ["Blue mug"])
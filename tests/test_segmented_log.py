@@ -0,0 +1,66 @@
+import json
+
+from segmented_log import SegmentedLog
+
+
+def entry(n):
+    return {"id": f"q{n}", "question": "x" * 40}
+
+
+def ids(log):
+    return [e["id"] for e in log]
+
+
+def test_appends_are_written_in_order_by_the_writer_thread(tmp_path):
+    log = SegmentedLog(tmp_path / "faq_log", prefix="faq")
+    for n in range(50):
+        log.append(entry(n))
+    log.flush()
+    assert ids(log) == [f"q{n}" for n in range(50)]
+    assert [p.name for p in log.segments()] == ["faq-000001.jsonl"]
+
+
+def test_segments_rotate_and_old_ones_are_dropped(tmp_path):
+    line = len(json.dumps(entry(0))) + 1
+    log = SegmentedLog(tmp_path, prefix="faq", max_bytes=3 * line, max_segments=2)
+    log.write([entry(n) for n in range(7)])
+    log.write([entry(7)])
+    names = [p.name for p in log.segments()]
+    assert names == ["faq-000002.jsonl", "faq-000003.jsonl"]
+    assert all(p.stat().st_size <= 3 * line for p in log.segments())
+    assert ids(log) == ["q3", "q4", "q5", "q6", "q7"]
+
+
+def test_a_full_queue_writes_synchronously(tmp_path, monkeypatch):
+    log = SegmentedLog(tmp_path, queue_size=1)
+    monkeypatch.setattr(log, "_ensure_writer", lambda: None)  # nothing drains the queue
+    log.append(entry(0))
+    log.append(entry(1))
+    assert ids(log) == ["q1"]
+
+
+def test_the_writer_survives_a_failed_batch(tmp_path, monkeypatch):
+    log = SegmentedLog(tmp_path)
+    real, failures = log.write, []
+
+    def flaky(entries):
+        if not failures:
+            failures.append(entries)
+            raise OSError("disk full")
+        real(entries)
+
+    monkeypatch.setattr(log, "write", flaky)
+    log.append(entry(0))
+    log.flush()
+    log.append(entry(1))
+    log.flush()
+    assert ids(log) == ["q1"]
+    assert failures == [[entry(0)]]
+
+
+def test_torn_lines_are_skipped(tmp_path):
+    log = SegmentedLog(tmp_path, prefix="faq")
+    log.write([entry(0)])
+    with open(log.segments()[0], "a") as fh:
+        fh.write('{"id": "q1", "quest')
+    assert ids(log) == ["q0"]
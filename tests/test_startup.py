@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from lazy_imports import LazyModule, resolve
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_lazy_module_imports_on_first_use():
+    sys.modules.pop("colorsys", None)
+    loaded = []
+    lazy = LazyModule("colorsys", on_import=loaded.append)
+    assert "colorsys" not in sys.modules and "not loaded" in repr(lazy)
+    assert lazy.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1.0)
+    assert lazy.hls_to_rgb(0, 0, 0) == (0, 0, 0)
+    assert [m.__name__ for m in loaded] == ["colorsys"]
+    assert resolve(lazy) is sys.modules["colorsys"]
+    assert resolve(json) is json
+
+
+def test_a_missing_optional_module_fails_only_when_used():
+    lazy = LazyModule("no_such_sdk")
+    with pytest.raises(ImportError):
+        lazy.anything
+
+
+def test_lazy_startup_defers_the_scan_and_sdk_imports():
+    probe = (
+        "import sys, app; "
+        "print(int(app.INVENTORY._loaded), int('google.generativeai' in sys.modules), "
+        "int(app.INVENTORY.get('guest_retailer', 'none') is None), int(app.INVENTORY._loaded))"
+    )
+    env = dict(os.environ, STARTUP_MODE="lazy", GEMINI_API_KEY="test-key")
+    out = subprocess.run(
+        [sys.executable, "-c", probe], cwd=ROOT, env=env, capture_output=True, text=True,
+        timeout=120, check=True,
+    ).stdout.split()
+    assert out[-4:] == ["0", "0", "1", "1"]
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from inventory import InventoryIndex
+from stock import OutOfStock, StockEngine
+from storage import JsonStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    (tmp_path / "data").mkdir()
+    storage = JsonStorage(tmp_path / "data", tmp_path / "uploads")
+    for item_id, stock in (("a", 5), ("b", 1)):
+        storage.items.write({"retailer": "r", "item_id": item_id, "name": item_id, "stock": stock})
+    return storage
+
+
+def engine(storage, **options):
+    return StockEngine(InventoryIndex(storage.items, check_interval=0), storage, **options)
+
+
+def stock(storage, item_id):
+    return storage.items.read("r", item_id)[1]["stock"]
+
+
+def test_an_order_takes_every_line_or_none(storage):
+    stock_engine = engine(storage)
+    reservation = stock_engine.reserve("o1", [("r", "a", 2), ("r", "b", 1)])
+    assert reservation["state"] == "held"
+    assert (stock(storage, "a"), stock(storage, "b")) == (3, 0)
+
+    with pytest.raises(OutOfStock) as short:
+        stock_engine.reserve("o2", [("r", "a", 1), ("r", "b", 1)])
+    assert (short.value.item_id, short.value.available) == ("b", 0)
+    assert stock(storage, "a") == 3  # the line already taken went back
+    with pytest.raises(LookupError):
+        stock_engine.reserve("o3", [("r", "a", 1), ("r", "gone", 1)])
+    assert stock(storage, "a") == 3
+    assert storage.get_reservation("o2") is None
+
+
+def test_workers_racing_for_the_last_units_never_oversell(storage):
+    engines = [engine(storage) for _ in range(2)]  # two workers' indexes over one tree
+    wins, losses = [], []
+
+    def buy(n):
+        try:
+            engines[n % 2].reserve(f"o{n}", [("r", "a", 1)])
+            wins.append(n)
+        except OutOfStock:
+            losses.append(n)
+
+    threads = [threading.Thread(target=buy, args=(n,)) for n in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert (len(wins), len(losses)) == (5, 7)
+    assert stock(storage, "a") == 0
+
+
+def test_release_returns_stock_once_and_commit_keeps_it(storage):
+    released = []
+    stock_engine = engine(storage, on_release=lambda r, reason: released.append(reason))
+    stock_engine.reserve("paid", [("r", "a", 2)])
+    stock_engine.reserve("cancelled", [("r", "a", 2)])
+    assert stock_engine.commit("paid")["state"] == "committed"
+    assert stock_engine.release("paid") is None
+    assert stock_engine.release("cancelled")["state"] == "cancelled"
+    assert stock_engine.release("cancelled") is None
+    assert stock(storage, "a") == 3
+    assert released == ["cancelled"]
+
+
+def test_expired_holds_are_swept(storage):
+    released = []
+    stock_engine = engine(storage, ttl=60, on_release=lambda r, reason: released.append(reason))
+    reservation = stock_engine.reserve("o1", [("r", "a", 4)])
+    assert stock_engine.sweep(now=reservation["expires_at"] - 1) == 0
+    assert stock_engine.sweep(now=reservation["expires_at"]) == 1
+    assert stock(storage, "a") == 5 and released == ["expired"]
+
+
+def test_checkout_of_a_sold_out_item_is_refused(smartshop, shopper, retailer):
+    item = retailer.post("/store/upload", data={
+        "name": "Last one", "price": "3", "stock": "1", "image_url": "https://img.example/x.jpg",
+    }).get_json()["item"]
+    order = {"retailer": item["retailer"], "item_id": item["item_id"],
+             "name": "Ann", "phone": "1", "email": "a@example.com", "address": "Pune"}
+    assert shopper.post("/order/create", json=order).status_code == 200
+    resp = shopper.post("/order/create", json=order)
+    assert resp.status_code == 409
+    assert resp.get_json()["error"] == "Last one is out of stock"
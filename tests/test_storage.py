@@ -0,0 +1,81 @@
+import pytest
+
+from storage import JsonStorage, SqliteStorage, open_storage
+
+STATIC_FAQ = [{"q": "How do I register?", "a": "Use Register."}]
+
+
+def make_order(order_id, user="ann", status="pending", created_at="2026-01-01T00:00:00Z"):
+    return {"order_id": order_id, "user": user, "status": status, "total_amount": 9.5,
+            "created_at": created_at, "items": [{"item_id": "1", "qty": 1}]}
+
+
+def open_backend(backend, path):
+    (path / "data").mkdir(exist_ok=True)
+    storage = open_storage(backend, path / "data", path / "uploads")
+    storage.init_defaults(STATIC_FAQ)
+    return storage
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    return open_backend(request.param, tmp_path)
+
+
+def test_accounts(storage):
+    account = {"username": "ann", "role": "user", "password": "h", "created_at": None,
+               "last_login": None, "profile": {"city": "Pune"}}
+    assert storage.add_account(account)
+    assert not storage.add_account({**account, "password": "other"})
+    assert storage.update_account("ann", {"last_login": "2026-01-02T00:00:00Z"})
+    assert not storage.update_account("bob", {"last_login": "x"})
+    stored = storage.get_account("ann")
+    assert stored["password"] == "h" and stored["profile"] == {"city": "Pune"}
+    assert stored["last_login"] == "2026-01-02T00:00:00Z"
+    assert storage.get_account("bob") is None
+    assert [a["username"] for a in storage.iter_accounts()] == ["ann"]
+
+
+def test_orders_are_updated_in_place(storage):
+    storage.add_order(make_order("o1"))
+    storage.add_order(make_order("o2", created_at="2026-01-02T00:00:00Z"))
+    storage.add_order(make_order("o1", status="paid"))
+    assert storage.get_order("o1")["status"] == "paid"
+    assert storage.get_order("missing") is None
+    assert sorted(o["order_id"] for o in storage.iter_orders()) == ["o1", "o2"]
+
+
+def test_faq_and_ratings(storage):
+    assert storage.get_static_faq() == STATIC_FAQ
+    entry = {"id": "q1", "user": "ann", "question": "Shipping?", "answer": "2 days",
+             "ts": "2026-01-01T00:00:00Z"}
+    storage.append_faq_log(entry)
+    assert [e["question"] for e in storage.iter_faq_log()] == ["Shipping?"]
+    assert storage.get_ratings() == {"excellent": 0, "good": 0, "bad": 0}
+    storage.add_rating("good")
+    storage.add_rating("good", 2)
+    assert storage.get_ratings()["good"] == 3
+
+
+def test_migrate_json_into_sqlite(tmp_path):
+    source = open_backend("json", tmp_path)
+    source.add_account({"username": "ann", "role": "user", "password": "h", "profile": {}})
+    source.add_order(make_order("o1"))
+    source.add_rating("bad")
+    source.items.write({"retailer": "r", "item_id": "1", "name": "Mug"})
+
+    target = SqliteStorage(tmp_path / "smartshop.db")
+    stats = target.import_from(source)
+    assert stats["accounts"] == 1 and stats["orders"] == 1 and stats["items"] == 1
+    assert target.get_order("o1") == make_order("o1")
+    assert target.get_ratings()["bad"] == 1
+    assert target.get_static_faq() == STATIC_FAQ
+    assert target.items.load_retailer("r") == [{"retailer": "r", "item_id": "1", "name": "Mug"}]
+    assert target.import_from(source)["orders"] == 1  # safe to run again
+    assert len(list(target.iter_orders())) == 1
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError, match="postgres"):
+        open_storage("postgres", tmp_path, tmp_path)
+    assert isinstance(open_storage("json", tmp_path, tmp_path), JsonStorage)
@@ -0,0 +1,135 @@
+import os
+from pathlib import Path
+
+import requests
+
+import thumbnails
+from benchmarks.fake_images import FakeImages
+from thumbnails import ThumbnailStore, public_address
+
+
+def fake_resolver(monkeypatch, answers):
+    """Make ``socket.getaddrinfo`` in thumbnails answer ``{host: [ip, ...]}``; returns the lookups."""
+    lookups = []
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        lookups.append(host)
+        return [(2, 1, 6, "", (ip, port or 80)) for ip in answers[host]]
+
+    monkeypatch.setattr(thumbnails.socket, "getaddrinfo", getaddrinfo)
+    return lookups
+
+
+def test_public_address(monkeypatch):
+    fake_resolver(monkeypatch, {
+        "cdn.example": ["93.184.216.34"],
+        "intranet.example": ["10.0.0.5"],
+        "mixed.example": ["93.184.216.34", "127.0.0.1"],
+    })
+    assert public_address("https://cdn.example/a.jpg") == "93.184.216.34"
+    assert public_address("https://intranet.example/a.jpg") is None
+    assert public_address("https://mixed.example/a.jpg") is None
+    assert public_address("ftp://cdn.example/a.jpg") is None
+
+
+def test_public_host_gets_a_thumbnail(tmp_path, monkeypatch):
+    server = FakeImages().serve(port=0)
+    port = server.server_address[1]
+    vetted = []
+
+    def vet(url):
+        vetted.append(url)
+        return "127.0.0.1"  # the fake host stands in for a public address
+
+    monkeypatch.setattr(thumbnails, "public_address", vet)
+    store = ThumbnailStore(tmp_path, requests, widths=(64,), processes=0)
+    assert not store.allow_private
+    url = f"http://images.test:{port}/redirect/img/shoe.jpg?w=200&h=100"
+    try:
+        store.schedule(url)
+        store.drain()
+    finally:
+        server.shutdown()
+    digest = store.digest_for(url)
+    assert digest is not None and store.failed == 0
+    assert store.find(digest, 64, "webp") and store.find(digest, 64, "jpg")
+    # Each hop was vetted, and "images.test" was never resolved to connect
+    assert vetted == [url, f"http://images.test:{port}/img/shoe.jpg?w=200&h=100"]
+
+
+def test_private_host_is_not_fetched(tmp_path, monkeypatch):
+    fake = FakeImages()
+    server = fake.serve(port=0)
+    port = server.server_address[1]
+    lookups = fake_resolver(monkeypatch, {"images.test": ["127.0.0.1"]})
+    store = ThumbnailStore(tmp_path, requests, widths=(64,), processes=0)
+    url = f"http://images.test:{port}/img/shoe.jpg"
+    try:
+        store.schedule(url)
+        store.drain()
+    finally:
+        server.shutdown()
+    assert store.digest_for(url) is None and store.failed == 1
+    assert lookups == ["images.test"]
+    assert fake.stats["requests"] == 0
+
+
+def test_misses_are_looked_up_again_only_after_a_url_finishes(tmp_path, monkeypatch):
+    store = ThumbnailStore(tmp_path, requests)
+    reads = []
+    read_text = Path.read_text
+    monkeypatch.setattr(
+        Path, "read_text", lambda self, *a, **k: reads.append(self) or read_text(self, *a, **k)
+    )
+    url = "https://cdn.example/shoe.jpg"
+    assert store.digest_for(url) is None
+    assert store.digest_for(url) is None
+    assert store.digest_for(url, store.version()) is None
+    assert len(reads) == 1
+
+    # Another worker finishes the URL, which bumps the version
+    (tmp_path / "urls").mkdir()
+    (tmp_path / "urls" / thumbnails.url_key(url)).write_text("ab" * 32)
+    os.utime(tmp_path / "urls", ns=(1, 1))
+    assert store.digest_for(url) == "ab" * 32
+    assert store.digest_for(url) == "ab" * 32
+    assert len(reads) == 2
+
+
+def test_bad_images_fail_without_a_digest(tmp_path):
+    server = FakeImages().serve(port=0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    store = ThumbnailStore(
+        tmp_path, requests, widths=(64,), processes=0, max_bytes=20_000, allow_private=True,
+    )
+    urls = [
+        f"{base}/text",  # not an image
+        f"{base}/img/huge.jpg?w=1500&h=1500",  # over max_bytes
+        f"{base}/missing.jpg",  # 404
+        f"{base}/redirect/redirect/redirect/redirect/img/a.jpg",  # too many hops
+        "ftp://example.com/a.jpg",  # never scheduled
+    ]
+    try:
+        for url in urls:
+            store.schedule(url)
+        store.drain()
+    finally:
+        server.shutdown()
+    assert store.failed == 4 and store.generated == 0
+    assert all(store.digest_for(url) is None for url in urls)
+
+
+def test_the_same_picture_is_stored_once(tmp_path):
+    server = FakeImages().serve(port=0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    store = ThumbnailStore(tmp_path, requests, widths=(64,), processes=0, allow_private=True)
+    try:
+        for url in (f"{base}/img/a.jpg?w=100&h=80", f"{base}/redirect/img/a.jpg?w=100&h=80"):
+            store.schedule(url)
+            store.drain()
+    finally:
+        server.shutdown()
+    first, second = (store.digest_for(f"{base}{p}/img/a.jpg?w=100&h=80") for p in ("", "/redirect"))
+    assert first == second and store.generated == 1
+    assert store.find(first, 64, "jpg") and store.find(first, 999, "jpg") is None
+    assert store.find("../../etc", 64, "jpg") is None
@@ -0,0 +1,303 @@
+"""Background thumbnails for product images, stored by content hash.
+
+Products only keep the URL a retailer pasted. ``ThumbnailStore.schedule(url)``
+queues that URL when an item is saved: a thread pool downloads it once
+(size-capped, and unless ``allow_private`` is set only from hosts that resolve
+to public addresses, connecting to the address that was checked), and
+a process pool decodes and resizes it with Pillow into WebP and JPEG at each
+width in ``widths``. Files live under ``root/<digest[:2]>/<digest>/``, named
+``<width>.webp`` / ``<width>.jpg``, where ``digest`` is the SHA-256 of the
+downloaded bytes, so the same picture behind several URLs is stored once and a
+stored file never changes. ``root/urls/<sha256(url)>`` records the digest a URL
+resolved to, so every worker process finds thumbnails made by any other.
+"""
+import functools
+import hashlib
+import ipaddress
+import multiprocessing
+import os
+import queue
+import re
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from urllib.parse import urljoin, urlsplit
+
+from file_locks import atomic_write
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+FORMATS = {"webp": "image/webp", "jpg": "image/jpeg"}
+MAX_REDIRECTS = 3
+
+
+def render_thumbnails(data, widths, quality=80):
+    """Return ``{(width, ext): bytes}`` for an encoded image; runs in a worker process."""
+    from PIL import Image, ImageOps  # deferred: only thumbnail workers need Pillow
+
+    Image.MAX_IMAGE_PIXELS = 40_000_000
+    with Image.open(BytesIO(data)) as src:
+        src.draft("RGB", (max(widths), max(widths)))  # cheap JPEG downscale on decode
+        image = ImageOps.exif_transpose(src)
+        image.load()
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        flat = Image.new("RGB", image.size, "white")
+        flat.paste(image, mask=image.getchannel("A"))
+    else:
+        image = flat = image.convert("RGB")
+    out = {}
+    for width in widths:
+        height = max(1, round(image.height * min(1.0, width / image.width)))
+        size = (min(width, image.width), height)
+        buf = BytesIO()
+        image.resize(size, Image.LANCZOS).save(buf, "WEBP", quality=quality, method=4)
+        out[(width, "webp")] = buf.getvalue()
+        buf = BytesIO()
+        flat.resize(size, Image.LANCZOS).save(
+            buf, "JPEG", quality=quality, optimize=True, progressive=True
+        )
+        out[(width, "jpg")] = buf.getvalue()
+    return out
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def public_address(url):
+    """Return a global (internet) address ``url``'s host resolves to, or None.
+
+    None as well when any of the host's addresses is private, loopback or
+    otherwise not global.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        return None
+    addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    if not addresses or not all(address.is_global for address in addresses):
+        return None
+    return str(addresses[0])
+
+
+@functools.lru_cache(maxsize=None)
+def _pinned_adapter(base):
+    class PinnedAdapter(base):
+        """Connects to ``address`` for ``hostname`` instead of resolving the name again.
+
+        TLS still sends and verifies ``hostname`` (SNI and certificate check).
+        """
+
+        def __init__(self, hostname, address, **kwargs):
+            self.hostname = hostname
+            self.address = address
+            super().__init__(**kwargs)
+
+        def build_connection_pool_key_attributes(self, request, verify, cert=None):
+            host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+                request, verify, cert
+            )
+            if host_params["host"] == self.hostname:
+                host_params["host"] = self.address
+                if host_params["scheme"] == "https":
+                    pool_kwargs["server_hostname"] = self.hostname
+                    pool_kwargs["assert_hostname"] = self.hostname
+            return host_params, pool_kwargs
+
+    return PinnedAdapter
+
+
+def pinned_session(http, url, address):
+    """A ``requests`` session that reaches ``url``'s host at ``address``, without proxies."""
+    adapter = _pinned_adapter(http.adapters.HTTPAdapter)(urlsplit(url).hostname, address)
+    session = http.Session()
+    session.trust_env = False  # a proxy would resolve the name itself
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ThumbnailStore:
+    def __init__(
+        self, root, http, widths=(320, 640), quality=80, fetch_workers=2, processes=2,
+        max_bytes=10 * 1024 * 1024, timeout=10, allow_private=False,
+    ):
+        self.root = root
+        self.http = http  # the requests module (or a lazy proxy for it)
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self.processes = processes
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self.fetch_workers = fetch_workers
+        self._digests = {}  # url -> digest, only for finished URLs
+        self._misses = {}  # url -> version() when it was last looked up and not done
+        self._pending = set()  # urls queued or in progress
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        # Daemon threads rather than an executor, so shutdown never waits on downloads
+        self._queue = queue.Queue()
+        self._threads = []
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.generated = 0
+        self.failed = 0
+
+    # ---- lookups ----
+    def path(self, digest, width, ext):
+        return self.root / digest[:2] / digest / f"{width}.{ext}"
+
+    def digest_for(self, url, version=None):
+        """Return the content digest ``url`` was thumbnailed under, or None if not (yet) done.
+
+        A miss is not looked up on disk again until ``version()`` changes;
+        pass ``version`` to reuse one already read, e.g. once per page.
+        """
+        digest = self._digests.get(url)
+        if digest is not None:
+            return digest
+        if version is None:
+            version = self.version()
+        if self._misses.get(url) == version:
+            return None
+        try:
+            digest = (self.root / "urls" / url_key(url)).read_text().strip()
+        except (FileNotFoundError, NotADirectoryError):
+            self._misses[url] = version
+            return None
+        self._digests[url] = digest
+        self._misses.pop(url, None)
+        return digest
+
+    def version(self):
+        """Changes whenever any worker finishes a URL; part of validators for pages showing thumbnails."""
+        try:
+            return (self.root / "urls").stat().st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            return 0
+
+    def find(self, digest, width, ext):
+        """Return the path of a stored thumbnail, or None."""
+        if not _DIGEST_RE.match(digest) or width not in self.widths or ext not in FORMATS:
+            return None
+        path = self.path(digest, width, ext)
+        return path if path.exists() else None
+
+    # ---- pipeline ----
+    def schedule(self, url):
+        """Queue ``url`` for download and resizing unless it is already done or queued."""
+        if not url or not url.startswith(("http://", "https://")):
+            return
+        with self._lock:
+            if url in self._digests or url in self._pending:
+                return
+            self._pending.add(url)
+            if not self._threads:
+                for n in range(self.fetch_workers):
+                    thread = threading.Thread(target=self._work, name=f"thumbs-{n}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+        self._queue.put(url)
+
+    def drain(self):
+        """Block until the queue is empty and nothing is in progress."""
+        with self._idle:
+            while self._pending:
+                self._idle.wait()
+
+    def _work(self):
+        while True:
+            self._process(self._queue.get())
+
+    def _process(self, url):
+        try:
+            if self.digest_for(url):
+                return
+            data = self._fetch(url)
+            digest = hashlib.sha256(data).hexdigest()
+            if not all(self.path(digest, w, ext).exists() for w in self.widths for ext in FORMATS):
+                files = self._render(data)
+                folder = self.root / digest[:2] / digest
+                os.makedirs(folder, exist_ok=True)
+                for (width, ext), body in files.items():
+                    atomic_write(self.path(digest, width, ext), body)
+                self.generated += 1
+            os.makedirs(self.root / "urls", exist_ok=True)
+            atomic_write(self.root / "urls" / url_key(url), digest)
+            self._digests[url] = digest
+        except Exception as e:
+            self.failed += 1
+            print(f"[Thumbnails] {url}: {e}")
+        finally:
+            with self._idle:
+                self._pending.discard(url)
+                if not self._pending:
+                    self._idle.notify_all()
+
+    def _fetch(self, url):
+        for _ in range(MAX_REDIRECTS + 1):
+            resp = self._get(url)
+            try:
+                if resp.is_redirect:
+                    url = urljoin(url, resp.headers["Location"])
+                    continue
+                if resp.status_code != 200:
+                    raise ValueError(f"HTTP {resp.status_code}")
+                content_type = resp.headers.get("Content-Type", "")
+                if not content_type.startswith("image/"):
+                    raise ValueError(f"not an image ({content_type or 'no content type'})")
+                if int(resp.headers.get("Content-Length") or 0) > self.max_bytes:
+                    raise ValueError("image is too large")
+                data = bytearray()
+                for chunk in resp.iter_content(64 * 1024):
+                    data += chunk
+                    if len(data) > self.max_bytes:
+                        raise ValueError("image is too large")
+                return bytes(data)
+            finally:
+                resp.close()
+        raise ValueError("too many redirects")
+
+    def _get(self, url):
+        if self.allow_private:
+            return self.http.get(url, timeout=self.timeout, stream=True, allow_redirects=False)
+        # Connect to the address that was vetted; resolving the name again could
+        # give a private one (DNS rebinding)
+        address = public_address(url)
+        if address is None:
+            raise ValueError("image host is not a public address")
+        with pinned_session(self.http, url, address) as session:
+            return session.get(
+                url,
+                headers={"Host": urlsplit(url).netloc.rpartition("@")[2]},
+                timeout=self.timeout,
+                stream=True,
+                allow_redirects=False,
+            )
+
+    def _render(self, data):
+        if self.processes <= 0:
+            return render_thumbnails(data, self.widths, self.quality)
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn, not fork: the app process has threads (and locks) of its own
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        pool = self._pool
+        try:
+            return pool.submit(render_thumbnails, data, self.widths, self.quality).result()
+        except BrokenProcessPool:
+            # A worker died (out of memory on a huge image, say); start a fresh pool next time
+            with self._pool_lock:
+                if self._pool is pool:
+                    self._pool = None
+            raise